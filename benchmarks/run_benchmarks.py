@@ -0,0 +1,335 @@
+"""Client benchmarks for pycupiddb.
+
+Runs against the stand-in server in ``stand_in_server.py``, started in a
+subprocess so that its CPU time is not counted against the client, or against
+any server given with ``--host``/``--port``. The ``flush`` case deletes every
+key on the server, so against a server of your own it only runs with
+``--allow-flush``; otherwise only the ``bench_*`` keys it wrote are deleted::
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --quick --compare results.json
+
+Every case reports ops/sec, latency percentiles, client CPU time per op and
+the peak RSS growth of the client process. Results are written as JSON;
+``--compare`` prints the change in median latency against an earlier file
+and exits with status 1 when any case got slower than ``--threshold``.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pycupiddb import CupidClient, RowFilter  # noqa: E402
+
+
+STAND_IN_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stand_in_server.py')
+
+
+class RssSampler:
+    """Samples the resident set size of this process in a background thread.
+
+    Reads ``/proc/self/statm`` and is a no-op where that does not exist.
+    """
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+        self.available = os.path.exists('/proc/self/statm')
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def rss(self) -> int:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * self.page_size
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.rss())
+
+    def __enter__(self) -> 'RssSampler':
+        if self.available:
+            self.start_rss = self.peak_rss = self.rss()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_rss = max(self.peak_rss, self.rss())
+
+    def peak_growth(self) -> Optional[int]:
+        return self.peak_rss - self.start_rss if self.available else None
+
+
+def cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def measure(operation: Callable[[], Any], min_iterations: int, min_seconds: float,
+            setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """Run ``operation`` at least ``min_iterations`` times and for at least ``min_seconds``.
+
+    ``setup`` runs untimed before every iteration.
+    """
+    latencies: List[float] = []
+    cpu_total = 0.0
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        while len(latencies) < min_iterations or time.perf_counter() - started < min_seconds:
+            if setup is not None:
+                setup()
+            cpu_start = cpu_time()
+            start = time.perf_counter_ns()
+            operation()
+            latencies.append((time.perf_counter_ns() - start) / 1e9)
+            cpu_total += cpu_time() - cpu_start
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'iterations': len(latencies),
+        'ops_per_sec': len(latencies) / total if total else 0.0,
+        'mean_us': total / len(latencies) * 1e6,
+        'p50_us': percentile(latencies, 0.50) * 1e6,
+        'p99_us': percentile(latencies, 0.99) * 1e6,
+        'max_us': latencies[-1] * 1e6,
+        'cpu_us_per_op': cpu_total / len(latencies) * 1e6,
+        'peak_rss_growth_bytes': sampler.peak_growth(),
+    }
+
+
+def create_frame(rows: int, columns: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data: Dict[str, Any] = {}
+    for i in range(columns):
+        if i % 4 == 0:
+            data[f'c{i}'] = rng.integers(0, 1000, rows)
+        elif i % 4 == 1:
+            data[f'c{i}'] = rng.random(rows)
+        elif i % 4 == 2:
+            data[f'c{i}'] = rng.choice(['alpha', 'beta', 'gamma', 'delta'], rows)
+        else:
+            data[f'c{i}'] = pd.date_range('2000-01-01', periods=rows, freq='min')
+    return pd.DataFrame(data)
+
+
+def command_cases(client: CupidClient,
+                  allow_flush: bool) -> Iterator[Tuple[str, Callable[[], Any], Optional[Callable[[], Any]]]]:
+    """Yields ``(name, operation, setup)`` for every command of protocol 'B'.
+
+    ``flush`` is left out unless ``allow_flush``; the keys written here are
+    deleted once the cases are done either way.
+    """
+    key = 'bench_key'
+    small_frame = create_frame(100, 4)
+    client.set(key='bench_int', value=1)
+    client.set(key='bench_float', value=1.0)
+    client.set(key='bench_pickle', value={'values': list(range(100))})
+    client.set(key='bench_frame', value=small_frame)
+    many_keys = [f'bench_many_{i}' for i in range(10)]
+
+    yield 'set_int', lambda: client.set(key=key, value=1), None
+    yield 'set_pickle', lambda: client.set(key=key, value={'values': list(range(100))}), None
+    yield 'add_existing', lambda: client.add(key='bench_int', value=1), None
+    yield 'get_int', lambda: client.get(key='bench_int'), None
+    yield 'get_float', lambda: client.get(key='bench_float'), None
+    yield 'get_pickle', lambda: client.get(key='bench_pickle'), None
+    yield 'get_missing', lambda: client.get(key='bench_missing'), None
+    yield 'get_frame_100x4', lambda: client.get(key='bench_frame'), None
+    yield 'get_dataframe_filtered', lambda: client.get_dataframe(
+        key='bench_frame', columns=['c0', 'c1'],
+        filters=[RowFilter(column='c0', logic='gte', value=500, data_type='int')]), None
+    yield 'incr', lambda: client.incr(key='bench_counter'), None
+    yield 'incr_float', lambda: client.incr_float(key='bench_float_counter'), None
+    yield 'delete', lambda: client.delete(key=key), lambda: client.set(key=key, value=1)
+    yield 'delete_many_10', lambda: client.delete_many(many_keys), \
+        lambda: client.set_many({k: 1 for k in many_keys})
+    yield 'touch', lambda: client.touch(key='bench_int', timeout=60.0), None
+    yield 'ttl', lambda: client.ttl(key='bench_int'), None
+    yield 'has_key', lambda: client.has_key(key='bench_int'), None
+    yield 'keys', lambda: client.keys('bench_many_*'), None
+    if allow_flush:
+        yield 'flush', lambda: client.flush(), lambda: client.set(key=key, value=1)
+    client.delete_many([key, 'bench_int', 'bench_float', 'bench_pickle', 'bench_frame', 'bench_counter',
+                        'bench_float_counter', *many_keys])
+
+
+def run_commands(client: CupidClient, allow_flush: bool, min_iterations: int,
+                 min_seconds: float) -> List[Dict[str, Any]]:
+    results = []
+    for name, operation, setup in command_cases(client, allow_flush):
+        result = measure(operation, min_iterations=min_iterations, min_seconds=min_seconds, setup=setup)
+        results.append({'name': name, **result})
+        print(f"{name:<24} {result['ops_per_sec']:>10.0f} ops/s  p50 {result['p50_us']:>9.1f}us  "
+              f"p99 {result['p99_us']:>9.1f}us")
+    return results
+
+
+def run_dataframes(client: CupidClient, row_counts: List[int], column_counts: List[int],
+                   compressions: List[str], min_iterations: int, min_seconds: float) -> List[Dict[str, Any]]:
+    results = []
+    for rows in row_counts:
+        for columns in column_counts:
+            frame = create_frame(rows, columns)
+            frame_bytes = int(frame.memory_usage(index=True, deep=True).sum())
+            key = f'bench_frame_{rows}_{columns}'
+            for compression in compressions:
+                upload = None if compression == 'none' else compression
+                download = '' if compression == 'none' else compression
+                cases: List[Tuple[str, Callable[[], Any]]] = [
+                    ('set', lambda: client.set(key=key, value=frame, compression=upload)),
+                    ('get_dataframe', lambda: client.get_dataframe(key=key, compression_type=download)),
+                    ('get_dataframe_arrow', lambda: client.get_dataframe(key=key, compression_type=download,
+                                                                         return_type='arrow')),
+                ]
+                client.set(key=key, value=frame, compression=upload)
+                # Decoding a payload that is already in memory isolates _process_arrow_payload
+                payload = client.connection.send_command(
+                    'GA', client._encode_get_dataframe(key=key, columns=[], filter_operation='AND', filters=[],
+                                                       result_cache_timeout=0.0, compression_type=download))[1]
+                cases.append(('decode', lambda: client._process_arrow_payload(payload)))
+                for operation_name, operation in cases:
+                    result = measure(operation, min_iterations=min_iterations, min_seconds=min_seconds)
+                    result['throughput_mb_per_sec'] = frame_bytes * result['ops_per_sec'] / 1e6
+                    name = f'{operation_name}/{rows}x{columns}/{compression}'
+                    results.append({'name': name, 'operation': operation_name, 'rows': rows,
+                                    'columns': columns, 'compression': compression,
+                                    'frame_bytes': frame_bytes, 'payload_bytes': len(payload), **result})
+                    print(f"{name:<36} {result['throughput_mb_per_sec']:>9.1f} MB/s  "
+                          f"p50 {result['p50_us'] / 1000:>9.2f}ms  cpu {result['cpu_us_per_op'] / 1000:>9.2f}ms")
+                del payload
+            client.delete(key=key)
+    return results
+
+
+def metadata() -> Dict[str, Any]:
+    try:
+        from importlib.metadata import version
+        client_version = version('pycupiddb')
+    except Exception:
+        client_version = None
+    try:
+        commit: Optional[str] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                               text=True, cwd=os.path.dirname(STAND_IN_SERVER)).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': commit or None,
+        'pycupiddb': client_version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(previous_path: str, current: Dict[str, Any], threshold: float) -> bool:
+    """Print the p50 latency change of every case; returns True if any regressed beyond ``threshold``.
+
+    The median is compared rather than ops/sec, which follows the mean and
+    moves with every scheduling hiccup on a busy machine.
+    """
+    with open(previous_path) as f:
+        previous = json.load(f)
+    regressed = False
+    for section in ('commands', 'dataframes'):
+        before = {case['name']: case for case in previous.get(section, [])}
+        for case in current[section]:
+            old = before.get(case['name'])
+            if old is None or not old['p50_us']:
+                continue
+            change = case['p50_us'] / old['p50_us'] - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressed = True
+            print(f"{case['name']:<36} {change:>+8.1%}{flag}")
+    return regressed
+
+
+def start_stand_in_server() -> Tuple[subprocess.Popen, int]:
+    process = subprocess.Popen([sys.executable, STAND_IN_SERVER, '0'], stdout=subprocess.PIPE, text=True)
+    assert process.stdout is not None
+    return process, int(process.stdout.readline())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', help='benchmark an existing server instead of the stand-in')
+    parser.add_argument('--allow-flush', action='store_true',
+                        help='run the flush case against --host, which deletes every key on that server')
+    parser.add_argument('--port', type=int, default=5995)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='p50 latency increase reported as a regression (default 0.10)')
+    parser.add_argument('--quick', action='store_true', help='fewer iterations and smaller frames')
+    parser.add_argument('--skip-dataframes', action='store_true')
+    parser.add_argument('--rows', type=int, nargs='+')
+    parser.add_argument('--columns', type=int, nargs='+', default=[4, 32])
+    parser.add_argument('--compressions', nargs='+', default=['none', 'lz4', 'zstd'],
+                        choices=['none', 'lz4', 'zstd'])
+    args = parser.parse_args(argv)
+
+    min_iterations, min_seconds = (200, 0.2) if args.quick else (2000, 1.0)
+    row_counts = args.rows or ([1000, 100000] if args.quick else [1000, 100000, 1000000])
+
+    server: Optional[subprocess.Popen] = None
+    if args.host is None:
+        server, port = start_stand_in_server()
+        host = '127.0.0.1'
+    else:
+        host, port = args.host, args.port
+
+    try:
+        client = CupidClient(host=host, port=port)
+        results: Dict[str, Any] = {'metadata': metadata(), 'commands': [], 'dataframes': []}
+        results['metadata']['server'] = 'stand-in' if server is not None else f'{host}:{port}'
+        results['commands'] = run_commands(client, allow_flush=server is not None or args.allow_flush,
+                                           min_iterations=min_iterations, min_seconds=min_seconds)
+        if not args.skip_dataframes:
+            results['dataframes'] = run_dataframes(client, row_counts=row_counts, column_counts=args.columns,
+                                                   compressions=args.compressions,
+                                                   min_iterations=5 if args.quick else 20,
+                                                   min_seconds=min_seconds)
+        client.close()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        return 1 if compare(args.compare, results, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Stand-in CupidDB server speaking protocol 'B', for benchmarks.
+
+Serves a ``pycupiddb.embedded.EmbeddedStore`` over TCP, or a Unix domain
+socket when given a path, one thread per connection. It is not a reference
+for server semantics and is not meant to be fast; it exists so that client
+overhead can be measured without the real server::
+
+    python benchmarks/stand_in_server.py 5995
+    python benchmarks/stand_in_server.py /tmp/cupiddb.sock
+"""
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pycupiddb.embedded import EmbeddedStore  # noqa: E402
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def _recv_exact(self, n: int) -> Optional[bytearray]:
+        buffer = bytearray(n)
+        view = memoryview(buffer)
+        while n:
+            received = self.request.recv_into(view[len(buffer) - n:], n)
+            if received == 0:
+                return None
+            n -= received
+        return buffer
+
+    def handle(self):
+        if self.request.family != socket.AF_UNIX:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            header = self._recv_exact(11)
+            if header is None:
+                return
+            payload = self._recv_exact(struct.unpack('>Q', header[3:11])[0])
+            if payload is None:
+                return
+            if header[0:1] != b'B':
+                response_type, response = 'ER', struct.pack('>H', 6)
+            else:
+                response_type, response = self.server.store.handle(header[1:3].decode(), payload)
+            response = memoryview(response)
+            self.request.sendall(b'B' + response_type.encode() + struct.pack('>Q', response.nbytes))
+            self.request.sendall(response)
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.store = EmbeddedStore(zero_copy=False)
+
+    def start(self) -> 'StandInServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StandInUnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        self.store = EmbeddedStore(zero_copy=False)
+
+    def start(self) -> 'StandInUnixServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and not sys.argv[1].isdigit():
+        StandInUnixServer(sys.argv[1]).serve_forever()
+    server = StandInServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 5995)
+    # The port line lets a parent process that passed port 0 find the server
+    print(server.server_address[1], flush=True)
+    server.serve_forever()
@@ -1,7 +1,52 @@
+from typing import TYPE_CHECKING, Any
+
 from .client import CupidClient
 from .commands import RowFilter
+from .filters import Expression, col
+from .prepared import PreparedQuery, Placeholder
+from .near_cache import NearCache
+from .codec import Codec, CodecRegistry, PickleBufferCodec, JsonCodec, MsgpackCodec, ArrowTensorCodec
+from .instrumentation import Instrumentation, CommandEvent, OpenTelemetryHook
+from .tracing import Trace, CallTrace
+from .sharded import ShardedCupidClient, HashRing
+from .replicated import ReplicatedCupidClient
+from .transport import Transport, TCPTransport, UnixTransport
+
+if TYPE_CHECKING:
+    from .async_client import AsyncCupidClient
 
 __all__ = [
     'CupidClient',
+    'AsyncCupidClient',
     'RowFilter',
+    'Expression',
+    'col',
+    'PreparedQuery',
+    'Placeholder',
+    'NearCache',
+    'Codec',
+    'CodecRegistry',
+    'PickleBufferCodec',
+    'JsonCodec',
+    'MsgpackCodec',
+    'ArrowTensorCodec',
+    'Instrumentation',
+    'CommandEvent',
+    'OpenTelemetryHook',
+    'Trace',
+    'CallTrace',
+    'ShardedCupidClient',
+    'HashRing',
+    'ReplicatedCupidClient',
+    'Transport',
+    'TCPTransport',
+    'UnixTransport',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # asyncio is slow to import, so the async client loads on first access
+    if name == 'AsyncCupidClient':
+        from .async_client import AsyncCupidClient
+        return AsyncCupidClient
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
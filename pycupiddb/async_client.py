@@ -0,0 +1,236 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional, Tuple, Union
+
+from .async_connection import AsyncConnectionPool
+from .codec import CodecRegistry
+from .instrumentation import Instrumentation
+from .commands import CommandEncoder, RowFilter
+from .connection import Serializer, ReturnType, DataFrameResult, Payload, ValueData, is_dataframe
+from .filters import Filters, plan_filters
+from .transport import Transport, resolve_transport
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .prepared import PreparedQuery
+
+
+class AsyncCommand(CommandEncoder, Serializer):
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        min_connections: int = 1,
+        max_connections: int = 10,
+        checkout_timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        codecs: Optional[CodecRegistry] = None,
+        unix_socket_path: Optional[str] = None,
+        transport: Optional[Transport] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        **kwargs
+    ):
+        self.host = host
+        self.port = port
+        self.codecs = codecs
+        self.instrumentation = instrumentation
+        self.connection = AsyncConnectionPool(host=host, port=port, min_size=min_connections,
+                                              max_size=max_connections,
+                                              checkout_timeout=checkout_timeout,
+                                              idle_timeout=idle_timeout, instrumentation=instrumentation,
+                                              transport=resolve_transport(unix_socket_path, transport),
+                                              **kwargs)
+
+    async def connect(self):
+        await self.connection.connect()
+
+    async def send_command(self, message_type: str, payload: Payload) -> Tuple[str, bytes]:
+        return await self.connection.send_command(message_type=message_type, payload=payload)
+
+    def pool_stats(self) -> Dict[str, float]:
+        return self.connection.stats()
+
+    async def close(self):
+        await self.connection.close()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _set_record_batch(self, key: str, value: 'pd.DataFrame', timeout: float, add_only: bool,
+                                compression: Optional[Literal['lz4', 'zstd']] = None,
+                                compression_level: Optional[int] = None) -> bool:
+        payload = self._encode_record_batch(value, compression=compression,
+                                            compression_level=compression_level)
+        return await self._set_data(data_type='A', key=key, byte_data=payload,
+                                    timeout=timeout, add_only=add_only)
+
+    async def _set_int(self, key: str, value: int, timeout: float, add_only: bool) -> bool:
+        payload = self._encode_int(value)
+        return await self._set_data(data_type='I', key=key, byte_data=payload,
+                                    timeout=timeout, add_only=add_only)
+
+    async def _set_float(self, key: str, value: float, timeout: float, add_only: bool) -> bool:
+        payload = self._encode_float(value)
+        return await self._set_data(data_type='F', key=key, byte_data=payload,
+                                    timeout=timeout, add_only=add_only)
+
+    async def _set_pickle(self, key: str, value: Any, timeout: float, add_only: bool) -> bool:
+        return await self._set_data(data_type='B', key=key, byte_data=self._encode_pickle(value),
+                                    timeout=timeout, add_only=add_only)
+
+    async def _set_data(self, data_type: str, key: str, byte_data: ValueData, timeout: float,
+                        add_only: bool) -> bool:
+        payload = self._encode_set_data(data_type=data_type, key=key, byte_data=byte_data,
+                                        timeout=timeout, add_only=add_only)
+        response_type, response = await self.send_command(message_type='SD', payload=payload)
+        return self._process_set_data(response_type, response)
+
+    async def _incr(self, key: str, delta: int) -> int:
+        payload = self._encode_incr(key=key, delta=delta)
+        response_type, payload = await self.send_command(message_type='II', payload=payload)
+        return self._process_incr(response_type, payload)
+
+    async def _incr_float(self, key: str, delta: float) -> float:
+        payload = self._encode_incr_float(key=key, delta=delta)
+        response_type, payload = await self.send_command(message_type='IF', payload=payload)
+        return self._process_incr_float(response_type, payload)
+
+    async def _get_dataframe(self, key: str, columns: List[str] = [], filter_operation: str = 'AND',
+                             filters: Filters = [], result_cache_timeout: float = 0.0,
+                             compression_type: Literal['', 'lz4', 'zstd'] = '',
+                             return_type: ReturnType = 'pandas') -> Optional[DataFrameResult]:
+        columns, filter_operation, row_filters, plan = plan_filters(columns, filter_operation, filters)
+        payload = self._encode_get_dataframe(key=key, columns=columns, filter_operation=filter_operation,
+                                             filters=row_filters, result_cache_timeout=result_cache_timeout,
+                                             compression_type=compression_type)
+        response_type, payload = await self.send_command(message_type='GA', payload=payload)
+        return self._process_get_dataframe_response(response_type=response_type, payload=payload,
+                                                    return_type=return_type, plan=plan)
+
+    async def _get_prepared(self, query: 'PreparedQuery',
+                            return_type: ReturnType = 'pandas') -> Optional[DataFrameResult]:
+        response_type, payload = await self.send_command(message_type='GA', payload=query.payload)
+        return self._process_get_dataframe_response(response_type=response_type, payload=payload,
+                                                    return_type=return_type, plan=query.plan)
+
+    async def _get(self, key: str, default: Optional[Any],
+                   return_type: ReturnType = 'pandas') -> Optional[Any]:
+        response_type, payload = await self.send_command(message_type='GD', payload=self._encode_key(key))
+        return self._process_get_response(response_type=response_type, payload=payload, default=default,
+                                          return_type=return_type)
+
+    async def _delete(self, key: str) -> bool:
+        response_type, payload = await self.send_command(message_type='DL', payload=self._encode_key(key))
+        return self._process_delete(response_type, payload)
+
+    async def _delete_many(self, keys: List[str]) -> int:
+        payload = self._encode_delete_many(keys)
+        response_type, payload = await self.send_command(message_type='DM', payload=payload)
+        return self._process_delete_many(response_type, payload)
+
+    async def _touch(self, key: str, timeout: float) -> bool:
+        payload = self._encode_touch(key=key, timeout=timeout)
+        response_type, payload = await self.send_command(message_type='TH', payload=payload)
+        return self._process_touch_response(response_type, payload)
+
+    async def _ttl(self, key: str) -> Optional[float]:
+        response_type, payload = await self.send_command(message_type='TL', payload=self._encode_key(key))
+        return self._process_ttl_response(response_type, payload)
+
+    async def _has_key(self, key: str) -> bool:
+        response_type, payload = await self.send_command(message_type='HK', payload=self._encode_key(key))
+        return self._process_has_key_response(response_type, payload)
+
+    async def _keys(self, pattern: Optional[str]) -> list:
+        response_type, payload = await self.send_command(message_type='LS',
+                                                         payload=self._encode_keys(pattern))
+        return self._process_keys_response(response_type, payload)
+
+    async def _flush(self):
+        response_type, payload = await self.send_command(message_type='FU', payload=bytes())
+        return self._process_flush_response(response_type, payload)
+
+
+class AsyncCupidClient(AsyncCommand):
+
+    def __init__(self, host: str = 'localhost', port: Union[int, str] = 5995, **kwargs):
+        port_number = int(port) if isinstance(port, str) else port
+        super().__init__(host=host, port=port_number, **kwargs)
+
+    async def set(self, key: str, value: Any, timeout: float = 0.0,
+                  compression: Optional[Literal['lz4', 'zstd']] = None,
+                  compression_level: Optional[int] = None):
+        if is_dataframe(value):
+            await self._set_record_batch(key=key, value=value, timeout=timeout, add_only=False,
+                                         compression=compression, compression_level=compression_level)
+        elif isinstance(value, int):
+            await self._set_int(key=key, value=value, timeout=timeout, add_only=False)
+        elif isinstance(value, float):
+            await self._set_float(key=key, value=value, timeout=timeout, add_only=False)
+        else:
+            await self._set_pickle(key=key, value=value, timeout=timeout, add_only=False)
+
+    async def add(self, key: str, value: Any, timeout: float = 0.0,
+                  compression: Optional[Literal['lz4', 'zstd']] = None,
+                  compression_level: Optional[int] = None) -> bool:
+        if is_dataframe(value):
+            return await self._set_record_batch(key=key, value=value, timeout=timeout, add_only=True,
+                                                compression=compression, compression_level=compression_level)
+        elif isinstance(value, int):
+            return await self._set_int(key=key, value=value, timeout=timeout, add_only=True)
+        elif isinstance(value, float):
+            return await self._set_float(key=key, value=value, timeout=timeout, add_only=True)
+        else:
+            return await self._set_pickle(key=key, value=value, timeout=timeout, add_only=True)
+
+    async def incr(self, key: str, delta: int = 1) -> int:
+        return await self._incr(key=key, delta=delta)
+
+    async def incr_float(self, key: str, delta: float = 1.0) -> float:
+        return await self._incr_float(key=key, delta=delta)
+
+    async def get_dataframe(
+        self,
+        key: str,
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: ReturnType = 'pandas'
+    ) -> Optional[DataFrameResult]:
+        return await self._get_dataframe(key=key, columns=columns, filter_operation=filter_operation,
+                                         filters=filters, result_cache_timeout=result_cache_timeout,
+                                         compression_type=compression_type, return_type=return_type)
+
+    async def get_prepared(self, query: 'PreparedQuery',
+                           return_type: ReturnType = 'pandas') -> Optional[DataFrameResult]:
+        return await self._get_prepared(query=query, return_type=return_type)
+
+    async def get(self, key: str, default: Optional[Any] = None,
+                  return_type: ReturnType = 'pandas') -> Optional[Any]:
+        return await self._get(key=key, default=default, return_type=return_type)
+
+    async def delete(self, key: str) -> bool:
+        return await self._delete(key=key)
+
+    async def delete_many(self, keys: List[str]) -> int:
+        return await self._delete_many(keys=keys)
+
+    async def touch(self, key: str, timeout: float) -> bool:
+        return await self._touch(key=key, timeout=timeout)
+
+    async def ttl(self, key: str) -> Optional[float]:
+        return await self._ttl(key=key)
+
+    async def has_key(self, key: str) -> bool:
+        return await self._has_key(key=key)
+
+    async def keys(self, pattern: Optional[str] = None) -> list:
+        return await self._keys(pattern)
+
+    async def flush(self):
+        return await self._flush()
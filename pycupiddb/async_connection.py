@@ -0,0 +1,374 @@
+import asyncio
+import inspect
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from .connection import HEADER_LENGTH, Payload, backoff_delay, decode_header, encode_header, frame_buffers, \
+    payload_length
+from .exceptions import ConnectionError, PoolTimeoutError, ReadTimeoutError
+from .instrumentation import Instrumentation
+from .pool import IDEMPOTENT_COMMANDS, _percentile
+from .transport import TCPTransport, Transport
+
+
+T = TypeVar('T')
+
+
+class AsyncConnection:
+    """asyncio counterpart of ``SyncConnection``.
+
+    ``connect_timeout`` bounds each connection attempt and ``read_timeout``
+    each send and receive; failed attempts are retried with the same
+    backoff as ``SyncConnection``. Any error during an exchange leaves
+    the connection ``broken``; a closed stream, a socket error or a timeout
+    is raised as ``ConnectionError`` or ``ReadTimeoutError``, as on the
+    sync side.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        socket_no_delay: bool = True,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 10.0,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        transport: Optional[Transport] = None,
+        instrumentation: Optional[Instrumentation] = None
+    ):
+        self.protocol_version = 'B'.encode()
+        self.host = host
+        self.port = port
+        self.transport = transport if transport is not None else TCPTransport(host, port, no_delay=socket_no_delay)
+        self.instrumentation = instrumentation
+        self.socket_no_delay = socket_no_delay
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.broken = False
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self):
+        attempts = 0
+        last_error: Optional[Exception] = None
+
+        while attempts <= self.max_retries:
+            try:
+                self.reader, self.writer = await asyncio.wait_for(self.transport.connect_async(),
+                                                                  self.connect_timeout)
+                self.broken = False
+                return
+            except (OSError, asyncio.TimeoutError) as e:
+                last_error = e
+                if attempts < self.max_retries:
+                    await asyncio.sleep(backoff_delay(attempts, self.retry_delay, self.max_retry_delay))
+                attempts += 1
+
+        raise ConnectionError(f"Failed to connect after {self.max_retries} attempts") from last_error
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = None
+            self.reader = None
+
+    def is_alive(self) -> bool:
+        """Whether the server has not closed the stream, which an idle connection never reads from."""
+        return not self.broken and self.reader is not None and not self.reader.at_eof()
+
+    async def send_command(self, message_type: str, payload: Payload) -> Tuple[str, bytes]:
+        """Send one frame and read its response.
+
+        Callers must hold the connection exclusively, which
+        ``AsyncConnectionPool.checkout`` guarantees.
+        """
+        if self.instrumentation is None:
+            return await self._send_command(message_type, payload)
+        event = self.instrumentation.start(message_type, payload_length(payload))
+        try:
+            response_type, response = await self._send_command(message_type, payload)
+        except BaseException as e:
+            self.instrumentation.finish(event, exception=e)
+            raise
+        self.instrumentation.finish(event, response_type, len(response), response)
+        return response_type, response
+
+    async def _send_command(self, message_type: str, payload: Payload) -> Tuple[str, bytes]:
+        assert self.reader is not None and self.writer is not None
+        try:
+            header = encode_header(self.protocol_version, message_type, payload_length(payload))
+            # The transport gathers the buffers into one send where it can
+            self.writer.writelines([memoryview(buffer) for buffer in frame_buffers(header, payload)])
+            await self._timed(self.writer.drain())
+
+            response_header = await self._timed(self.reader.readexactly(HEADER_LENGTH))
+            response_type, payload_len = decode_header(response_header)
+            response_payload = await self._timed(self.reader.readexactly(payload_len))
+        except asyncio.TimeoutError as e:
+            # Checked first, as asyncio.TimeoutError is an OSError since Python 3.11
+            self._mark_broken()
+            raise ReadTimeoutError(f'No response within {self.read_timeout} seconds') from e
+        except asyncio.IncompleteReadError as e:
+            self._mark_broken()
+            raise ConnectionError('Connection closed by the server') from e
+        except OSError as e:
+            self._mark_broken()
+            raise ConnectionError(f'Connection to {self.transport} failed: {e}') from e
+        except BaseException:
+            # A bad header or a cancellation leaves the rest of the frame unread
+            self._mark_broken()
+            raise
+        return response_type, response_payload
+
+    async def _timed(self, awaitable: Awaitable[T]) -> T:
+        if self.read_timeout is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, self.read_timeout)
+
+    def _mark_broken(self):
+        # A late response would be read as the answer to the next command, so the stream is dropped
+        self.broken = True
+        if self.writer is not None:
+            self.writer.close()
+
+
+class AsyncConnectionPool:
+    """asyncio counterpart of ``ConnectionPool``.
+
+    Connections are opened lazily, so the pool can be created outside of a
+    running event loop; ``connect()`` opens the first ``min_size`` eagerly.
+    Dead idle connections are replaced at checkout and idempotent commands
+    are retried after a ``ConnectionError`` exactly as by ``ConnectionPool``.
+    """
+
+    wait_samples = 1024
+    max_command_retry_delay = 1.0
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        min_size: int = 1,
+        max_size: int = 10,
+        checkout_timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        command_retries: int = 2,
+        command_retry_delay: float = 0.05,
+        **connection_kwargs: Any
+    ):
+        assert max_size >= 1
+        assert 0 <= min_size <= max_size
+        # Connections are opened lazily, so a misspelled option is caught here rather than by the first command
+        unknown = set(connection_kwargs) - set(inspect.signature(AsyncConnection).parameters)
+        if unknown:
+            raise TypeError(f'Unexpected connection arguments: {", ".join(sorted(unknown))}')
+        self.host = host
+        self.port = port
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.instrumentation = instrumentation
+        self.command_retries = command_retries
+        self.command_retry_delay = command_retry_delay
+        self.connection_kwargs = connection_kwargs
+
+        self._condition: Optional[asyncio.Condition] = None
+        self._idle: Deque[Tuple[AsyncConnection, float]] = deque()
+        self._size = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reaped = 0
+        self._dead = 0
+        self._retries = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_recent: Deque[float] = deque(maxlen=self.wait_samples)
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created on first use so that it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def _new_connection(self) -> AsyncConnection:
+        connection = AsyncConnection(host=self.host, port=self.port, instrumentation=self.instrumentation,
+                                     **self.connection_kwargs)
+        await connection.connect()
+        return connection
+
+    async def connect(self):
+        condition = self._get_condition()
+        while True:
+            async with condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = await self._new_connection()
+            except BaseException:
+                async with condition:
+                    self._size -= 1
+                raise
+            async with condition:
+                self._idle.append((connection, time.monotonic()))
+                condition.notify()
+
+    def _reap_idle(self, now: float) -> List[AsyncConnection]:
+        reaped: List[AsyncConnection] = []
+        if self.idle_timeout is None:
+            return reaped
+        while self._idle and self._size > self.min_size and \
+                now - self._idle[0][1] > self.idle_timeout:
+            reaped.append(self._idle.popleft()[0])
+            self._size -= 1
+            self._reaped += 1
+        return reaped
+
+    async def _acquire(self) -> AsyncConnection:
+        condition = self._get_condition()
+        start = time.monotonic()
+        connection: Optional[AsyncConnection] = None
+        closing: List[AsyncConnection] = []
+        try:
+            async with condition:
+                while True:
+                    if self._closed:
+                        raise ConnectionError('Connection pool is closed')
+                    now = time.monotonic()
+                    closing.extend(self._reap_idle(now))
+                    if self._idle:
+                        connection = self._idle.pop()[0]
+                        if not connection.is_alive():
+                            # Replaced below by a new connection that takes over its slot
+                            closing.append(connection)
+                            connection = None
+                            self._dead += 1
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    if self.checkout_timeout is not None:
+                        remaining = start + self.checkout_timeout - now
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeoutError(
+                                f'No connection available after {self.checkout_timeout} seconds')
+                        try:
+                            await asyncio.wait_for(condition.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                    else:
+                        await condition.wait()
+
+                wait_time = time.monotonic() - start
+                self._checkouts += 1
+                self._wait_total += wait_time
+                self._wait_max = max(self._wait_max, wait_time)
+                self._wait_recent.append(wait_time)
+        finally:
+            for idle_connection in closing:
+                await idle_connection.close()
+
+        if self.instrumentation is not None:
+            self.instrumentation.observe_pool_wait(wait_time)
+
+        if connection is None:
+            try:
+                connection = await self._new_connection()
+            except BaseException:
+                async with condition:
+                    self._size -= 1
+                    condition.notify()
+                raise
+        return connection
+
+    async def _release(self, connection: AsyncConnection, discard: bool = False):
+        condition = self._get_condition()
+        async with condition:
+            discard = discard or self._closed or connection.broken
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            condition.notify()
+        if discard:
+            await connection.close()
+
+    @asynccontextmanager
+    async def checkout(self) -> AsyncIterator[AsyncConnection]:
+        connection = await self._acquire()
+        try:
+            yield connection
+        except BaseException:
+            # Includes cancellation mid-response, which leaves the stream unusable
+            await self._release(connection, discard=True)
+            raise
+        await self._release(connection)
+
+    async def _retry(self, idempotent: bool, send: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return await send()
+            except ReadTimeoutError:
+                raise
+            except ConnectionError:
+                if not idempotent or attempt >= self.command_retries:
+                    raise
+            if attempt > 0:
+                await asyncio.sleep(backoff_delay(attempt - 1, self.command_retry_delay,
+                                                  self.max_command_retry_delay))
+            attempt += 1
+            self._retries += 1
+
+    async def send_command(self, message_type: str, payload: Payload) -> Tuple[str, bytes]:
+        async def send() -> Tuple[str, bytes]:
+            async with self.checkout() as connection:
+                return await connection.send_command(message_type=message_type, payload=payload)
+        return await self._retry(message_type in IDEMPOTENT_COMMANDS, send)
+
+    async def close(self):
+        condition = self._get_condition()
+        async with condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            condition.notify_all()
+        for connection in idle:
+            await connection.close()
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of pool occupancy and checkout wait times in seconds."""
+        recent: List[float] = sorted(self._wait_recent)
+        idle = len(self._idle)
+        return {
+            'size': self._size,
+            'idle': idle,
+            'in_use': self._size - idle,
+            'checkouts': self._checkouts,
+            'timeouts': self._timeouts,
+            'reaped': self._reaped,
+            'dead': self._dead,
+            'retries': self._retries,
+            'wait_total': self._wait_total,
+            'wait_max': self._wait_max,
+            'wait_mean': self._wait_total / self._checkouts if self._checkouts else 0.0,
+            'wait_p50': _percentile(recent, 0.50),
+            'wait_p99': _percentile(recent, 0.99),
+        }
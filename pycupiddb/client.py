@@ -1,18 +1,60 @@
-from typing import Any, List, Optional, Literal, Union
-import pandas as pd
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Mapping, Optional, Literal, Sequence, Union
 
 from .commands import SyncCommand, RowFilter
+from .filters import Filters, plan_filters
+from .connection import ReturnType, DataFrameResult, is_dataframe
+from .pipeline import Pipeline
+from .tracing import traced
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from .embedded import EmbeddedStore
+    from .partitioned import PartitionManifest
+    from .prepared import PreparedQuery
+
+
+_MISSING = object()
+
+
+def concat_tables(tables: List['pa.Table'], return_type: Literal['pandas', 'arrow']
+                  ) -> Optional[Union['pd.DataFrame', 'pa.Table']]:
+    """Concatenate Arrow results, converting them to pandas once at the end."""
+    if not tables:
+        return None
+    import pyarrow as pa
+
+    table = pa.concat_tables(tables, promote_options='default')
+    return table if return_type == 'arrow' else table.to_pandas()
 
 
 class CupidClient(SyncCommand):
 
-    def __init__(self, host: str, port: Union[int, str], **kwargs):
+    def __init__(self, host: str = 'localhost', port: Union[int, str] = 5995, **kwargs):
         port_number = int(port) if isinstance(port, str) else port
         super().__init__(host=host, port=port_number, **kwargs)
 
-    def set(self, key: str, value: Any, timeout: float = 0.0):
-        if isinstance(value, pd.DataFrame):
-            self._set_record_batch(key=key, value=value, timeout=timeout, add_only=False)
+    @classmethod
+    def embedded(cls, store: Optional['EmbeddedStore'] = None, **kwargs) -> 'CupidClient':
+        """Client that keeps its data in this process instead of talking to a server.
+
+        Clients built on the same ``store`` share their data. DataFrames are
+        stored as Arrow tables, and ``return_type='arrow'`` returns them
+        without copying or serializing.
+        """
+        from .embedded import EmbeddedConnection
+        if kwargs.get('near_cache') is not None:
+            raise ValueError('An embedded client does not need a near cache')
+        connection = EmbeddedConnection(store, instrumentation=kwargs.get('instrumentation'))
+        return cls(host='', port=0, connection=connection, **kwargs)
+
+    @traced('set')
+    def set(self, key: str, value: Any, timeout: float = 0.0,
+            compression: Optional[Literal['lz4', 'zstd']] = None,
+            compression_level: Optional[int] = None):
+        if is_dataframe(value):
+            self._set_record_batch(key=key, value=value, timeout=timeout, add_only=False,
+                                   compression=compression, compression_level=compression_level)
         elif isinstance(value, int):
             self._set_int(key=key, value=value, timeout=timeout, add_only=False)
         elif isinstance(value, float):
@@ -20,9 +62,13 @@ class CupidClient(SyncCommand):
         else:
             self._set_pickle(key=key, value=value, timeout=timeout, add_only=False)
 
-    def add(self, key: str, value: Any, timeout: float = 0.0) -> bool:
-        if isinstance(value, pd.DataFrame):
-            return self._set_record_batch(key=key, value=value, timeout=timeout, add_only=True)
+    @traced('add')
+    def add(self, key: str, value: Any, timeout: float = 0.0,
+            compression: Optional[Literal['lz4', 'zstd']] = None,
+            compression_level: Optional[int] = None) -> bool:
+        if is_dataframe(value):
+            return self._set_record_batch(key=key, value=value, timeout=timeout, add_only=True,
+                                          compression=compression, compression_level=compression_level)
         elif isinstance(value, int):
             return self._set_int(key=key, value=value, timeout=timeout, add_only=True)
         elif isinstance(value, float):
@@ -36,21 +82,198 @@ class CupidClient(SyncCommand):
     def incr_float(self, key: str, delta: float = 1.0) -> float:
         return self._incr_float(key=key, delta=delta)
 
+    @traced('get_dataframe')
     def get_dataframe(
         self,
         key: str,
         columns: List[str] = [],
         filter_operation: Literal['AND', 'OR'] = 'AND',
-        filters: List[RowFilter] = [],
+        filters: Filters = [],
         result_cache_timeout: float = 0.0,
-        compression_type: Literal['', 'lz4', 'zstd'] = ''
-    ) -> Optional[pd.DataFrame]:
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: ReturnType = 'pandas'
+    ) -> Optional[DataFrameResult]:
         return self._get_dataframe(key=key, columns=columns, filter_operation=filter_operation,
                                    filters=filters, result_cache_timeout=result_cache_timeout,
-                                   compression_type=compression_type)
+                                   compression_type=compression_type, return_type=return_type)
+
+    def get_prepared(self, query: 'PreparedQuery', return_type: ReturnType = 'pandas') -> Optional[DataFrameResult]:
+        """Run a ``PreparedQuery``, sending its cached payload as is."""
+        return self._get_prepared(query=query, return_type=return_type)
+
+    def get_dataframes(
+        self,
+        keys: Sequence[str],
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: Literal['pandas', 'arrow'] = 'pandas',
+        concat: bool = False,
+        max_workers: Optional[int] = None
+    ) -> Union[Dict[str, Union['pd.DataFrame', 'pa.Table']], 'pd.DataFrame', 'pa.Table', None]:
+        """Run the same ``get_dataframe`` query on several keys concurrently.
+
+        Up to ``max_workers`` keys, by default one per pooled connection,
+        are fetched at a time as Arrow, and each result is converted to
+        pandas while the remaining ones are still being fetched. Returns a
+        dict by key that leaves out missing keys, or with ``concat`` all
+        results concatenated in key order, which is None if every key is
+        missing.
+        """
+        keys = list(dict.fromkeys(keys))
+        tables = self._get_tables(keys, convert=return_type == 'pandas' and not concat, max_workers=max_workers,
+                                  columns=columns, filter_operation=filter_operation, filters=filters,
+                                  result_cache_timeout=result_cache_timeout, compression_type=compression_type)
+        if concat:
+            return concat_tables(list(tables.values()), return_type)
+        return tables
+
+    def _get_tables(self, keys: List[str], convert: bool, max_workers: Optional[int],
+                    **query: Any) -> Dict[str, Any]:
+        """Fetch ``keys`` as Arrow tables, and with ``convert`` turn each into pandas as it arrives."""
+        results: Dict[str, Any] = {}
+
+        def fetch(key: str) -> Optional[DataFrameResult]:
+            return self._get_dataframe(key=key, return_type='arrow', **query)
+
+        def finish(key: str, table: Any):
+            if table is not None:
+                results[key] = table.to_pandas() if convert else table
+
+        # Converting on this thread overlaps with the fetches still running on the pool
+        self._map_parallel(fetch, keys, max_workers, on_result=finish)
+        return {key: results[key] for key in keys if key in results}
+
+    def iter_dataframe(
+        self,
+        key: str,
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: Literal['pandas', 'arrow'] = 'pandas'
+    ) -> Iterator[Union['pd.DataFrame', 'pa.RecordBatch']]:
+        """Yield the result one record batch at a time as it arrives off the socket.
+
+        The iterator holds a pooled connection until it is exhausted or
+        closed, so with a single connection no other command can run
+        meanwhile. Closing it early drains the rest of the response.
+        """
+        return self._iter_dataframe(key=key, columns=columns, filter_operation=filter_operation,
+                                    filters=filters, result_cache_timeout=result_cache_timeout,
+                                    compression_type=compression_type, return_type=return_type)
+
+    @traced('get')
+    def get(self, key: str, default: Optional[Any] = None, return_type: ReturnType = 'pandas') -> Optional[Any]:
+        return self._get(key=key, default=default, return_type=return_type)
+
+    def get_many(self, keys: List[str], chunk_size: int = 1000) -> Dict[str, Any]:
+        """Fetch several keys, pipelining up to ``chunk_size`` gets per round trip.
+
+        Keys that do not exist are left out of the returned dict.
+        """
+        result: Dict[str, Any] = {}
+        pipe = self.pipeline()
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            for key in chunk:
+                pipe.get(key=key, default=_MISSING)
+            for key, value in zip(chunk, pipe.execute()):
+                if value is not _MISSING:
+                    result[key] = value
+        return result
+
+    def set_many(self, mapping: Mapping[str, Any], timeout: float = 0.0, chunk_size: int = 1000,
+                 max_chunk_bytes: int = 64 * 1024 * 1024):
+        """Set several values with the same type dispatch as ``set``.
+
+        Commands are pipelined and flushed every ``chunk_size`` keys or
+        ``max_chunk_bytes`` of encoded values, whichever comes first.
+        """
+        pipe = self.pipeline()
+        for key, value in mapping.items():
+            pipe.set(key=key, value=value, timeout=timeout)
+            if len(pipe) >= chunk_size or pipe.nbytes >= max_chunk_bytes:
+                pipe.execute()
+        pipe.execute()
+
+    def set_partitioned(self, key: str, value: 'pd.DataFrame', partition_by: str, freq: Optional[str] = None,
+                        partition_rows: int = 1000000, timeout: float = 0.0,
+                        compression: Optional[Literal['lz4', 'zstd']] = None,
+                        compression_level: Optional[int] = None, max_workers: Optional[int] = None) -> int:
+        """Store ``value`` as one key per partition plus a manifest under ``key``.
+
+        Partitions are ``freq`` periods of the ``partition_by`` column or
+        index level, such as ``'M'`` for months, or else runs of
+        ``partition_rows`` rows sorted by it. The manifest records the range
+        of every column in every partition, which ``get_partitioned`` uses
+        to skip partitions. Returns the number of partitions.
+        """
+        import pyarrow as pa
+        from .partitioned import PartitionManifest, column_stats, split_frame
+
+        previous = self._get_manifest(key)
+        frames = split_frame(value, partition_by, freq, partition_rows)
+        keys = PartitionManifest.partition_keys(key, len(frames))
+
+        def upload(index: int) -> Dict[str, Any]:
+            record_batch = pa.record_batch(frames[index])
+            self._set_arrow_batch(key=keys[index], record_batch=record_batch, timeout=timeout, add_only=False,
+                                  compression=compression, compression_level=compression_level)
+            return {'key': keys[index], 'rows': record_batch.num_rows, 'stats': column_stats(record_batch)}
 
-    def get(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
-        return self._get(key=key, default=default)
+        partitions = self._map_parallel(upload, list(range(len(frames))), max_workers)
+        # The manifest goes last, so readers never see partitions that are not there yet
+        self.set(key=key, value=PartitionManifest(key, partition_by, partitions).to_dict(), timeout=timeout)
+        if previous is not None:
+            self._delete_many(keys=previous.keys)
+        return len(partitions)
+
+    def get_partitioned(
+        self,
+        key: str,
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        return_type: Literal['pandas', 'arrow'] = 'pandas',
+        max_workers: Optional[int] = None
+    ) -> Optional[Union['pd.DataFrame', 'pa.Table']]:
+        """``get_dataframe`` for a value stored with ``set_partitioned``.
+
+        Partitions whose column ranges rule out the filters are skipped,
+        and the rest are fetched in parallel, up to ``max_workers`` at a
+        time or one per pooled connection, and concatenated as Arrow.
+        Returns None if the manifest or any partition is missing.
+        """
+        manifest = self._get_manifest(key)
+        if manifest is None:
+            return None
+        _, operation, row_filters, _ = plan_filters(columns, filter_operation, filters)
+        # With every partition ruled out, one is still fetched for the columns of the empty result
+        keys = manifest.matching(operation, row_filters) or manifest.keys[:1]
+
+        tables = self._get_tables(keys, convert=False, max_workers=max_workers, columns=columns,
+                                  filter_operation=filter_operation, filters=filters)
+        if len(tables) < len(keys):
+            return None
+        return concat_tables(list(tables.values()), return_type)
+
+    def delete_partitioned(self, key: str) -> bool:
+        """Delete the manifest and partitions of a value stored with ``set_partitioned``."""
+        manifest = self._get_manifest(key)
+        if manifest is None:
+            return False
+        self._delete_many(keys=manifest.keys + [key])
+        return True
+
+    def _get_manifest(self, key: str) -> Optional['PartitionManifest']:
+        from .partitioned import PartitionManifest
+
+        value = self._get(key=key, default=None)
+        return PartitionManifest.from_value(key, value) if value is not None else None
 
     def delete(self, key: str) -> bool:
         return self._delete(key=key)
@@ -72,3 +295,6 @@ class CupidClient(SyncCommand):
 
     def flush(self):
         return self._flush()
+
+    def pipeline(self) -> Pipeline:
+        return Pipeline(client=self)
@@ -0,0 +1,212 @@
+import json
+import pickle
+import struct
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Union
+
+from .exceptions import DeserializationError
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+
+# No pickle stream starts with a zero byte, so a tagged value can never be
+# mistaken for a plain pickle written by an older client
+CODEC_MAGIC = b'\x00CPC'
+
+Buffer = Union[bytes, bytearray, memoryview, 'pa.Buffer']
+
+
+class Codec(ABC):
+    """Encoding for values stored with the 'B' data type.
+
+    Subclasses set a unique ``name``, which is written in front of every
+    value they encode so that readers can pick the same codec to decode it.
+    """
+
+    name = ''
+
+    def can_encode(self, value: Any) -> bool:
+        return True
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        ...
+
+    def encode_buffers(self, value: Any) -> List[Buffer]:
+        """``encode`` as a list of buffers that are sent back to back without joining them."""
+        return [self.encode(value)]
+
+    @abstractmethod
+    def decode(self, data: memoryview) -> Any:
+        ...
+
+
+class PickleBufferCodec(Codec):
+    """Pickle protocol 5 with out-of-band buffers.
+
+    Large contiguous buffers such as ndarray data are kept out of the pickle
+    stream and are not copied again on decode; the returned arrays are
+    views into the received payload.
+    """
+
+    name = 'pickle5'
+
+    def encode(self, value: Any) -> bytes:
+        return b''.join(self.encode_buffers(value))
+
+    def encode_buffers(self, value: Any) -> List[Buffer]:
+        # The out-of-band buffers are views of the original data and are sent without copying them
+        buffers: List[pickle.PickleBuffer] = []
+        data = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+        raw_buffers = [buffer.raw() for buffer in buffers]
+        header = struct.pack(f'>I{len(raw_buffers) + 1}Q', len(raw_buffers), len(data),
+                             *(raw.nbytes for raw in raw_buffers))
+        return [header, data, *raw_buffers]
+
+    def decode(self, data: memoryview) -> Any:
+        buffer_count = struct.unpack_from('>I', data)[0]
+        lengths = struct.unpack_from(f'>{buffer_count + 1}Q', data, 4)
+        offset = 4 + 8 * len(lengths)
+        pickle_data = data[offset:offset + lengths[0]]
+        offset += lengths[0]
+        buffers = []
+        for length in lengths[1:]:
+            buffers.append(data[offset:offset + length])
+            offset += length
+        return pickle.loads(pickle_data, buffers=buffers)
+
+
+class JsonCodec(Codec):
+    """JSON, using orjson when it is installed.
+
+    Only lossless for JSON documents: tuples come back as lists, and the
+    standard library encoder turns non-string dict keys into strings.
+    """
+
+    name = 'json'
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:  # pragma: no cover
+            orjson = None
+        self.orjson = orjson
+
+    def encode(self, value: Any) -> bytes:
+        if self.orjson is not None:
+            return self.orjson.dumps(value, option=self.orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(value, separators=(',', ':')).encode()
+
+    def decode(self, data: memoryview) -> Any:
+        if self.orjson is not None:
+            return self.orjson.loads(data)
+        return json.loads(bytes(data))
+
+
+class MsgpackCodec(Codec):
+    """MessagePack; requires the ``msgpack`` package."""
+
+    name = 'msgpack'
+
+    def __init__(self):
+        import msgpack  # type: ignore[import-not-found]
+        self.msgpack = msgpack
+
+    def encode(self, value: Any) -> bytes:
+        return self.msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data: memoryview) -> Any:
+        return self.msgpack.unpackb(data, raw=False)
+
+
+class ArrowTensorCodec(Codec):
+    """Numeric ndarrays as Arrow IPC tensors.
+
+    Decoded arrays are read-only views into the received payload.
+    """
+
+    name = 'arrow_tensor'
+
+    def can_encode(self, value: Any) -> bool:
+        import numpy as np
+        return isinstance(value, np.ndarray) and value.dtype.kind in 'iuf'
+
+    def encode(self, value: Any) -> bytes:
+        import pyarrow as pa
+        sink = pa.BufferOutputStream()
+        pa.ipc.write_tensor(pa.Tensor.from_numpy(value), sink)
+        return sink.getvalue().to_pybytes()
+
+    def decode(self, data: memoryview) -> Any:
+        import pyarrow as pa
+        return pa.ipc.read_tensor(pa.BufferReader(pa.py_buffer(data))).to_numpy()
+
+
+BUILTIN_CODECS: Dict[str, Callable[[], Codec]] = {
+    PickleBufferCodec.name: PickleBufferCodec,
+    JsonCodec.name: JsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+    ArrowTensorCodec.name: ArrowTensorCodec,
+}
+
+
+class CodecRegistry:
+    """Maps value types to the codec used to store them.
+
+    Values whose type (or a base class of it) has no codec, or whose codec
+    declines them in ``can_encode``, are pickled as before. Decoding looks
+    codecs up by name, falling back to the built-in ones, so a client
+    reads tagged values without registering anything.
+    """
+
+    def __init__(self):
+        self.codecs: Dict[str, Codec] = {}
+        self.types: Dict[type, Codec] = {}
+
+    def register(self, codec: Codec, types: Iterable[type] = ()) -> 'CodecRegistry':
+        name_bytes = codec.name.encode()
+        assert 0 < len(name_bytes) < 256
+        self.codecs[codec.name] = codec
+        for value_type in types:
+            self.types[value_type] = codec
+        return self
+
+    def codec_for(self, value: Any) -> Optional[Codec]:
+        for value_type in type(value).__mro__:
+            codec = self.types.get(value_type)
+            if codec is not None:
+                return codec if codec.can_encode(value) else None
+        return None
+
+    def get(self, name: str) -> Codec:
+        codec = self.codecs.get(name)
+        if codec is None:
+            if name not in BUILTIN_CODECS:
+                raise DeserializationError(f'Unknown codec {name!r}')
+            codec = self.codecs[name] = BUILTIN_CODECS[name]()
+        return codec
+
+
+_builtin_registry = CodecRegistry()
+
+
+def encode_tagged(codec: Codec, value: Any) -> List[Buffer]:
+    name_bytes = codec.name.encode()
+    return [b''.join([CODEC_MAGIC, struct.pack('B', len(name_bytes)), name_bytes]), *codec.encode_buffers(value)]
+
+
+def is_tagged(payload: Buffer) -> bool:
+    return payload[:len(CODEC_MAGIC)] == CODEC_MAGIC
+
+
+def decode_tagged(payload: Buffer, registry: Optional[CodecRegistry] = None) -> Any:
+    view = memoryview(payload)
+    offset = len(CODEC_MAGIC)
+    name_length = view[offset]
+    name = bytes(view[offset + 1:offset + 1 + name_length]).decode()
+    codec = (registry or _builtin_registry).get(name)
+    try:
+        return codec.decode(view[offset + 1 + name_length:])
+    except Exception as e:
+        raise DeserializationError(f'Cannot decode value with codec {name!r}') from e
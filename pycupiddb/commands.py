@@ -1,115 +1,140 @@
+import io
 import json
 import struct
 import pickle
-from datetime import date, datetime
-from typing import Any, List, Dict, Literal, Optional
-import pyarrow as pa
-import pandas as pd
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List, Dict, Literal, Optional, Tuple, TypeVar, Union
 
-from .connection import SyncConnection, Serializer
+from .codec import CodecRegistry, encode_tagged
+from .instrumentation import Instrumentation
+from .connection import Serializer, ReturnType, DataFrameResult, Buffer, Payload, ResponsePayload, ValueData, \
+    INT64, FLOAT64, UINT64, is_dataframe, new_executor
+from .filters import RowFilter, Filters, plan_filters
+from .near_cache import NearCache
+from .pool import ConnectionPool
+from .tracing import current_call
+from .transport import Transport, resolve_transport
 
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from .embedded import EmbeddedConnection
+    from .filters import FilterPlan
+    from .prepared import PreparedQuery
 
-class RowFilter():
 
-    def __init__(self, column: str, logic: Literal['gte', 'gt', 'lte', 'lt', 'eq', 'ne'],
-                 value: Any, data_type: Literal['int', 'float', 'date',
-                                                'datetime', 'string', 'bool']):
-        assert isinstance(column, str)
-        assert logic in ['gte', 'gt', 'lte', 'lt', 'eq', 'ne']
-        assert data_type in ['int', 'float', 'date', 'datetime', 'string', 'bool']
-        self.query_dict: Dict[str, Any] = {
-            'col': column,
-            'filter_type': logic,
-        }
+T = TypeVar('T')
+R = TypeVar('R')
 
-        if data_type == 'int':
-            assert isinstance(value, int)
-            self.query_dict['data_type'] = 'IN'
-            self.query_dict['value_int'] = value
-        elif data_type == 'float':
-            assert isinstance(value, float)
-            self.query_dict['data_type'] = 'FL'
-            self.query_dict['value_flt'] = value
-        elif data_type == 'date':
-            assert isinstance(value, date)
-            self.query_dict['data_type'] = 'DA'
-            self.query_dict['value_int'] = (value - date(1970, 1, 1)).days
-        elif data_type == 'datetime':
-            assert isinstance(value, datetime)
-            self.query_dict['data_type'] = 'DT'
-            self.query_dict['value_int'] = int(value.timestamp() * (10**9))
-        elif data_type == 'string':
-            assert isinstance(value, str)
-            self.query_dict['data_type'] = 'ST'
-            self.query_dict['value_str'] = value
-        elif data_type == 'bool':
-            assert isinstance(value, bool)
-            assert logic == 'eq'
-            self.query_dict['data_type'] = 'BL'
-            self.query_dict['value_bol'] = value
-
-
-class SyncCommand(SyncConnection, Serializer):
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def _set_record_batch(self, key: str, value: pd.DataFrame, timeout: float, add_only: bool) -> bool:
-        record_barch = pa.record_batch(value)
+# Timeout in milliseconds, add only flag and key length of a set
+SET_DATA = struct.Struct('>Q?H')
 
-        sink = pa.BufferOutputStream()
-        with pa.ipc.new_stream(sink, record_barch.schema) as writer:
-            writer.write_batch(record_barch)
-        record_batch_buffer = sink.getvalue()
-        rb_payload = record_batch_buffer.to_pybytes()
 
-        return self._set_data(data_type='A', key=key, byte_data=rb_payload,
-                              timeout=timeout, add_only=add_only)
+class CommandEncoder:
+    """Builds request payloads; shared by the sync and async clients."""
 
-    def _set_int(self, key: str, value: int, timeout: float, add_only: bool) -> bool:
-        payload = struct.pack('>q', value)
-        return self._set_data(data_type='I', key=key, byte_data=payload,
-                              timeout=timeout, add_only=add_only)
+    codecs: Optional[CodecRegistry] = None
 
-    def _set_float(self, key: str, value: float, timeout: float, add_only: bool) -> bool:
-        payload = struct.pack('>d', value)
-        return self._set_data(data_type='F', key=key, byte_data=payload,
-                              timeout=timeout, add_only=add_only)
+    def _ipc_write_options(self, compression: Optional[Literal['lz4', 'zstd']],
+                           compression_level: Optional[int]) -> Optional['pa.ipc.IpcWriteOptions']:
+        if compression is None:
+            return None
+        import pyarrow as pa
 
-    def _set_pickle(self, key: str, value: Any, timeout: float, add_only: bool) -> bool:
-        return self._set_data(data_type='B', key=key, byte_data=pickle.dumps(value),
-                              timeout=timeout, add_only=add_only)
+        assert compression in ['lz4', 'zstd']
+        codec = pa.Codec(compression, compression_level=compression_level)
+        return pa.ipc.IpcWriteOptions(compression=codec)
 
-    def _set_data(self, data_type: str, key: str, byte_data: bytes, timeout: float, add_only: bool) -> bool:
-        cache_time_bytes = struct.pack('>Q', int(timeout * 1000))
-        add_only_bytes = struct.pack('?', add_only)
+    def _serialize_record_batch(self, record_batch: 'pa.RecordBatch',
+                                options: Optional['pa.ipc.IpcWriteOptions'] = None) -> 'pa.Buffer':
+        import pyarrow as pa
 
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, record_batch.schema, options=options) as writer:
+            writer.write_batch(record_batch)
+        # Sent as is, as copying it into bytes would double the peak memory of large uploads
+        return sink.getvalue()
+
+    def _encode_record_batch(self, value: 'pd.DataFrame', compression: Optional[Literal['lz4', 'zstd']] = None,
+                             compression_level: Optional[int] = None) -> 'pa.Buffer':
+        import pyarrow as pa
+
+        options = self._ipc_write_options(compression, compression_level)
+        return self._serialize_record_batch(pa.record_batch(value), options=options)
+
+    def _write_record_batch_stream(self, sink: Union[io.IOBase, 'pa.NativeFile'], value: 'pd.DataFrame',
+                                   schema: 'pa.Schema', chunk_rows: int,
+                                   options: Optional['pa.ipc.IpcWriteOptions'] = None) -> Tuple[int, int]:
+        """Convert and write ``value`` as an IPC stream of ``chunk_rows`` sized batches.
+
+        Returns the number of batches and their uncompressed Arrow size in bytes.
+        """
+        import pyarrow as pa
+
+        batches = 0
+        raw_bytes = 0
+        with pa.ipc.new_stream(sink, schema, options=options) as writer:
+            for start in range(0, len(value), chunk_rows):
+                record_batch = pa.RecordBatch.from_pandas(value.iloc[start:start + chunk_rows], schema=schema)
+                writer.write_batch(record_batch)
+                batches += 1
+                raw_bytes += record_batch.nbytes
+        return batches, raw_bytes
+
+    def _encode_int(self, value: int) -> bytes:
+        return INT64.pack(value)
+
+    def _encode_float(self, value: float) -> bytes:
+        return FLOAT64.pack(value)
+
+    def _encode_pickle(self, value: Any) -> ValueData:
+        if self.codecs is not None:
+            codec = self.codecs.codec_for(value)
+            if codec is not None:
+                return encode_tagged(codec, value)
+        return pickle.dumps(value)
+
+    def _encode_value(self, value: Any) -> Tuple[str, ValueData]:
+        """Same type dispatch as ``CupidClient.set``, returning the data type and buffers."""
+        if is_dataframe(value):
+            return 'A', self._encode_record_batch(value)
+        elif isinstance(value, int):
+            return 'I', self._encode_int(value)
+        elif isinstance(value, float):
+            return 'F', self._encode_float(value)
+        else:
+            return 'B', self._encode_pickle(value)
+
+    def _encode_set_data_header(self, data_type: str, key: str, timeout: float, add_only: bool) -> bytes:
+        """Everything of an SD payload that comes before the value."""
         key_bytes = key.encode()
         key_len = len(key_bytes)
         assert key_len < 65536
-        key_length_bytes = struct.pack('>H', key_len)
-
         assert data_type in ['A', 'B', 'I', 'F']
-        data_type_byte = data_type.encode()
+        return b''.join([SET_DATA.pack(int(timeout * 1000), add_only, key_len), key_bytes, data_type.encode()])
 
-        payload = cache_time_bytes + add_only_bytes + key_length_bytes + key_bytes + \
-                  data_type_byte + byte_data
-        response_type, payload = self.send_command(message_type='SD', payload=payload)
-        return self._process_set_data(response_type, payload)
+    def _encode_set_data(self, data_type: str, key: str, byte_data: ValueData, timeout: float,
+                         add_only: bool) -> List[Buffer]:
+        # The value is sent after the header as its own buffers instead of being copied onto it
+        header = self._encode_set_data_header(data_type=data_type, key=key, timeout=timeout, add_only=add_only)
+        return [header, *byte_data] if isinstance(byte_data, list) else [header, byte_data]
 
-    def _incr(self, key: str, delta: int) -> int:
-        payload = struct.pack('>q', delta) + key.encode()
-        response_type, payload = self.send_command(message_type='II', payload=payload)
-        return self._process_incr(response_type, payload)
+    def _encode_incr(self, key: str, delta: int) -> bytes:
+        return INT64.pack(delta) + key.encode()
 
-    def _incr_float(self, key: str, delta: float) -> float:
-        payload = struct.pack('>d', delta) + key.encode()
-        response_type, payload = self.send_command(message_type='IF', payload=payload)
-        return self._process_incr_float(response_type, payload)
+    def _encode_incr_float(self, key: str, delta: float) -> bytes:
+        return FLOAT64.pack(delta) + key.encode()
 
-    def _get_dataframe(self, key: str, columns: List[str] = [], filter_operation: str = 'AND',
-                       filters: List[RowFilter] = [], result_cache_timeout: float = 0.0,
-                       compression_type: Literal['', 'lz4', 'zstd'] = '') -> Optional[pd.DataFrame]:
+    def _encode_key(self, key: str) -> bytes:
+        key_bytes = key.encode()
+        key_len = len(key)
+        assert key_len < 65536
+        return key_bytes
+
+    def _encode_get_dataframe(self, key: str, columns: List[str], filter_operation: str,
+                              filters: List[RowFilter], result_cache_timeout: float,
+                              compression_type: str) -> bytes:
         query_dict = {
             'key': key,
             'columns': columns,
@@ -118,69 +143,352 @@ class SyncCommand(SyncConnection, Serializer):
             'cachetime': int(result_cache_timeout * 1000),
             'compression_type': compression_type,
         }
-        payload = json.dumps(query_dict, separators=(',', ':')).encode()
+        return json.dumps(query_dict, separators=(',', ':')).encode()
 
-        response_type, payload = self.send_command(message_type='GA', payload=payload)
-        return self._process_get_dataframe_response(response_type=response_type, payload=payload)
+    def _encode_delete_many(self, keys: List[str]) -> bytes:
+        encoded_list = [k.encode() for k in keys if len(k) < 65536]
+        assert len(encoded_list) < 65536
+        return b'\x00'.join(encoded_list)
 
-    def _get(self, key: str, default: Optional[Any]) -> Optional[Any]:
-        key_bytes = key.encode()
-        key_len = len(key)
-        assert key_len < 65536
+    def _encode_touch(self, key: str, timeout: float) -> bytes:
+        return UINT64.pack(int(timeout * 1000)) + self._encode_key(key)
 
-        response_type, payload = self.send_command(message_type='GD', payload=key_bytes)
-        return self._process_get_response(response_type=response_type, payload=payload, default=default)
+    def _encode_keys(self, pattern: Optional[str]) -> bytes:
+        if pattern is None:
+            return bytes()
+        return pattern.encode()
+
+
+class SyncCommand(CommandEncoder, Serializer):
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        min_connections: int = 1,
+        max_connections: int = 1,
+        checkout_timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        upload_chunk_bytes: int = 16 * 1024 * 1024,
+        near_cache: Optional[NearCache] = None,
+        codecs: Optional[CodecRegistry] = None,
+        connection: Optional['EmbeddedConnection'] = None,
+        unix_socket_path: Optional[str] = None,
+        transport: Optional[Transport] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        **kwargs
+    ):
+        self.host = host
+        self.port = port
+        self.codecs = codecs
+        self.upload_chunk_bytes = upload_chunk_bytes
+        self.near_cache = near_cache
+        self.instrumentation = instrumentation
+        self._local = threading.local()
+        self.connection: Union[ConnectionPool, 'EmbeddedConnection']
+        if connection is not None:
+            self.connection = connection
+        else:
+            self.connection = ConnectionPool(host=host, port=port, min_size=min_connections,
+                                             max_size=max_connections, checkout_timeout=checkout_timeout,
+                                             idle_timeout=idle_timeout, instrumentation=instrumentation,
+                                             transport=resolve_transport(unix_socket_path, transport), **kwargs)
+
+    def send_command(self, message_type: str, payload: Payload) -> Tuple[str, ResponsePayload]:
+        return self.connection.send_command(message_type=message_type, payload=payload)
+
+    def _send_cached_command(self, key: str, message_type: str, payload: bytes) -> Tuple[str, ResponsePayload]:
+        """Serve a read command from the near cache, or fetch it together with the key's TTL."""
+        assert self.near_cache is not None
+        cache_key = (message_type, bytes(payload))
+        cached = self.near_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Taken before sending, so that a write of this client landing in between is not undone by the put
+        generation = self.near_cache.generation()
+        (response_type, response), (ttl_type, ttl_payload) = self.connection.send_commands([
+            (message_type, payload),
+            ('TL', self._encode_key(key)),
+        ])
+        if response_type != 'ER':
+            server_ttl = self._process_ttl_response(ttl_type, ttl_payload)
+            if server_ttl is not None:
+                self.near_cache.put(key=key, cache_key=cache_key, response_type=response_type,
+                                    payload=response, server_ttl=server_ttl, generation=generation)
+        return response_type, response
+
+    def _invalidate(self, keys: List[str]):
+        if self.near_cache is not None:
+            for key in keys:
+                self.near_cache.invalidate(key)
+
+    def _max_workers(self) -> int:
+        """How many requests can run at once: one per connection of the pool."""
+        return self.connection.max_size if isinstance(self.connection, ConnectionPool) else 1
+
+    def _map_parallel(self, function: Callable[[T], R], items: List[T], max_workers: Optional[int],
+                      on_result: Optional[Callable[[T, R], None]] = None) -> List[R]:
+        """``[function(item) for item in items]``, running up to ``max_workers`` calls at a time.
+
+        ``on_result(item, result)`` runs on this thread as each call completes,
+        overlapping with the calls still running. On an error the calls not
+        yet started are cancelled.
+        """
+        workers = min(len(items), max_workers if max_workers is not None else self._max_workers())
+        if workers <= 1:
+            results = []
+            for item in items:
+                results.append(function(item))
+                if on_result is not None:
+                    on_result(item, results[-1])
+            return results
+        from concurrent.futures import as_completed
+        with new_executor(workers, thread_name_prefix='cupiddb') as executor:
+            futures = {executor.submit(function, item): item for item in items}
+            try:
+                for future in as_completed(futures):
+                    if on_result is not None:
+                        on_result(futures[future], future.result())
+                    else:
+                        future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            return [future.result() for future in futures]
+
+    def pool_stats(self) -> Dict[str, float]:
+        return self.connection.stats()
+
+    def close(self):
+        self.connection.close()
+
+    def last_upload_stats(self) -> Optional[Dict[str, Any]]:
+        """Sizes of the last DataFrame uploaded by the calling thread.
+
+        ``raw_bytes`` is the uncompressed Arrow size and ``payload_bytes``
+        the IPC stream actually sent, so their ratio shows what compression
+        saved.
+        """
+        return getattr(self._local, 'upload_stats', None)
+
+    def _record_upload_stats(self, compression: Optional[str], record_batches: int, raw_bytes: int,
+                             payload_bytes: int):
+        self._local.upload_stats = {
+            'compression': compression,
+            'record_batches': record_batches,
+            'raw_bytes': raw_bytes,
+            'payload_bytes': payload_bytes,
+        }
 
-    def _delete(self, key: str) -> bool:
-        key_bytes = key.encode()
-        key_len = len(key)
-        assert key_len < 65536
+    def _set_record_batch(self, key: str, value: 'pd.DataFrame', timeout: float, add_only: bool,
+                          compression: Optional[Literal['lz4', 'zstd']] = None,
+                          compression_level: Optional[int] = None) -> bool:
+        frame_bytes = int(value.memory_usage(index=True, deep=False).sum())
+        if frame_bytes > self.upload_chunk_bytes:
+            return self._set_record_batch_streamed(key=key, value=value, timeout=timeout, add_only=add_only,
+                                                   frame_bytes=frame_bytes, compression=compression,
+                                                   compression_level=compression_level)
+        import pyarrow as pa
+
+        call = current_call()
+        start = time.perf_counter()
+        record_batch = pa.record_batch(value)
+        if call is not None:
+            call.add_since('convert', start)
+        return self._set_arrow_batch(key=key, record_batch=record_batch, timeout=timeout, add_only=add_only,
+                                     compression=compression, compression_level=compression_level)
+
+    def _set_arrow_batch(self, key: str, record_batch: 'pa.RecordBatch', timeout: float, add_only: bool,
+                         compression: Optional[Literal['lz4', 'zstd']] = None,
+                         compression_level: Optional[int] = None) -> bool:
+        call = current_call()
+        start = time.perf_counter()
+        options = self._ipc_write_options(compression, compression_level)
+        payload = self._serialize_record_batch(record_batch, options=options)
+        if call is not None:
+            call.add_since('encode', start)
+            call.record_batches += 1
+            call.rows += record_batch.num_rows
+        self._record_upload_stats(compression=compression, record_batches=1,
+                                  raw_bytes=record_batch.nbytes, payload_bytes=len(payload))
+        return self._set_data(data_type='A', key=key, byte_data=payload,
+                              timeout=timeout, add_only=add_only)
 
-        response_type, payload = self.send_command(message_type='DL', payload=key_bytes)
-        return self._process_delete(response_type, payload)
+    def _set_record_batch_streamed(self, key: str, value: 'pd.DataFrame', timeout: float, add_only: bool,
+                                   frame_bytes: int, compression: Optional[Literal['lz4', 'zstd']] = None,
+                                   compression_level: Optional[int] = None) -> bool:
+        """Upload a large frame in bounded record batches written straight to the socket.
+
+        The frame is serialized twice: once into a ``MockOutputStream`` that
+        only counts bytes, to fill in the payload length of the header, and
+        once onto the connection. Only one chunk is held in Arrow form at a
+        time. With compression this also means each chunk is compressed
+        twice.
+        """
+        import pyarrow as pa
+
+        call = current_call()
+        start = time.perf_counter()
+        schema = pa.Schema.from_pandas(value)
+        chunk_rows = max(1, len(value) * self.upload_chunk_bytes // frame_bytes)
+        options = self._ipc_write_options(compression, compression_level)
+
+        counter = pa.MockOutputStream()
+        record_batches, raw_bytes = self._write_record_batch_stream(counter, value=value, schema=schema,
+                                                                    chunk_rows=chunk_rows, options=options)
+        if call is not None:
+            # The counting pass; the second pass is timed as part of sending
+            call.add_since('encode', start)
+            call.record_batches += record_batches
+            call.rows += len(value)
+        self._record_upload_stats(compression=compression, record_batches=record_batches,
+                                  raw_bytes=raw_bytes, payload_bytes=counter.size())
+        header = self._encode_set_data_header(data_type='A', key=key, timeout=timeout, add_only=add_only)
+
+        def write_payload(sink: io.BufferedIOBase):
+            sink.write(header)
+            self._write_record_batch_stream(sink, value=value, schema=schema, chunk_rows=chunk_rows,
+                                            options=options)
+
+        with self.connection.checkout() as connection:
+            response_type, payload = connection.send_streamed_command(
+                message_type='SD', payload_length=len(header) + counter.size(), write_payload=write_payload)
+        self._invalidate([key])
+        return self._process_set_data(response_type, payload)
 
-    def _delete_many(self, keys: List[str]) -> int:
-        encoded_list = [k.encode() for k in keys if len(k) < 65536]
-        assert len(encoded_list) < 65536
-        payload = b'\x00'.join(encoded_list)
+    def _set_int(self, key: str, value: int, timeout: float, add_only: bool) -> bool:
+        payload = self._encode_int(value)
+        return self._set_data(data_type='I', key=key, byte_data=payload,
+                              timeout=timeout, add_only=add_only)
 
-        response_type, payload = self.send_command(message_type='DM', payload=payload)
-        return self._process_delete_many(response_type, payload)
+    def _set_float(self, key: str, value: float, timeout: float, add_only: bool) -> bool:
+        payload = self._encode_float(value)
+        return self._set_data(data_type='F', key=key, byte_data=payload,
+                              timeout=timeout, add_only=add_only)
 
-    def _touch(self, key: str, timeout: float) -> bool:
-        cache_time_bytes = struct.pack('>Q', int(timeout * 1000))
+    def _set_pickle(self, key: str, value: Any, timeout: float, add_only: bool) -> bool:
+        call = current_call()
+        start = time.perf_counter()
+        byte_data = self._encode_pickle(value)
+        if call is not None:
+            call.add_since('encode', start)
+        return self._set_data(data_type='B', key=key, byte_data=byte_data,
+                              timeout=timeout, add_only=add_only)
 
-        key_bytes = key.encode()
-        key_len = len(key)
-        assert key_len < 65536
+    def _set_data(self, data_type: str, key: str, byte_data: ValueData, timeout: float, add_only: bool) -> bool:
+        payload = self._encode_set_data(data_type=data_type, key=key, byte_data=byte_data,
+                                        timeout=timeout, add_only=add_only)
+        response_type, response = self.send_command(message_type='SD', payload=payload)
+        self._invalidate([key])
+        return self._process_set_data(response_type, response)
 
-        response_type, payload = self.send_command(message_type='TH',
-                                                   payload=cache_time_bytes + key_bytes)
-        return self._process_touch_response(response_type, payload)
+    def _incr(self, key: str, delta: int) -> int:
+        payload = self._encode_incr(key=key, delta=delta)
+        response_type, response = self.send_command(message_type='II', payload=payload)
+        self._invalidate([key])
+        return self._process_incr(response_type, response)
 
-    def _ttl(self, key: str) -> Optional[float]:
-        key_bytes = key.encode()
-        key_len = len(key)
-        assert key_len < 65536
+    def _incr_float(self, key: str, delta: float) -> float:
+        payload = self._encode_incr_float(key=key, delta=delta)
+        response_type, response = self.send_command(message_type='IF', payload=payload)
+        self._invalidate([key])
+        return self._process_incr_float(response_type, response)
+
+    def _get_dataframe(self, key: str, columns: List[str] = [], filter_operation: str = 'AND',
+                       filters: Filters = [], result_cache_timeout: float = 0.0,
+                       compression_type: Literal['', 'lz4', 'zstd'] = '',
+                       return_type: ReturnType = 'pandas') -> Optional[DataFrameResult]:
+        call = current_call()
+        start = time.perf_counter()
+        columns, filter_operation, row_filters, plan = plan_filters(columns, filter_operation, filters)
+        payload = self._encode_get_dataframe(key=key, columns=columns, filter_operation=filter_operation,
+                                             filters=row_filters, result_cache_timeout=result_cache_timeout,
+                                             compression_type=compression_type)
+        if call is not None:
+            call.add_since('encode', start)
+        return self._send_get_dataframe(key=key, payload=payload, return_type=return_type, plan=plan)
+
+    def _get_prepared(self, query: 'PreparedQuery', return_type: ReturnType = 'pandas') -> Optional[DataFrameResult]:
+        return self._send_get_dataframe(key=query.key, payload=query.payload, return_type=return_type,
+                                        plan=query.plan)
+
+    def _send_get_dataframe(self, key: str, payload: bytes, return_type: ReturnType,
+                            plan: Optional['FilterPlan']) -> Optional[DataFrameResult]:
+        if self.near_cache is not None:
+            response_type, response = self._send_cached_command(key=key, message_type='GA', payload=payload)
+        else:
+            response_type, response = self.send_command(message_type='GA', payload=payload)
+        return self._process_get_dataframe_response(response_type=response_type, payload=response,
+                                                    return_type=return_type, plan=plan)
+
+    def _iter_dataframe(self, key: str, columns: List[str] = [], filter_operation: str = 'AND',
+                        filters: Filters = [], result_cache_timeout: float = 0.0,
+                        compression_type: Literal['', 'lz4', 'zstd'] = '',
+                        return_type: Literal['pandas', 'arrow'] = 'pandas'
+                        ) -> Iterator[Union['pd.DataFrame', 'pa.RecordBatch']]:
+        import pyarrow as pa
+
+        columns, filter_operation, row_filters, plan = plan_filters(columns, filter_operation, filters)
+        payload = self._encode_get_dataframe(key=key, columns=columns, filter_operation=filter_operation,
+                                             filters=row_filters, result_cache_timeout=result_cache_timeout,
+                                             compression_type=compression_type)
+        with self.connection.checkout() as connection:
+            with connection.stream_command(message_type='GA', payload=payload) as (response_type, reader):
+                if response_type != 'AR':
+                    # Missing keys end the iteration, other errors raise
+                    self._process_get_dataframe_response(response_type=response_type, payload=reader.read())
+                    return
+                try:
+                    for record_batch in pa.ipc.open_stream(reader):
+                        if plan is not None:
+                            record_batch = plan.apply_batch(record_batch)
+                        yield record_batch if return_type == 'arrow' else record_batch.to_pandas()
+                except GeneratorExit:
+                    # The consumer stopped early; leaving the block drains the rest of the payload
+                    return
+
+    def _get(self, key: str, default: Optional[Any], return_type: ReturnType = 'pandas') -> Optional[Any]:
+        if self.near_cache is not None:
+            response_type, payload = self._send_cached_command(key=key, message_type='GD',
+                                                               payload=self._encode_key(key))
+        else:
+            response_type, payload = self.send_command(message_type='GD', payload=self._encode_key(key))
+        return self._process_get_response(response_type=response_type, payload=payload, default=default,
+                                          return_type=return_type)
+
+    def _delete(self, key: str) -> bool:
+        response_type, payload = self.send_command(message_type='DL', payload=self._encode_key(key))
+        self._invalidate([key])
+        return self._process_delete(response_type, payload)
+
+    def _delete_many(self, keys: List[str]) -> int:
+        payload = self._encode_delete_many(keys)
+        response_type, response = self.send_command(message_type='DM', payload=payload)
+        self._invalidate(keys)
+        return self._process_delete_many(response_type, response)
 
-        response_type, payload = self.send_command(message_type='TL', payload=key_bytes)
+    def _touch(self, key: str, timeout: float) -> bool:
+        payload = self._encode_touch(key=key, timeout=timeout)
+        response_type, response = self.send_command(message_type='TH', payload=payload)
+        self._invalidate([key])
+        return self._process_touch_response(response_type, response)
+
+    def _ttl(self, key: str) -> Optional[float]:
+        response_type, payload = self.send_command(message_type='TL', payload=self._encode_key(key))
         return self._process_ttl_response(response_type, payload)
 
     def _has_key(self, key: str) -> bool:
-        key_bytes = key.encode()
-        key_len = len(key)
-        assert key_len < 65536
-
-        response_type, payload = self.send_command(message_type='HK', payload=key_bytes)
+        response_type, payload = self.send_command(message_type='HK', payload=self._encode_key(key))
         return self._process_has_key_response(response_type, payload)
 
     def _keys(self, pattern: Optional[str]) -> list:
-        if pattern is None:
-            response_type, payload = self.send_command(message_type='LS', payload=bytearray())
-        else:
-            response_type, payload = self.send_command(message_type='LS', payload=pattern.encode())
+        response_type, payload = self.send_command(message_type='LS', payload=self._encode_keys(pattern))
         return self._process_keys_response(response_type, payload)
 
     def _flush(self):
-        response_type, payload = self.send_command(message_type='FU', payload=bytearray())
+        response_type, payload = self.send_command(message_type='FU', payload=bytes())
+        if self.near_cache is not None:
+            self.near_cache.clear()
         return self._process_flush_response(response_type, payload)
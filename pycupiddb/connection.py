@@ -1,115 +1,227 @@
+import io
+import sys
 import socket
 import struct
 import time
-import pyarrow as pa
-import pandas as pd
 import pickle
+import random
 
-from typing import Tuple, Optional, Any
+from typing import TYPE_CHECKING, Tuple, List, Callable, Iterator, Literal, Optional, Any, Union
 from threading import Lock
+from contextlib import contextmanager
 
+from .codec import Buffer, CodecRegistry, decode_tagged, is_tagged
+from .instrumentation import Instrumentation
+from .tracing import CallTrace, current_call
+from .transport import TCPTransport, Transport
 from .exceptions import InvalidDataType, InvalidDataType, InvalidQuery, \
-    InvalidArrowData, InvalidPickleData, ProtocolVersionError, ConnectionError
+    InvalidArrowData, InvalidPickleData, ProtocolVersionError, ConnectionError, ReadTimeoutError
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    import pandas as pd
+    import pyarrow as pa
+    from .filters import FilterPlan
+
+
+HEADER_LENGTH = 11
+
+# Precompiled packers for the fixed size fields of the protocol
+HEADER = struct.Struct('>1s2sQ')
+UINT16 = struct.Struct('>H')
+UINT64 = struct.Struct('>Q')
+INT64 = struct.Struct('>q')
+FLOAT64 = struct.Struct('>d')
+BOOL = struct.Struct('?')
+
+# Most systems cap the number of buffers in one sendmsg call at 1024
+IOV_MAX = 1024
+
+# A payload given as a list of buffers is sent as their concatenation without joining them
+Payload = Union[bytes, List[Buffer]]
+# Responses are received into a preallocated bytearray instead of being copied into bytes
+ResponsePayload = Union[bytes, bytearray]
+# A stored value, which codecs may give as several buffers that are likewise sent without joining them
+ValueData = Union[Buffer, List[Buffer]]
+
+ReturnType = Literal['pandas', 'arrow', 'record_batches']
+DataFrameResult = Union['pd.DataFrame', 'pa.Table', List['pa.RecordBatch']]
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the ``attempt``-th retry, counting from 0."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def new_executor(max_workers: Optional[int], thread_name_prefix: str) -> 'ThreadPoolExecutor':
+    """A ``ThreadPoolExecutor``, for the clients that create theirs on first use."""
+    # concurrent.futures pulls in logging, so it is only imported once needed
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+
+def is_dataframe(value: Any) -> bool:
+    """``isinstance(value, pd.DataFrame)`` without importing pandas.
+
+    pandas and pyarrow are only imported by the first DataFrame operation,
+    and no value can be a DataFrame before pandas has been imported.
+    """
+    pandas = sys.modules.get('pandas')
+    return pandas is not None and isinstance(value, pandas.DataFrame)
+
+
+def encode_header(protocol_version: bytes, message_type: str, payload_length: int) -> bytes:
+    return HEADER.pack(protocol_version, message_type.encode(), payload_length)
+
+
+def decode_header(response_header: Union[bytes, bytearray]) -> Tuple[str, int]:
+    protocol_version, response_type, payload_len = HEADER.unpack(response_header)
+    if protocol_version != b'B':
+        raise ValueError('Wrong protocol')
+    return response_type.decode(), payload_len
+
+
+def payload_length(payload: Payload) -> int:
+    if isinstance(payload, list):
+        return sum(memoryview(part).nbytes for part in payload)
+    return len(payload)
+
+
+def join_payload(payload: Payload) -> bytes:
+    if isinstance(payload, list):
+        return b''.join(payload)
+    return payload
+
+
+def frame_buffers(header: bytes, payload: Payload) -> List[Buffer]:
+    return [header, *payload] if isinstance(payload, list) else [header, payload]
+
+
+def send_buffers(sock: socket.socket, buffers: List[Buffer]):
+    """Send ``buffers`` back to back with ``sendmsg``, without concatenating them.
+
+    ``sendmsg`` may stop part way through a buffer, so the remaining views
+    are sent again until everything is written. Platforms without
+    ``sendmsg`` get one ``sendall`` per buffer instead.
+    """
+    if not hasattr(sock, 'sendmsg'):
+        for buffer in buffers:
+            sock.sendall(buffer)
+        return
+    views = [view for view in (memoryview(buffer).cast('B') for buffer in buffers) if view.nbytes]
+    first = 0
+    while first < len(views):
+        sent = sock.sendmsg(views[first:first + IOV_MAX])
+        while sent:
+            size = views[first].nbytes
+            if sent < size:
+                views[first] = views[first][sent:]
+                break
+            sent -= size
+            first += 1
 
 
 class Serializer:
 
-    def _process_set_data(self, response_type: str, payload: bytes) -> bool:
+    codecs: Optional[CodecRegistry] = None
+
+    def _process_set_data(self, response_type: str, payload: ResponsePayload) -> bool:
         if response_type == 'OK':
             return True
         if response_type == 'NA':
             return False
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         if error_code == 1:
             raise ValueError()
         raise self._general_handle_error_code(error_code)
 
-    def _process_incr(self, response_type: str, payload: bytes) -> int:
+    def _process_incr(self, response_type: str, payload: ResponsePayload) -> int:
         if response_type == 'IN':
-            data = struct.unpack('>q', payload)[0]
+            data = INT64.unpack(payload)[0]
             return data
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         if error_code == 5:
             raise InvalidDataType()
         raise self._general_handle_error_code(error_code)
 
-    def _process_incr_float(self, response_type: str, payload: bytes) -> float:
+    def _process_incr_float(self, response_type: str, payload: ResponsePayload) -> float:
         if response_type == 'FL':
-            data = struct.unpack('>d', payload)[0]
+            data = FLOAT64.unpack(payload)[0]
             return data
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         if error_code == 5:
             raise InvalidDataType()
         raise self._general_handle_error_code(error_code)
 
-    def _process_delete(self, response_type: str, payload: bytes) -> bool:
+    def _process_delete(self, response_type: str, payload: ResponsePayload) -> bool:
         if response_type == 'OK':
             return True
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         if error_code == 2:
             return False
         raise self._general_handle_error_code(error_code)
 
-    def _process_delete_many(self, response_type: str, payload: bytes) -> int:
+    def _process_delete_many(self, response_type: str, payload: ResponsePayload) -> int:
         if response_type == 'DM':
-            deleted_count = struct.unpack('>H', payload)[0]
+            deleted_count = UINT16.unpack(payload)[0]
             return deleted_count
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         raise self._general_handle_error_code(error_code)
 
-    def _process_touch_response(self, response_type: str, payload: bytes) -> bool:
+    def _process_touch_response(self, response_type: str, payload: ResponsePayload) -> bool:
         if response_type == 'OK':
             return True
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         if error_code == 2:
             return False
         raise self._general_handle_error_code(error_code)
 
-    def _process_ttl_response(self, response_type: str, payload: bytes) -> Optional[float]:
+    def _process_ttl_response(self, response_type: str, payload: ResponsePayload) -> Optional[float]:
         if response_type == 'TL':
-            ttl = struct.unpack('>Q', payload)[0]
+            ttl = UINT64.unpack(payload)[0]
             return ttl / 1000
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         if error_code == 2:
             return None
         raise self._general_handle_error_code(error_code)
 
-    def _process_has_key_response(self, response_type: str, payload: bytes) -> bool:
+    def _process_has_key_response(self, response_type: str, payload: ResponsePayload) -> bool:
         if response_type == 'OK':
-            has_key = struct.unpack('?', payload)[0]
+            has_key = BOOL.unpack(payload)[0]
             return has_key
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         raise self._general_handle_error_code(error_code)
 
-    def _process_keys_response(self, response_type: str, payload: bytes) -> list:
+    def _process_keys_response(self, response_type: str, payload: ResponsePayload) -> list:
         if response_type == 'KY':
             if len(payload) == 0:
                 return []
             return [key.decode() for key in payload.split(b'\x00')]
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         raise self._general_handle_error_code(error_code)
 
-    def _process_flush_response(self, response_type: str, payload: bytes):
+    def _process_flush_response(self, response_type: str, payload: ResponsePayload):
         if response_type == 'FU':
             return
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         raise self._general_handle_error_code(error_code)
 
-    def _process_get_dataframe_response(self, response_type: str,
-                                        payload: bytes) -> Optional[pd.DataFrame]:
+    def _process_get_dataframe_response(self, response_type: str, payload: ResponsePayload,
+                                        return_type: ReturnType = 'pandas',
+                                        plan: Optional['FilterPlan'] = None) -> Optional[DataFrameResult]:
         if response_type == 'AR':
-            return self._process_arrow_payload(payload=payload)
+            return self._process_arrow_payload(payload=payload, return_type=return_type, plan=plan)
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         if error_code == 2:
             return None
         if error_code == 3:
@@ -118,22 +230,20 @@ class Serializer:
             raise InvalidArrowData()
         raise self._general_handle_error_code(error_code)
 
-    def _process_get_response(self, response_type: str, payload: bytes, default: Optional[Any]) -> Any:
+    def _process_get_response(self, response_type: str, payload: ResponsePayload, default: Optional[Any],
+                              return_type: ReturnType = 'pandas') -> Any:
         if response_type == 'AR':
-            return self._process_arrow_payload(payload=payload)
+            return self._process_arrow_payload(payload=payload, return_type=return_type)
         if response_type == 'IN':
-            data = struct.unpack('>q', payload)[0]
+            data = INT64.unpack(payload)[0]
             return data
         if response_type == 'FL':
-            data = struct.unpack('>d', payload)[0]
+            data = FLOAT64.unpack(payload)[0]
             return data
         if response_type == 'BY':
-            try:
-                return pickle.loads(payload)
-            except pickle.UnpicklingError:
-                raise InvalidPickleData()
+            return self._decode_bytes(payload)
         assert response_type == 'ER'
-        error_code = struct.unpack('>H', payload)[0]
+        error_code = UINT16.unpack(payload)[0]
         if error_code == 2:
             if default is not None:
                 return default
@@ -142,16 +252,87 @@ class Serializer:
             raise InvalidDataType()
         raise self._general_handle_error_code(error_code)
 
-    def _process_arrow_payload(self, payload: bytes,
-                               metadata: Optional[dict] = None) -> pd.DataFrame:
-        buffer_reader = pa.BufferReader(memoryview(payload))
-        reader = pa.ipc.RecordBatchStreamReader(buffer_reader, options=None)
-        dfs = []
+    def _decode_bytes(self, payload: ResponsePayload) -> Any:
+        call = current_call()
+        start = time.perf_counter()
+        if is_tagged(payload):
+            value = decode_tagged(payload, self.codecs)
+        else:
+            try:
+                value = pickle.loads(payload)
+            except pickle.UnpicklingError:
+                raise InvalidPickleData()
+        if call is not None:
+            call.add_since('decode', start)
+        return value
+
+    def _process_arrow_payload(self, payload: ResponsePayload, metadata: Optional[dict] = None,
+                               return_type: ReturnType = 'pandas',
+                               plan: Optional['FilterPlan'] = None) -> DataFrameResult:
+        """Decode an IPC payload, first applying the client-side part of a filter ``plan``."""
+        import pyarrow as pa
+
+        if isinstance(payload, pa.Table):
+            # Handed over as is by an in-process EmbeddedStore
+            return self._process_arrow_table(payload, metadata=metadata, return_type=return_type, plan=plan)
+
+        call = current_call()
+        start = time.perf_counter()
+        # py_buffer wraps the received bytearray without copying it
+        reader = pa.ipc.open_stream(pa.py_buffer(payload))
+        record_batches = []
         for record_batch in reader:
             if metadata:
                 record_batch = record_batch.replace_schema_metadata(metadata)
-            dfs.append(record_batch.to_pandas())
-        return pd.concat(dfs)
+            record_batches.append(record_batch)
+        schema = record_batches[0].schema if record_batches else reader.schema
+        if plan is not None:
+            table = plan.apply(pa.Table.from_batches(record_batches, schema=schema))
+            record_batches, schema = table.to_batches(), table.schema
+        if call is not None:
+            start = call.add_since('decode', start)
+            call.record_batches += len(record_batches)
+            call.rows += sum(record_batch.num_rows for record_batch in record_batches)
+
+        result: DataFrameResult
+        if return_type == 'record_batches':
+            result = record_batches
+        elif return_type == 'arrow':
+            result = pa.Table.from_batches(record_batches, schema=schema)
+        elif len(record_batches) == 1:
+            assert return_type == 'pandas'
+            result = record_batches[0].to_pandas()
+        else:
+            assert return_type == 'pandas'
+            # Converting the batches as one table keeps a RangeIndex stored in the
+            # schema metadata intact, which per-batch conversion cannot do
+            result = pa.Table.from_batches(record_batches, schema=schema).to_pandas()
+        if call is not None:
+            call.add_since('convert', start)
+        return result
+
+    def _process_arrow_table(self, table: 'pa.Table', metadata: Optional[dict] = None,
+                             return_type: ReturnType = 'pandas',
+                             plan: Optional['FilterPlan'] = None) -> DataFrameResult:
+        call = current_call()
+        start = time.perf_counter()
+        if metadata:
+            table = table.replace_schema_metadata(metadata)
+        if plan is not None:
+            table = plan.apply(table)
+        result: DataFrameResult
+        if return_type == 'record_batches':
+            result = table.to_batches()
+        elif return_type == 'arrow':
+            result = table
+        else:
+            assert return_type == 'pandas'
+            result = table.to_pandas()
+        if call is not None:
+            call.add_since('convert', start)
+            call.record_batches += table.column(0).num_chunks if table.num_columns else 0
+            call.rows += table.num_rows
+        return result
 
     def _general_handle_error_code(self, error_code):
         if error_code == 6:
@@ -159,7 +340,64 @@ class Serializer:
         return ValueError('Unknown error')
 
 
+class PayloadReader(io.RawIOBase):
+    """Read-only file object over one response payload still on the socket."""
+
+    def __init__(self, connection: 'SyncConnection', length: int):
+        self.connection = connection
+        self.remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.remaining == 0:
+            return 0
+        view = memoryview(buffer).cast('B')
+        bytes_received = self.connection.sock.recv_into(view, min(len(view), self.remaining))
+        if bytes_received == 0:
+            raise ConnectionError('Connection closed by the server')
+        self.remaining -= bytes_received
+        return bytes_received
+
+    def drain(self):
+        """Discard the unread rest of the payload so the connection can be reused."""
+        scratch = bytearray(min(self.remaining, self.connection.chunk_size))
+        while self.remaining > 0:
+            self.readinto(scratch)
+
+
+class SocketWriter(io.RawIOBase):
+    """Write-only file object that sends everything written to it on the socket."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.sock.sendall(data)
+        length = memoryview(data).nbytes
+        self.written += length
+        return length
+
+
 class SyncConnection:
+    """One socket to the server, opened by ``transport``, which defaults to TCP to ``host:port``.
+
+    ``connect_timeout`` bounds each connection attempt and ``read_timeout``
+    each blocking send or receive, so a silent server cannot hang the
+    calling thread; both default to waiting forever. Failed connection
+    attempts are retried ``max_retries`` times with exponential backoff
+    and jitter, starting from ``retry_delay`` and capped at
+    ``max_retry_delay`` seconds.
+
+    Any error during an exchange leaves the connection ``broken``: the
+    socket is closed, since a late response would be read as the answer to
+    the next command. Socket errors are raised as ``ConnectionError``.
+    """
 
     def __init__(
         self,
@@ -168,21 +406,28 @@ class SyncConnection:
         kb_chunk: int = 64,
         socket_no_delay: bool = True,
         max_retries: int = 3,
-        retry_delay: float = 1.0
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 10.0,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        transport: Optional[Transport] = None,
+        instrumentation: Optional[Instrumentation] = None
     ):
         self.protocol_version = 'B'.encode()
         self.host = host
         self.port = port
+        self.transport = transport if transport is not None else TCPTransport(host, port, no_delay=socket_no_delay)
         self.lock = Lock()
+        self.instrumentation = instrumentation
 
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        if socket_no_delay:
-            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-
-        self.sock = sock
+        self.socket_no_delay = socket_no_delay
         self.chunk_size = 1024 * kb_chunk
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.broken = False
         self.connect()
 
     def connect(self):
@@ -190,43 +435,217 @@ class SyncConnection:
         last_error: Optional[Exception] = None
 
         while attempts <= self.max_retries:
+            # A socket whose connect failed cannot be reused, so every attempt gets a new one
             try:
-                self.sock.connect((self.host, self.port))
+                sock = self.transport.connect(timeout=self.connect_timeout)
+                sock.settimeout(self.read_timeout)
+                self.sock = sock
+                self.broken = False
                 return
-            except socket.error as e:
+            except OSError as e:
                 last_error = e
+                if attempts < self.max_retries:
+                    time.sleep(backoff_delay(attempts, self.retry_delay, self.max_retry_delay))
                 attempts += 1
-                if attempts <= self.max_retries:
-                    time.sleep(self.retry_delay)
 
         raise ConnectionError(f"Failed to connect after {self.max_retries} attempts") from last_error
 
     def close(self):
         self.sock.close()
 
-    def send_command(self, message_type: str, payload: bytes) -> Tuple[str, bytes]:
-        payload_length = len(payload)
-        payload_length_bytes = struct.pack('>Q', payload_length)
-        packet_bytes = self.protocol_version + message_type.encode() + payload_length_bytes
+    def is_alive(self) -> bool:
+        """Check without blocking that the server has not closed the socket.
 
+        An idle connection has nothing to read, so readable data or an end
+        of stream both mean it can no longer be used.
+        """
+        if self.broken:
+            return False
+        try:
+            self.sock.setblocking(False)
+            try:
+                self.sock.recv(1, socket.MSG_PEEK)
+            finally:
+                self.sock.settimeout(self.read_timeout)
+        except BlockingIOError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    @contextmanager
+    def _io(self) -> Iterator[None]:
+        """Hold the lock for one exchange and mark the connection broken if it fails."""
         with self.lock:
+            try:
+                yield
+            except socket.timeout as e:
+                self._mark_broken()
+                raise ReadTimeoutError(f'No response within {self.read_timeout} seconds') from e
+            except OSError as e:
+                self._mark_broken()
+                raise ConnectionError(f'Connection to {self.transport} failed: {e}') from e
+            except BaseException:
+                # Whatever failed, the rest of the frame is still unread
+                self._mark_broken()
+                raise
+
+    def _mark_broken(self):
+        self.broken = True
+        self.sock.close()
+
+    def _recv_exact(self, length: int) -> bytearray:
+        """Receive exactly ``length`` bytes into one preallocated buffer."""
+        buffer = bytearray(length)
+        view = memoryview(buffer)
+        received = 0
+        while received < length:
+            bytes_received = self.sock.recv_into(view[received:],
+                                                 min(length - received, self.chunk_size))
+            if bytes_received == 0:
+                raise ConnectionError('Connection closed by the server')
+            received += bytes_received
+        return buffer
+
+    def _read_response(self, call: Optional[CallTrace] = None) -> Tuple[str, ResponsePayload]:
+        if call is None:
+            response_type, payload_len = decode_header(self._recv_exact(HEADER_LENGTH))
+            return response_type, self._recv_exact(payload_len)
+        start = time.perf_counter()
+        response_type, payload_len = decode_header(self._recv_exact(HEADER_LENGTH))
+        start = call.add_since('ttfb', start)
+        payload = self._recv_exact(payload_len)
+        call.add_since('receive', start)
+        call.response_bytes += payload_len
+        return response_type, payload
+
+    def _observe(self, message_type: str, request_bytes: int,
+                 send: Callable[[], Tuple[str, ResponsePayload]]) -> Tuple[str, ResponsePayload]:
+        assert self.instrumentation is not None
+        event = self.instrumentation.start(message_type, request_bytes)
+        try:
+            response_type, response = send()
+        except BaseException as e:
+            self.instrumentation.finish(event, exception=e)
+            raise
+        self.instrumentation.finish(event, response_type, len(response), response)
+        return response_type, response
+
+    def send_command(self, message_type: str, payload: Payload) -> Tuple[str, ResponsePayload]:
+        if self.instrumentation is not None:
+            return self._observe(message_type, payload_length(payload),
+                                 lambda: self._send_command(message_type, payload))
+        return self._send_command(message_type, payload)
+
+    def _send_command(self, message_type: str, payload: Payload) -> Tuple[str, ResponsePayload]:
+        length = payload_length(payload)
+        packet_bytes = encode_header(self.protocol_version, message_type, length)
+        call = current_call()
+
+        with self._io():
+            start = time.perf_counter()
+            send_buffers(self.sock, frame_buffers(packet_bytes, payload))
+            if call is not None:
+                call.add_since('send', start)
+                call.request_bytes += length
+            return self._read_response(call)
+
+    @contextmanager
+    def stream_command(self, message_type: str, payload: bytes) -> Iterator[Tuple[str, io.BufferedReader]]:
+        """Send one command and yield its response payload as a file object.
+
+        Whatever the caller leaves unread is drained when the block exits
+        normally. On an exception the connection is left mid-response and
+        must be discarded, which ``ConnectionPool.checkout`` does.
+        """
+        packet_bytes = encode_header(self.protocol_version, message_type, len(payload))
+        event = self.instrumentation.start(message_type, len(payload)) if self.instrumentation else None
+        payload_len = 0
+
+        try:
+            with self._io():
+                send_buffers(self.sock, [packet_bytes, payload])
+                response_type, payload_len = decode_header(self._recv_exact(HEADER_LENGTH))
+                reader = PayloadReader(self, payload_len)
+                yield response_type, io.BufferedReader(reader, buffer_size=self.chunk_size)
+                reader.drain()
+        except BaseException as e:
+            if self.instrumentation is not None and event is not None:
+                self.instrumentation.finish(event, response_bytes=payload_len, exception=e)
+            raise
+        if self.instrumentation is not None and event is not None:
+            self.instrumentation.finish(event, response_type, payload_len)
+
+    def send_streamed_command(self, message_type: str, payload_length: int,
+                              write_payload: Callable[[io.BufferedIOBase], None]) -> Tuple[str, ResponsePayload]:
+        """Send a payload that ``write_payload`` writes to the socket as it is produced.
+
+        The header needs the length up front, so the caller must know
+        exactly how many bytes ``write_payload`` will write.
+        """
+        if self.instrumentation is not None:
+            return self._observe(message_type, payload_length,
+                                 lambda: self._send_streamed_command(message_type, payload_length,
+                                                                     write_payload))
+        return self._send_streamed_command(message_type, payload_length, write_payload)
+
+    def _send_streamed_command(self, message_type: str, payload_length: int,
+                               write_payload: Callable[[io.BufferedIOBase], None]) -> Tuple[str, ResponsePayload]:
+        packet_bytes = encode_header(self.protocol_version, message_type, payload_length)
+        call = current_call()
+
+        with self._io():
+            start = time.perf_counter()
             self.sock.sendall(packet_bytes)
-            self.sock.sendall(payload)
-
-            header_length = 11
-            response_header = bytearray()
-            while header_length > 0:
-                bytes_received = self.sock.recv(header_length)
-                response_header.extend(bytes_received)
-                header_length -= len(bytes_received)
-            header = response_header[0:3].decode()
-            if header[0] != 'B':
-                raise ValueError('Wrong protocol')
-
-            payload_len = struct.unpack('>Q', response_header[3:11])[0]
-            response_payload = bytearray()
-            while payload_len > 0:
-                bytes_received = self.sock.recv(min(payload_len, self.chunk_size))
-                response_payload.extend(bytes_received)
-                payload_len -= len(bytes_received)
-        return header[1:3], response_payload
+            raw_writer = SocketWriter(self.sock)
+            writer = io.BufferedWriter(raw_writer, buffer_size=self.chunk_size)
+            write_payload(writer)
+            writer.flush()
+            if raw_writer.written != payload_length:
+                raise ValueError(f'Streamed {raw_writer.written} bytes, expected {payload_length}')
+            if call is not None:
+                # Includes converting and encoding, which happen while writing
+                call.add_since('send', start)
+                call.request_bytes += payload_length
+            return self._read_response(call)
+
+    def send_commands(self, commands: List[Tuple[str, Payload]]) -> List[Tuple[str, ResponsePayload]]:
+        """Write every frame with one vectored send, then read the responses in order."""
+        frames: List[Buffer] = []
+        for message_type, payload in commands:
+            header = encode_header(self.protocol_version, message_type, payload_length(payload))
+            frames.extend(frame_buffers(header, payload))
+
+        call = current_call()
+        if self.instrumentation is not None:
+            return self._send_commands_observed(commands, frames, call)
+        with self._io():
+            self._send_frames(frames, commands, call)
+            return [self._read_response(call) for _ in commands]
+
+    def _send_frames(self, frames: List[Buffer], commands: List[Tuple[str, Payload]],
+                     call: Optional[CallTrace]):
+        start = time.perf_counter()
+        send_buffers(self.sock, frames)
+        if call is not None:
+            call.add_since('send', start)
+            call.request_bytes += sum(payload_length(payload) for _, payload in commands)
+
+    def _send_commands_observed(self, commands: List[Tuple[str, Payload]], frames: List[Buffer],
+                                call: Optional[CallTrace]) -> List[Tuple[str, ResponsePayload]]:
+        assert self.instrumentation is not None
+        events = [self.instrumentation.start(message_type, payload_length(payload))
+                  for message_type, payload in commands]
+        responses: List[Tuple[str, ResponsePayload]] = []
+        try:
+            with self._io():
+                self._send_frames(frames, commands, call)
+                for event in events:
+                    response_type, response = self._read_response(call)
+                    self.instrumentation.finish(event, response_type, len(response), response)
+                    responses.append((response_type, response))
+        except BaseException as e:
+            for event in events[len(responses):]:
+                self.instrumentation.finish(event, exception=e)
+            raise
+        return responses
@@ -0,0 +1,319 @@
+import fnmatch
+import io
+import json
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .connection import Payload, join_payload
+from .instrumentation import Instrumentation
+
+
+Response = Tuple[str, Any]
+
+
+def _error(code: int) -> Response:
+    return 'ER', struct.pack('>H', code)
+
+
+def _expand_braces(pattern: str) -> List[str]:
+    start = pattern.find('{')
+    end = pattern.find('}', start)
+    if start < 0 or end < 0:
+        return [pattern]
+    patterns = []
+    for option in pattern[start + 1:end].split(','):
+        patterns.extend(_expand_braces(pattern[:start] + option + pattern[end + 1:]))
+    return patterns
+
+
+class EmbeddedStore:
+    """In-memory key-value store that answers protocol 'B' commands.
+
+    DataFrames are kept as Arrow tables and queries are evaluated with
+    pyarrow.compute. With ``zero_copy`` the tables themselves are returned
+    in place of IPC payloads, which only works for a client in the same
+    process; a server has to leave it off.
+    """
+
+    result_cache_separator = '\x01'
+
+    def __init__(self, zero_copy: bool = True):
+        self.zero_copy = zero_copy
+        self.lock = threading.Lock()
+        self.data: Dict[str, Tuple[str, Any, float]] = {}
+
+    def handle(self, message_type: str, payload: Union[bytes, bytearray]) -> Response:
+        handler: Optional[Callable[[bytes], Response]] = getattr(self, '_cmd_' + message_type, None)
+        if handler is None:
+            raise ValueError(f'Unknown message type {message_type!r}')
+        with self.lock:
+            return handler(bytes(payload))
+
+    def _live(self, key: str) -> Optional[Tuple[str, Any, float]]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        if item[2] and item[2] <= time.monotonic():
+            self._remove(key)
+            return None
+        return item
+
+    def _remove(self, key: str):
+        del self.data[key]
+        prefix = key + self.result_cache_separator
+        for cache_key in [k for k in self.data if k.startswith(prefix)]:
+            del self.data[cache_key]
+
+    def _expiry(self, timeout_ms: int) -> float:
+        return time.monotonic() + timeout_ms / 1000 if timeout_ms else 0.0
+
+    def _arrow_response(self, table: pa.Table, compression: str) -> Response:
+        if self.zero_copy:
+            return 'AR', table
+        codec: Optional[pa.Codec] = None
+        if compression == 'lz4':
+            codec = pa.Codec('lz4')
+        elif compression == 'zstd':
+            codec = pa.Codec('zstd')
+        options = pa.ipc.IpcWriteOptions(compression=codec)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        return 'AR', sink.getvalue()
+
+    def _cmd_SD(self, payload: bytes) -> Response:
+        timeout_ms, add_only, key_len = struct.unpack_from('>Q?H', payload)
+        key = payload[11:11 + key_len].decode()
+        data_type = chr(payload[11 + key_len])
+        data = memoryview(payload)[12 + key_len:]
+        if add_only and self._live(key) is not None:
+            return 'NA', b''
+        value: Any
+        if data_type == 'A':
+            try:
+                # The table references the payload buffer instead of copying it
+                value = pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+            except pa.ArrowInvalid:
+                return _error(1)
+        elif data_type == 'I':
+            value = struct.unpack('>q', data)[0]
+        elif data_type == 'F':
+            value = struct.unpack('>d', data)[0]
+        else:
+            value = bytes(data)
+        # Like the server, cached query results outlive an overwrite of their key
+        self.data[key] = (data_type, value, self._expiry(timeout_ms))
+        return 'OK', b''
+
+    def _cmd_GD(self, payload: bytes) -> Response:
+        item = self._live(payload.decode())
+        if item is None:
+            return _error(2)
+        data_type, value, _ = item
+        if data_type == 'A':
+            return self._arrow_response(value, '')
+        if data_type == 'I':
+            return 'IN', struct.pack('>q', value)
+        if data_type == 'F':
+            return 'FL', struct.pack('>d', value)
+        return 'BY', value
+
+    def _cmd_GA(self, payload: bytes) -> Response:
+        try:
+            query = json.loads(payload)
+        except ValueError:
+            return _error(3)
+        if query.get('filterlogic') not in ('AND', 'OR'):
+            return _error(3)
+        item = self._live(query['key'])
+        if item is None:
+            return _error(2)
+        if item[0] != 'A':
+            return _error(4)
+
+        cache_key = ''
+        if query.get('cachetime'):
+            cache_key = query['key'] + self.result_cache_separator + json.dumps(
+                {k: v for k, v in query.items() if k != 'cachetime'}, sort_keys=True)
+            cached = self._live(cache_key)
+            if cached is not None:
+                return 'AR', cached[1]
+
+        table: pa.Table = item[1]
+        try:
+            table = self._filter(table, query['filter'], query['filterlogic'])
+        except (KeyError, ValueError, pa.ArrowException):
+            return _error(3)
+        if query['columns']:
+            pandas_metadata = table.schema.pandas_metadata or {}
+            index_columns = [c for c in pandas_metadata.get('index_columns', []) if isinstance(c, str)]
+            table = table.select([c for c in table.column_names
+                                  if c in query['columns'] or c in index_columns])
+        response = self._arrow_response(table, query.get('compression_type', ''))
+        if cache_key:
+            self.data[cache_key] = ('R', response[1], self._expiry(query['cachetime']))
+        return response
+
+    def _filter_value(self, row_filter: Dict[str, Any], column_type: pa.DataType) -> Any:
+        data_type = row_filter['data_type']
+        if data_type == 'IN':
+            return row_filter['value_int']
+        if data_type == 'FL':
+            return row_filter['value_flt']
+        if data_type == 'DA':
+            return pa.scalar(row_filter['value_int'], pa.int32()).cast(pa.date32())
+        if data_type == 'DT':
+            timezone = getattr(column_type, 'tz', None) if pa.types.is_timestamp(column_type) else 'UTC'
+            return pa.scalar(row_filter['value_int'], pa.timestamp('ns', tz=timezone))
+        if data_type == 'ST':
+            return row_filter['value_str']
+        return row_filter['value_bol']
+
+    def _filter(self, table: pa.Table, filters: List[Dict[str, Any]], logic: str) -> pa.Table:
+        compare = {'gte': pc.greater_equal, 'gt': pc.greater, 'lte': pc.less_equal,
+                   'lt': pc.less, 'eq': pc.equal, 'ne': pc.not_equal}
+        mask = None
+        for row_filter in filters:
+            if row_filter['col'] not in table.column_names:
+                continue
+            column = table[row_filter['col']]
+            value = self._filter_value(row_filter, column.type)
+            condition = pc.fill_null(compare[row_filter['filter_type']](column, value), False)
+            if mask is None:
+                mask = condition
+            elif logic == 'AND':
+                mask = pc.and_(mask, condition)
+            else:
+                mask = pc.or_(mask, condition)
+        if mask is None:
+            return table
+        return table.filter(mask)
+
+    def _incr(self, payload: bytes, data_type: str, fmt: str) -> Response:
+        delta = struct.unpack(fmt, payload[0:8])[0]
+        key = payload[8:].decode()
+        item = self._live(key)
+        if item is None:
+            value, expiry = delta, 0.0
+        elif item[0] != data_type:
+            return _error(5)
+        else:
+            value, expiry = item[1] + delta, item[2]
+        self.data[key] = (data_type, value, expiry)
+        return ('IN' if data_type == 'I' else 'FL'), struct.pack(fmt, value)
+
+    def _cmd_II(self, payload: bytes) -> Response:
+        return self._incr(payload, 'I', '>q')
+
+    def _cmd_IF(self, payload: bytes) -> Response:
+        return self._incr(payload, 'F', '>d')
+
+    def _cmd_DL(self, payload: bytes) -> Response:
+        key = payload.decode()
+        if self._live(key) is None:
+            return _error(2)
+        self._remove(key)
+        return 'OK', b''
+
+    def _cmd_DM(self, payload: bytes) -> Response:
+        count = 0
+        for key in payload.decode().split('\x00') if payload else []:
+            if self._live(key) is not None:
+                self._remove(key)
+                count += 1
+        return 'DM', struct.pack('>H', count)
+
+    def _cmd_TH(self, payload: bytes) -> Response:
+        timeout_ms = struct.unpack('>Q', payload[0:8])[0]
+        key = payload[8:].decode()
+        item = self._live(key)
+        if item is None:
+            return _error(2)
+        self.data[key] = (item[0], item[1], self._expiry(timeout_ms))
+        return 'OK', b''
+
+    def _cmd_TL(self, payload: bytes) -> Response:
+        item = self._live(payload.decode())
+        if item is None:
+            return _error(2)
+        remaining = max(0, int((item[2] - time.monotonic()) * 1000)) if item[2] else 0
+        return 'TL', struct.pack('>Q', remaining)
+
+    def _cmd_HK(self, payload: bytes) -> Response:
+        return 'OK', struct.pack('?', self._live(payload.decode()) is not None)
+
+    def _cmd_LS(self, payload: bytes) -> Response:
+        keys = [k for k in list(self.data)
+                if self.result_cache_separator not in k and self._live(k) is not None]
+        if payload:
+            patterns = _expand_braces(payload.decode())
+            keys = [k for k in keys if any(fnmatch.fnmatchcase(k, p) for p in patterns)]
+        return 'KY', b'\x00'.join(k.encode() for k in keys)
+
+    def _cmd_FU(self, payload: bytes) -> Response:
+        self.data.clear()
+        return 'FU', b''
+
+
+class EmbeddedConnection:
+    """Takes the place of ``ConnectionPool`` for a client backed by an ``EmbeddedStore``.
+
+    Commands are encoded and decoded exactly as for a server, but handled by
+    a direct call instead of a socket round trip.
+    """
+
+    def __init__(self, store: Optional[EmbeddedStore] = None,
+                 instrumentation: Optional[Instrumentation] = None):
+        self.store = store if store is not None else EmbeddedStore()
+        self.instrumentation = instrumentation
+
+    @contextmanager
+    def checkout(self) -> Iterator['EmbeddedConnection']:
+        yield self
+
+    def send_command(self, message_type: str, payload: Payload) -> Response:
+        payload = join_payload(payload)
+        if self.instrumentation is None:
+            return self.store.handle(message_type, payload)
+        event = self.instrumentation.start(message_type, len(payload))
+        try:
+            response_type, response = self.store.handle(message_type, payload)
+        except BaseException as e:
+            self.instrumentation.finish(event, exception=e)
+            raise
+        response_bytes = response.nbytes if isinstance(response, pa.Table) else len(response)
+        self.instrumentation.finish(event, response_type, response_bytes, response)
+        return response_type, response
+
+    def send_commands(self, commands: List[Tuple[str, Payload]]) -> List[Response]:
+        return [self.send_command(message_type, payload) for message_type, payload in commands]
+
+    @contextmanager
+    def stream_command(self, message_type: str, payload: bytes) -> Iterator[Tuple[str, io.BufferedIOBase]]:
+        response_type, response = self.send_command(message_type=message_type, payload=payload)
+        if isinstance(response, pa.Table):
+            # Readers of a stream expect IPC data, so the table is serialized after all
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, response.schema) as writer:
+                writer.write_table(response)
+            response = sink.getvalue()
+        yield response_type, io.BytesIO(response)
+
+    def send_streamed_command(self, message_type: str, payload_length: int,
+                              write_payload: Callable[[io.BufferedIOBase], None]) -> Response:
+        sink = io.BytesIO()
+        write_payload(sink)
+        if sink.tell() != payload_length:
+            raise ValueError(f'Streamed {sink.tell()} bytes, expected {payload_length}')
+        return self.send_command(message_type=message_type, payload=sink.getvalue())
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, float]:
+        return {}
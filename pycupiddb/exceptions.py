@@ -41,3 +41,13 @@ class ConnectionError(CupidDBError):
 class DeserializationError(CupidDBError):
     """Raised when data cannot be deserialized"""
     pass
+
+
+class PoolTimeoutError(CupidDBError):
+    """Raised when no pooled connection becomes available in time"""
+    pass
+
+
+class ReadTimeoutError(ConnectionError):
+    """Raised when the server does not answer within the read timeout"""
+    pass
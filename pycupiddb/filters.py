@@ -0,0 +1,363 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Literal, Optional, Set, Tuple, Union
+
+from .exceptions import InvalidQuery
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+
+Logic = Literal['gte', 'gt', 'lte', 'lt', 'eq', 'ne']
+DataType = Literal['int', 'float', 'date', 'datetime', 'string', 'bool']
+
+_OPERATORS: Dict[Logic, str] = {'gte': '>=', 'gt': '>', 'lte': '<=', 'lt': '<', 'eq': '==', 'ne': '!='}
+_INVERSE: Dict[Logic, Logic] = {'gte': 'lt', 'gt': 'lte', 'lte': 'gt', 'lt': 'gte', 'eq': 'ne', 'ne': 'eq'}
+
+
+class RowFilter():
+
+    def __init__(self, column: str, logic: Literal['gte', 'gt', 'lte', 'lt', 'eq', 'ne'],
+                 value: Any, data_type: Literal['int', 'float', 'date',
+                                                'datetime', 'string', 'bool']):
+        assert isinstance(column, str)
+        assert logic in ['gte', 'gt', 'lte', 'lt', 'eq', 'ne']
+        assert data_type in ['int', 'float', 'date', 'datetime', 'string', 'bool']
+        self.query_dict: Dict[str, Any] = {
+            'col': column,
+            'filter_type': logic,
+        }
+
+        if data_type == 'int':
+            assert isinstance(value, int)
+            self.query_dict['data_type'] = 'IN'
+            self.query_dict['value_int'] = value
+        elif data_type == 'float':
+            assert isinstance(value, float)
+            self.query_dict['data_type'] = 'FL'
+            self.query_dict['value_flt'] = value
+        elif data_type == 'date':
+            assert isinstance(value, date)
+            self.query_dict['data_type'] = 'DA'
+            self.query_dict['value_int'] = (value - date(1970, 1, 1)).days
+        elif data_type == 'datetime':
+            assert isinstance(value, datetime)
+            self.query_dict['data_type'] = 'DT'
+            self.query_dict['value_int'] = int(value.timestamp() * (10**9))
+        elif data_type == 'string':
+            assert isinstance(value, str)
+            self.query_dict['data_type'] = 'ST'
+            self.query_dict['value_str'] = value
+        elif data_type == 'bool':
+            assert isinstance(value, bool)
+            assert logic == 'eq'
+            self.query_dict['data_type'] = 'BL'
+            self.query_dict['value_bol'] = value
+
+
+def _data_type(value: Any) -> Optional[DataType]:
+    """The ``RowFilter`` data type for a Python value, or None if the server cannot compare it."""
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    # datetime before date, since every datetime is also a date
+    if isinstance(value, datetime):
+        return 'datetime'
+    if isinstance(value, date):
+        return 'date'
+    if isinstance(value, str):
+        return 'string'
+    return None
+
+
+class Expression(ABC):
+    """Row filter built from ``col`` comparisons combined with ``&``, ``|`` and ``~``."""
+
+    def __and__(self, other: 'Expression') -> 'Expression':
+        return And(self, other)
+
+    def __or__(self, other: 'Expression') -> 'Expression':
+        return Or(self, other)
+
+    def __invert__(self) -> 'Expression':
+        return Not(self)
+
+    def __bool__(self):
+        raise TypeError('Combine expressions with & and |, not with and and or')
+
+    @abstractmethod
+    def columns(self) -> Set[str]:
+        ...
+
+    @abstractmethod
+    def to_arrow(self) -> 'pc.Expression':
+        ...
+
+    def row_filters(self) -> Optional[List[RowFilter]]:
+        """The ``RowFilter`` list that ORed together matches the same rows, if the server can run it."""
+        return None
+
+
+class Comparison(Expression):
+
+    def __init__(self, column: str, logic: Logic, value: Any):
+        self.column = column
+        self.logic = logic
+        self.value = value
+
+    def __invert__(self) -> Expression:
+        # Comparisons with null are false either way, so the inverse comparison is exact
+        return Comparison(self.column, _INVERSE[self.logic], self.value)
+
+    def __repr__(self) -> str:
+        return f'(col({self.column!r}) {_OPERATORS[self.logic]} {self.value!r})'
+
+    def columns(self) -> Set[str]:
+        return {self.column}
+
+    def to_arrow(self) -> 'pc.Expression':
+        import pyarrow.compute as pc
+
+        field = pc.field(self.column)
+        return {
+            'gte': lambda: field >= self.value, 'gt': lambda: field > self.value,
+            'lte': lambda: field <= self.value, 'lt': lambda: field < self.value,
+            'eq': lambda: field == self.value, 'ne': lambda: field != self.value,
+        }[self.logic]()
+
+    def row_filters(self) -> Optional[List[RowFilter]]:
+        data_type = _data_type(self.value)
+        if data_type is None:
+            return None
+        if data_type == 'bool':
+            # The server only compares booleans for equality
+            value = self.value if self.logic == 'eq' else not self.value
+            return [RowFilter(column=self.column, logic='eq', value=value, data_type='bool')]
+        return [RowFilter(column=self.column, logic=self.logic, value=self.value, data_type=data_type)]
+
+
+class IsIn(Expression):
+
+    def __init__(self, column: str, values: Iterable[Any]):
+        self.column = column
+        self.values = list(values)
+
+    def __repr__(self) -> str:
+        return f'col({self.column!r}).isin({self.values!r})'
+
+    def columns(self) -> Set[str]:
+        return {self.column}
+
+    def to_arrow(self) -> 'pc.Expression':
+        import pyarrow.compute as pc
+
+        return pc.field(self.column).isin(self.values)
+
+    def row_filters(self) -> Optional[List[RowFilter]]:
+        # An empty filter list would match every row instead of none
+        if not self.values:
+            return None
+        return Or(*[Comparison(self.column, 'eq', value) for value in self.values]).row_filters()
+
+
+class And(Expression):
+
+    def __init__(self, *children: Expression):
+        self.children: List[Expression] = []
+        for child in children:
+            self.children.extend(child.children if isinstance(child, And) else [child])
+
+    def __repr__(self) -> str:
+        return '(' + ' & '.join(repr(child) for child in self.children) + ')'
+
+    def columns(self) -> Set[str]:
+        return set().union(*[child.columns() for child in self.children])
+
+    def to_arrow(self) -> 'pc.Expression':
+        result = self.children[0].to_arrow()
+        for child in self.children[1:]:
+            result = result & child.to_arrow()
+        return result
+
+    def row_filters(self) -> Optional[List[RowFilter]]:
+        if len(self.children) == 1:
+            return self.children[0].row_filters()
+        return None
+
+
+class Or(Expression):
+
+    def __init__(self, *children: Expression):
+        self.children: List[Expression] = []
+        for child in children:
+            self.children.extend(child.children if isinstance(child, Or) else [child])
+
+    def __repr__(self) -> str:
+        return '(' + ' | '.join(repr(child) for child in self.children) + ')'
+
+    def columns(self) -> Set[str]:
+        return set().union(*[child.columns() for child in self.children])
+
+    def to_arrow(self) -> 'pc.Expression':
+        result = self.children[0].to_arrow()
+        for child in self.children[1:]:
+            result = result | child.to_arrow()
+        return result
+
+    def row_filters(self) -> Optional[List[RowFilter]]:
+        row_filters: List[RowFilter] = []
+        for child in self.children:
+            child_filters = child.row_filters()
+            if child_filters is None:
+                return None
+            row_filters.extend(child_filters)
+        return row_filters
+
+
+class Not(Expression):
+
+    def __init__(self, child: Expression):
+        self.child = child
+
+    def __invert__(self) -> Expression:
+        return self.child
+
+    def __repr__(self) -> str:
+        return f'~{self.child!r}'
+
+    def columns(self) -> Set[str]:
+        return self.child.columns()
+
+    def to_arrow(self) -> 'pc.Expression':
+        return ~self.child.to_arrow()
+
+
+class Column:
+    """Starting point of an expression; see ``col``."""
+
+    # Comparisons build expressions, so columns cannot be dict keys
+    __hash__ = None  # type: ignore[assignment]
+
+    def __init__(self, name: str):
+        assert isinstance(name, str)
+        self.name = name
+
+    def __ge__(self, value: Any) -> Expression:
+        return Comparison(self.name, 'gte', value)
+
+    def __gt__(self, value: Any) -> Expression:
+        return Comparison(self.name, 'gt', value)
+
+    def __le__(self, value: Any) -> Expression:
+        return Comparison(self.name, 'lte', value)
+
+    def __lt__(self, value: Any) -> Expression:
+        return Comparison(self.name, 'lt', value)
+
+    def __eq__(self, value: Any) -> Expression:  # type: ignore[override]
+        return Comparison(self.name, 'eq', value)
+
+    def __ne__(self, value: Any) -> Expression:  # type: ignore[override]
+        return Comparison(self.name, 'ne', value)
+
+    def between(self, lower: Any, upper: Any) -> Expression:
+        """``lower <= column <= upper``."""
+        return And(Comparison(self.name, 'gte', lower), Comparison(self.name, 'lte', upper))
+
+    def isin(self, values: Iterable[Any]) -> Expression:
+        return IsIn(self.name, values)
+
+
+def col(name: str) -> Column:
+    """Refer to a column in a ``get_dataframe`` filter expression::
+
+        cupid.get_dataframe(key='key', filters=col('a').between(1, 5) & col('b').isin(['x', 'y']))
+    """
+    return Column(name)
+
+
+class FilterPlan:
+    """How an expression is split between the server query and the client.
+
+    The server gets one ``RowFilter`` list: the pushable terms of a top-level
+    AND, or all the terms of an OR if every one of them is pushable. The
+    ``residual`` rest is evaluated on the Arrow data before it is converted,
+    which needs its columns, so those are fetched too and dropped again.
+    Without an expression there is nothing to split, and the plan only puts
+    the result's columns in ``order``, when that is set.
+    """
+
+    def __init__(self, expression: Optional[Expression], columns: List[str]):
+        if expression is None:
+            terms: List[Expression] = []
+        else:
+            terms = expression.children if isinstance(expression, And) else [expression]
+        self.filter_operation = 'AND'
+        self.filters: List[RowFilter] = []
+        residual: List[Expression] = []
+        row_filters = terms[0].row_filters() if len(terms) == 1 else None
+        if row_filters is not None:
+            self.filters = row_filters
+            self.filter_operation = 'OR' if len(row_filters) > 1 else 'AND'
+        else:
+            for term in terms:
+                row_filters = term.row_filters()
+                if row_filters is not None and len(row_filters) == 1:
+                    self.filters.extend(row_filters)
+                else:
+                    residual.append(term)
+        self.residual: Optional[Expression] = And(*residual) if residual else None
+
+        self.columns = list(columns)
+        self.order: List[str] = []
+        self.extra_columns: List[str] = []
+        if columns and self.residual is not None:
+            self.extra_columns = sorted(self.residual.columns() - set(columns))
+            self.columns.extend(self.extra_columns)
+
+    def apply(self, table: 'pa.Table') -> 'pa.Table':
+        """Evaluate the residual on ``table``, drop the columns only it needed and put the rest in order."""
+        import pyarrow as pa
+
+        if self.residual is not None:
+            try:
+                table = table.filter(self.residual.to_arrow())
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise InvalidQuery(f'Cannot evaluate {self.residual!r}: {e}') from e
+        pandas_metadata = table.schema.pandas_metadata or {}
+        index_columns = pandas_metadata.get('index_columns', [])
+        drop = [c for c in self.extra_columns if c in table.column_names and c not in index_columns]
+        if drop:
+            table = table.drop_columns(drop)
+        if self.order:
+            ordered = [c for c in self.order if c in table.column_names]
+            table = table.select(ordered + [c for c in table.column_names if c not in ordered])
+        return table
+
+    def apply_batch(self, record_batch: 'pa.RecordBatch') -> 'pa.RecordBatch':
+        import pyarrow as pa
+
+        # Filtering a RecordBatch with an expression needs a newer pyarrow than a Table does
+        table = self.apply(pa.Table.from_batches([record_batch]))
+        batches = table.combine_chunks().to_batches()
+        return batches[0] if batches else pa.RecordBatch.from_pylist([], schema=table.schema)
+
+
+Filters = Union[List[RowFilter], Expression]
+
+
+def plan_filters(columns: List[str], filter_operation: str,
+                 filters: Filters) -> Tuple[List[str], str, List[RowFilter], Optional[FilterPlan]]:
+    """Turn ``get_dataframe`` arguments into the query to send and the plan for the rest, if any."""
+    if not isinstance(filters, Expression):
+        return columns, filter_operation, filters, None
+    if filter_operation != 'AND':
+        raise ValueError('filter_operation does not apply to a filter expression; use | instead')
+    plan = FilterPlan(filters, columns)
+    if plan.residual is None:
+        return columns, plan.filter_operation, plan.filters, None
+    return plan.columns, plan.filter_operation, plan.filters, plan
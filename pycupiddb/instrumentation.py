@@ -0,0 +1,244 @@
+import struct
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class CommandEvent:
+    """One command as seen by the connection, passed to ``after`` hooks.
+
+    ``error_code`` is set when the server answered 'ER', including the
+    not-found answers that the client turns into ``None``; ``exception`` is
+    set when no response was received at all.
+    """
+
+    __slots__ = ('message_type', 'request_bytes', 'start', 'duration', 'response_type',
+                 'response_bytes', 'error_code', 'exception')
+
+    def __init__(self, message_type: str, request_bytes: int, start: float):
+        self.message_type = message_type
+        self.request_bytes = request_bytes
+        self.start = start
+        self.duration = 0.0
+        self.response_type: Optional[str] = None
+        self.response_bytes = 0
+        self.error_code: Optional[int] = None
+        self.exception: Optional[BaseException] = None
+
+
+class Histogram:
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """``(upper bound, count)`` pairs as Prometheus reports them, ending with +Inf."""
+        pairs = []
+        total = 0
+        for bound, count in zip(list(self.buckets) + [float('inf')], self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class CommandMetrics:
+
+    def __init__(self, buckets: Sequence[float]):
+        self.count = 0
+        self.failures = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.error_codes: Dict[int, int] = {}
+        self.latency = Histogram(buckets)
+
+
+class Instrumentation:
+    """Opt-in counters, latency histograms and hooks around every command.
+
+    Pass one to a client with ``instrumentation=``; clients built without
+    one skip all of this. Metrics are kept per message type ('SD', 'GD',
+    'GA', ...), and each command of a pipeline is timed from the start of
+    the round trip until its own response has been read::
+
+        instrumentation = Instrumentation()
+        cupid = CupidClient(host='localhost', port=5995, instrumentation=instrumentation)
+        instrumentation.add_hook(after=lambda event: print(event.message_type, event.duration))
+        print(instrumentation.prometheus_text())
+
+    Hooks run on the calling thread, ``before`` just ahead of the timed
+    section and ``after`` once it has ended, so their own time is not
+    counted; their exceptions propagate.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, prefix: str = 'cupiddb_client'):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self.lock = Lock()
+        self.commands: Dict[str, CommandMetrics] = {}
+        self.pool_wait = Histogram(self.buckets)
+        self.before_hooks: List[Tuple[Optional[frozenset], Callable[[str, int], None]]] = []
+        self.after_hooks: List[Tuple[Optional[frozenset], Callable[[CommandEvent], None]]] = []
+
+    def add_hook(self, before: Optional[Callable[[str, int], None]] = None,
+                 after: Optional[Callable[[CommandEvent], None]] = None,
+                 message_types: Optional[Iterable[str]] = None):
+        """Call ``before(message_type, request_bytes)`` and ``after(event)`` around commands.
+
+        With ``message_types`` only those commands are passed to the hooks.
+        """
+        selected = frozenset(message_types) if message_types is not None else None
+        if before is not None:
+            self.before_hooks.append((selected, before))
+        if after is not None:
+            self.after_hooks.append((selected, after))
+
+    def start(self, message_type: str, request_bytes: int) -> CommandEvent:
+        for selected, hook in self.before_hooks:
+            if selected is None or message_type in selected:
+                hook(message_type, request_bytes)
+        return CommandEvent(message_type, request_bytes, time.perf_counter())
+
+    def finish(self, event: CommandEvent, response_type: Optional[str] = None, response_bytes: int = 0,
+               payload: Optional[Any] = None, exception: Optional[BaseException] = None):
+        event.duration = time.perf_counter() - event.start
+        event.response_type = response_type
+        event.response_bytes = response_bytes
+        event.exception = exception
+        if response_type == 'ER' and payload is not None and len(payload) == 2:
+            event.error_code = struct.unpack('>H', payload)[0]
+
+        with self.lock:
+            metrics = self.commands.get(event.message_type)
+            if metrics is None:
+                metrics = self.commands[event.message_type] = CommandMetrics(self.buckets)
+            metrics.count += 1
+            metrics.request_bytes += event.request_bytes
+            metrics.response_bytes += response_bytes
+            metrics.latency.observe(event.duration)
+            if exception is not None:
+                metrics.failures += 1
+            if event.error_code is not None:
+                metrics.error_codes[event.error_code] = metrics.error_codes.get(event.error_code, 0) + 1
+
+        for selected, hook in self.after_hooks:
+            if selected is None or event.message_type in selected:
+                hook(event)
+
+    def observe_pool_wait(self, seconds: float):
+        with self.lock:
+            self.pool_wait.observe(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.commands.clear()
+            self.pool_wait = Histogram(self.buckets)
+
+    def collect(self) -> Dict[str, Any]:
+        """Plain-data snapshot of every metric, for exporters other than Prometheus."""
+        with self.lock:
+            return {
+                'commands': {
+                    message_type: {
+                        'count': metrics.count,
+                        'failures': metrics.failures,
+                        'request_bytes': metrics.request_bytes,
+                        'response_bytes': metrics.response_bytes,
+                        'error_codes': dict(metrics.error_codes),
+                        'latency_sum': metrics.latency.sum,
+                        'latency_buckets': metrics.latency.cumulative(),
+                    }
+                    for message_type, metrics in self.commands.items()
+                },
+                'pool_wait': {
+                    'count': self.pool_wait.count,
+                    'sum': self.pool_wait.sum,
+                    'buckets': self.pool_wait.cumulative(),
+                },
+            }
+
+    def prometheus_text(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        snapshot = self.collect()
+        commands = sorted(snapshot['commands'].items())
+        prefix = self.prefix
+        lines: List[str] = []
+
+        def header(name: str, metric_type: str, help_text: str):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {metric_type}')
+
+        def histogram(name: str, labels: str, count: int, total: float, buckets: List[Tuple[float, int]]):
+            separator = ',' if labels else ''
+            for bound, bucket_count in buckets:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{prefix}_{name}_bucket{{{labels}{separator}le="{le}"}} {bucket_count}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{prefix}_{name}_sum{suffix} {total!r}')
+            lines.append(f'{prefix}_{name}_count{suffix} {count}')
+
+        for name, field, help_text in [
+            ('commands_total', 'count', 'Commands sent, by message type.'),
+            ('failures_total', 'failures', 'Commands that raised before a response was read.'),
+            ('request_bytes_total', 'request_bytes', 'Request payload bytes sent.'),
+            ('response_bytes_total', 'response_bytes', 'Response payload bytes received.'),
+        ]:
+            header(name, 'counter', help_text)
+            for message_type, metrics in commands:
+                lines.append(f'{prefix}_{name}{{command="{message_type}"}} {metrics[field]}')
+
+        header('errors_total', 'counter', 'Error responses, by message type and error code.')
+        for message_type, metrics in commands:
+            for code, count in sorted(metrics['error_codes'].items()):
+                lines.append(f'{prefix}_errors_total{{command="{message_type}",code="{code}"}} {count}')
+
+        header('command_duration_seconds', 'histogram', 'Command round-trip time.')
+        for message_type, metrics in commands:
+            histogram('command_duration_seconds', f'command="{message_type}"', metrics['count'],
+                      metrics['latency_sum'], metrics['latency_buckets'])
+
+        pool_wait = snapshot['pool_wait']
+        header('pool_wait_seconds', 'histogram', 'Time spent waiting to check out a pooled connection.')
+        histogram('pool_wait_seconds', '', pool_wait['count'], pool_wait['sum'], pool_wait['buckets'])
+        return '\n'.join(lines) + '\n'
+
+
+class OpenTelemetryHook:
+    """``after`` hook that records commands on OpenTelemetry instruments.
+
+    Takes a meter from ``opentelemetry.metrics.get_meter`` and needs nothing
+    else from OpenTelemetry::
+
+        instrumentation.add_hook(after=OpenTelemetryHook(meter))
+    """
+
+    def __init__(self, meter: Any, prefix: str = 'cupiddb.client'):
+        self.duration = meter.create_histogram(f'{prefix}.command.duration', unit='s',
+                                               description='Command round-trip time')
+        self.request_size = meter.create_counter(f'{prefix}.request.size', unit='By',
+                                                 description='Request payload bytes sent')
+        self.response_size = meter.create_counter(f'{prefix}.response.size', unit='By',
+                                                  description='Response payload bytes received')
+        self.errors = meter.create_counter(f'{prefix}.errors', description='Error responses and failures')
+
+    def __call__(self, event: CommandEvent):
+        attributes: Dict[str, Any] = {'command': event.message_type}
+        self.duration.record(event.duration, attributes)
+        self.request_size.add(event.request_bytes, attributes)
+        self.response_size.add(event.response_bytes, attributes)
+        if event.error_code is not None:
+            self.errors.add(1, {**attributes, 'code': event.error_code})
+        elif event.exception is not None:
+            self.errors.add(1, {**attributes, 'exception': type(event.exception).__name__})
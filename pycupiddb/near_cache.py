@@ -0,0 +1,137 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Hashable, Optional, Set, Tuple, Union
+
+
+class NearCache:
+    """In-process LRU cache of raw responses, placed in front of ``get``/``get_dataframe``.
+
+    Responses are kept in their wire form and decoded on every hit, so
+    callers never share a mutable object. An entry lives for ``ttl``
+    seconds, or less if the key expires sooner on the server, and the total
+    size of cached payloads stays under ``max_bytes``. The client that owns
+    the cache invalidates entries on its own writes; writes made by other
+    clients are only picked up once the local TTL runs out.
+
+    A read takes a ``generation()`` before it is sent and passes it to
+    ``put``, which drops the response if the key was invalidated since, so
+    that a read that raced with a write cannot cache the old value.
+    """
+
+    entry_overhead = 128
+    # Invalidated keys remembered for reads in flight; beyond this all of them are forgotten at once
+    max_tracked_keys = 4096
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 60.0):
+        assert max_bytes > 0
+        assert ttl > 0
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = Lock()
+        self.entries: 'OrderedDict[Hashable, Tuple[str, str, bytes, float, int]]' = OrderedDict()
+        self.key_index: Dict[str, Set[Hashable]] = {}
+        self.current_bytes = 0
+        self.generation_counter = 0
+        # Generation of the last invalidation of each key, and of the last time all of them were forgotten
+        self.invalidated_at: Dict[str, int] = {}
+        self.invalidated_all_at = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _remove(self, cache_key: Hashable):
+        key, _, _, _, size = self.entries.pop(cache_key)
+        self.current_bytes -= size
+        cache_keys = self.key_index[key]
+        cache_keys.discard(cache_key)
+        if not cache_keys:
+            del self.key_index[key]
+
+    def get(self, cache_key: Hashable) -> Optional[Tuple[str, bytes]]:
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            _, response_type, payload, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(cache_key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(cache_key)
+            self.hits += 1
+            return response_type, payload
+
+    def generation(self) -> int:
+        with self.lock:
+            return self.generation_counter
+
+    def _invalidated_since(self, key: str, generation: int) -> bool:
+        return self.invalidated_at.get(key, self.invalidated_all_at) > generation
+
+    def _bump(self, key: Optional[str] = None):
+        self.generation_counter += 1
+        if key is None or len(self.invalidated_at) >= self.max_tracked_keys:
+            # Forgetting every key makes puts of all earlier generations no-ops, which is safe
+            self.invalidated_at.clear()
+            self.invalidated_all_at = self.generation_counter
+        if key is not None:
+            self.invalidated_at[key] = self.generation_counter
+
+    def put(self, key: str, cache_key: Hashable, response_type: str, payload: Union[bytes, bytearray],
+            server_ttl: float, generation: Optional[int] = None):
+        """Cache a response; ``server_ttl`` is the key's remaining TTL, 0 for none.
+
+        With ``generation``, nothing is cached if ``key`` was invalidated
+        after that generation was taken.
+        """
+        size = len(payload) + self.entry_overhead
+        if size > self.max_bytes:
+            return
+        ttl = min(self.ttl, server_ttl) if server_ttl > 0 else self.ttl
+        # Decoded values may be views into the payload, so keep a copy the caller cannot mutate
+        payload = bytes(payload)
+        with self.lock:
+            if generation is not None and self._invalidated_since(key, generation):
+                return
+            if cache_key in self.entries:
+                self._remove(cache_key)
+            self.entries[cache_key] = (key, response_type, payload, time.monotonic() + ttl, size)
+            self.key_index.setdefault(key, set()).add(cache_key)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        """Drop every cached response for ``key``, including DataFrame queries on it."""
+        with self.lock:
+            self._bump(key)
+            for cache_key in list(self.key_index.get(key, ())):
+                self._remove(cache_key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self._bump()
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.key_index.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,147 @@
+import math
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .exceptions import InvalidDataType
+from .filters import RowFilter
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+
+# Marks the value of a partitioned key, so that other values are not mistaken for a manifest
+MANIFEST_MARKER = '__cupiddb_partitioned__'
+
+# RowFilter data types that compare with each other, and the field holding their value
+_COMPARABLE = {'IN': 'number', 'FL': 'number', 'DA': 'date', 'DT': 'datetime', 'ST': 'string', 'BL': 'bool'}
+_VALUE_FIELDS = {'IN': 'value_int', 'FL': 'value_flt', 'DA': 'value_int', 'DT': 'value_int',
+                 'ST': 'value_str', 'BL': 'value_bol'}
+
+# The smallest and largest value of a column in one partition, as RowFilter would encode them
+ColumnStats = Tuple[str, Any, Any]
+
+
+def split_frame(value: 'pd.DataFrame', partition_by: str, freq: Optional[str],
+                partition_rows: int) -> List['pd.DataFrame']:
+    """Split ``value`` by ``freq`` periods of the ``partition_by`` column or index level.
+
+    Without ``freq`` the frame is sorted by ``partition_by`` and cut into
+    pieces of ``partition_rows`` rows, so that each piece covers a narrow
+    range of it.
+    """
+    import pandas as pd
+
+    if partition_by in value.columns:
+        column = value[partition_by]
+    elif partition_by in value.index.names:
+        column = pd.Series(value.index.get_level_values(partition_by))
+    else:
+        raise ValueError(f'No column or index level named {partition_by!r}')
+
+    if freq is not None:
+        periods = pd.to_datetime(column).dt.to_period(freq)
+        codes, _ = pd.factorize(periods, sort=True)
+        # An empty frame is kept as one partition, so that its columns are still stored
+        return [group for _, group in value.groupby(codes, sort=True)] or [value]
+
+    assert partition_rows >= 1
+    if not column.is_monotonic_increasing:
+        order = pd.Series(column.to_numpy()).sort_values(kind='stable').index.to_numpy()
+        value = value.iloc[order]
+    return [value.iloc[start:start + partition_rows] for start in range(0, max(len(value), 1), partition_rows)]
+
+
+def column_stats(record_batch: 'pa.RecordBatch') -> Dict[str, ColumnStats]:
+    """Min and max of every column that a ``RowFilter`` can compare, index columns included."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    stats: Dict[str, ColumnStats] = {}
+    for name, array in zip(record_batch.schema.names, record_batch.columns):
+        data_type = array.type
+        if pa.types.is_integer(data_type):
+            code = 'IN'
+        elif pa.types.is_floating(data_type):
+            code = 'FL'
+        elif pa.types.is_date(data_type):
+            code = 'DA'
+            array = array.cast(pa.date32()).cast(pa.int32())
+        elif pa.types.is_timestamp(data_type):
+            code = 'DT'
+            array = array.cast(pa.timestamp('ns', tz=data_type.tz)).cast(pa.int64())
+        elif pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+            code = 'ST'
+        elif pa.types.is_boolean(data_type):
+            code = 'BL'
+        else:
+            continue
+        result = pc.min_max(array)
+        low, high = result['min'].as_py(), result['max'].as_py()
+        if low is None or (code == 'FL' and (math.isnan(low) or math.isnan(high))):
+            continue
+        stats[name] = (code, low, high)
+    return stats
+
+
+def _can_match(stats: Dict[str, ColumnStats], row_filter: RowFilter) -> bool:
+    query = row_filter.query_dict
+    column_stats = stats.get(query['col'])
+    if column_stats is None:
+        return True
+    code, low, high = column_stats
+    if _COMPARABLE[code] != _COMPARABLE[query['data_type']]:
+        return True
+    value = query[_VALUE_FIELDS[query['data_type']]]
+    logic = query['filter_type']
+    if logic == 'gte':
+        return high >= value
+    if logic == 'gt':
+        return high > value
+    if logic == 'lte':
+        return low <= value
+    if logic == 'lt':
+        return low < value
+    if logic == 'eq':
+        return low <= value <= high
+    return not low == high == value
+
+
+class PartitionManifest:
+    """The partition keys of a partitioned DataFrame and the column ranges of each.
+
+    Partition keys hold a random generation, so that a rewrite never
+    overwrites partitions that readers of the previous manifest may still
+    be fetching.
+    """
+
+    def __init__(self, key: str, partition_by: str, partitions: List[Dict[str, Any]]):
+        self.key = key
+        self.partition_by = partition_by
+        self.partitions = partitions
+
+    @staticmethod
+    def partition_keys(key: str, count: int) -> List[str]:
+        generation = os.urandom(6).hex()
+        return [f'{key}/{generation}/{index}' for index in range(count)]
+
+    @property
+    def keys(self) -> List[str]:
+        return [partition['key'] for partition in self.partitions]
+
+    def matching(self, filter_operation: str, row_filters: List[RowFilter]) -> List[str]:
+        """Keys of the partitions whose column ranges do not rule out every row."""
+        if not row_filters:
+            return self.keys
+        combine = any if filter_operation == 'OR' else all
+        return [partition['key'] for partition in self.partitions
+                if combine(_can_match(partition['stats'], row_filter) for row_filter in row_filters)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {MANIFEST_MARKER: 1, 'partition_by': self.partition_by, 'partitions': self.partitions}
+
+    @classmethod
+    def from_value(cls, key: str, value: Any) -> 'PartitionManifest':
+        if not isinstance(value, dict) or value.get(MANIFEST_MARKER) != 1:
+            raise InvalidDataType(f'{key!r} does not hold a partitioned DataFrame')
+        return cls(key, value['partition_by'], value['partitions'])
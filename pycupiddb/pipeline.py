@@ -0,0 +1,169 @@
+from typing import TYPE_CHECKING, Any, Callable, List, Literal, Optional, Tuple
+
+from .commands import RowFilter
+from .filters import Filters, plan_filters
+from .connection import Payload, ResponsePayload, ReturnType, payload_length
+
+if TYPE_CHECKING:
+    from .commands import SyncCommand
+    from .prepared import PreparedQuery
+
+
+class Pipeline:
+    """Queue commands and send them in one round trip.
+
+    The queued frames are written on one connection with vectored
+    ``sendmsg`` calls through ``send_buffers``, without joining them first,
+    then the responses are read back in order and passed to the same
+    ``Serializer`` handler the equivalent client call would use::
+
+        with client.pipeline() as pipe:
+            pipe.get(key='a')
+            pipe.ttl(key='a')
+            value, ttl = pipe.execute()
+
+    A command that fails on the server does not affect the others; see
+    ``execute``. Pending commands are executed when the block exits.
+    """
+
+    def __init__(self, client: 'SyncCommand'):
+        self.client = client
+        self.commands: List[Tuple[str, Payload]] = []
+        self.handlers: List[Callable[[str, bytes], Any]] = []
+        self.nbytes = 0
+        self.written_keys: List[str] = []
+        self.flushes = False
+
+    def __enter__(self) -> 'Pipeline':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.commands:
+            self.execute()
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def _queue(self, message_type: str, payload: Payload, handler: Callable[[str, bytes], Any],
+               written_keys: List[str] = []) -> 'Pipeline':
+        self.written_keys.extend(written_keys)
+        self.commands.append((message_type, payload))
+        self.handlers.append(handler)
+        self.nbytes += payload_length(payload)
+        return self
+
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        """Send the queued commands and return their results in order.
+
+        All responses are read before anything is raised, so the connection
+        stays usable. With ``raise_on_error=False`` the exception of a failed
+        command is returned in its slot instead of being raised.
+        """
+        commands, handlers = self.commands, self.handlers
+        written_keys, flushes = self.written_keys, self.flushes
+        self.commands, self.handlers, self.written_keys = [], [], []
+        self.nbytes = 0
+        self.flushes = False
+        if not commands:
+            return []
+
+        try:
+            responses = self.client.connection.send_commands(commands)
+        finally:
+            # Writes may have reached the server even if reading the responses failed
+            if flushes and self.client.near_cache is not None:
+                self.client.near_cache.clear()
+            self.client._invalidate(written_keys)
+        results: List[Any] = []
+        first_error: Optional[Exception] = None
+        for handler, (response_type, payload) in zip(handlers, responses):
+            try:
+                results.append(handler(response_type, payload))
+            except Exception as e:
+                results.append(e)
+                if first_error is None:
+                    first_error = e
+        if raise_on_error and first_error is not None:
+            raise first_error
+        return results
+
+    def _set_value(self, key: str, value: Any, timeout: float, add_only: bool) -> 'Pipeline':
+        data_type, byte_data = self.client._encode_value(value)
+        payload = self.client._encode_set_data(data_type=data_type, key=key, byte_data=byte_data,
+                                               timeout=timeout, add_only=add_only)
+        return self._queue('SD', payload, self.client._process_set_data, written_keys=[key])
+
+    def set(self, key: str, value: Any, timeout: float = 0.0) -> 'Pipeline':
+        return self._set_value(key=key, value=value, timeout=timeout, add_only=False)
+
+    def add(self, key: str, value: Any, timeout: float = 0.0) -> 'Pipeline':
+        return self._set_value(key=key, value=value, timeout=timeout, add_only=True)
+
+    def incr(self, key: str, delta: int = 1) -> 'Pipeline':
+        return self._queue('II', self.client._encode_incr(key=key, delta=delta),
+                           self.client._process_incr, written_keys=[key])
+
+    def incr_float(self, key: str, delta: float = 1.0) -> 'Pipeline':
+        return self._queue('IF', self.client._encode_incr_float(key=key, delta=delta),
+                           self.client._process_incr_float, written_keys=[key])
+
+    def get_dataframe(
+        self,
+        key: str,
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: ReturnType = 'pandas'
+    ) -> 'Pipeline':
+        columns, operation, row_filters, plan = plan_filters(columns, filter_operation, filters)
+        payload = self.client._encode_get_dataframe(key=key, columns=columns,
+                                                    filter_operation=operation, filters=row_filters,
+                                                    result_cache_timeout=result_cache_timeout,
+                                                    compression_type=compression_type)
+
+        def handler(response_type: str, payload: ResponsePayload) -> Any:
+            return self.client._process_get_dataframe_response(response_type=response_type,
+                                                               payload=payload, return_type=return_type,
+                                                               plan=plan)
+        return self._queue('GA', payload, handler)
+
+    def get_prepared(self, query: 'PreparedQuery', return_type: ReturnType = 'pandas') -> 'Pipeline':
+        def handler(response_type: str, payload: ResponsePayload) -> Any:
+            return self.client._process_get_dataframe_response(response_type=response_type,
+                                                               payload=payload, return_type=return_type,
+                                                               plan=query.plan)
+        return self._queue('GA', query.payload, handler)
+
+    def get(self, key: str, default: Optional[Any] = None, return_type: ReturnType = 'pandas') -> 'Pipeline':
+        def handler(response_type: str, payload: ResponsePayload) -> Any:
+            return self.client._process_get_response(response_type=response_type, payload=payload,
+                                                     default=default, return_type=return_type)
+        return self._queue('GD', self.client._encode_key(key), handler)
+
+    def delete(self, key: str) -> 'Pipeline':
+        return self._queue('DL', self.client._encode_key(key), self.client._process_delete,
+                           written_keys=[key])
+
+    def delete_many(self, keys: List[str]) -> 'Pipeline':
+        return self._queue('DM', self.client._encode_delete_many(keys),
+                           self.client._process_delete_many, written_keys=keys)
+
+    def touch(self, key: str, timeout: float) -> 'Pipeline':
+        return self._queue('TH', self.client._encode_touch(key=key, timeout=timeout),
+                           self.client._process_touch_response, written_keys=[key])
+
+    def ttl(self, key: str) -> 'Pipeline':
+        return self._queue('TL', self.client._encode_key(key), self.client._process_ttl_response)
+
+    def has_key(self, key: str) -> 'Pipeline':
+        return self._queue('HK', self.client._encode_key(key),
+                           self.client._process_has_key_response)
+
+    def keys(self, pattern: Optional[str] = None) -> 'Pipeline':
+        return self._queue('LS', self.client._encode_keys(pattern), self.client._process_keys_response)
+
+    def flush(self) -> 'Pipeline':
+        self.flushes = True
+        return self._queue('FU', bytes(), self.client._process_flush_response)
@@ -0,0 +1,231 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from .connection import Payload, ResponsePayload, SyncConnection, backoff_delay
+from .exceptions import ConnectionError, PoolTimeoutError, ReadTimeoutError
+from .instrumentation import Instrumentation
+
+
+T = TypeVar('T')
+
+# Reads that can be sent again after a connection failure without changing anything
+IDEMPOTENT_COMMANDS = frozenset(['GD', 'GA', 'HK', 'TL', 'LS'])
+
+
+class ConnectionPool:
+    """Thread-safe pool of ``SyncConnection`` sockets.
+
+    Each command checks out its own connection, so concurrent threads do not
+    queue behind one another's requests. Connections above ``min_size`` that
+    stay idle for longer than ``idle_timeout`` seconds are closed.
+
+    Idle connections the server has closed, for example across a restart,
+    are replaced at checkout. An idempotent command (see
+    ``IDEMPOTENT_COMMANDS``) that fails with ``ConnectionError`` is retried
+    up to ``command_retries`` times on a new connection, the first time at
+    once and then after an exponential backoff with jitter starting from
+    ``command_retry_delay`` seconds. Writes are never retried, since the
+    server may have applied them before the failure, and neither are read
+    timeouts, so that ``read_timeout`` keeps bounding a slow server.
+    """
+
+    wait_samples = 1024
+    max_command_retry_delay = 1.0
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        min_size: int = 1,
+        max_size: int = 1,
+        checkout_timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        command_retries: int = 2,
+        command_retry_delay: float = 0.05,
+        **connection_kwargs: Any
+    ):
+        assert max_size >= 1
+        assert 0 <= min_size <= max_size
+        self.host = host
+        self.port = port
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.instrumentation = instrumentation
+        self.command_retries = command_retries
+        self.command_retry_delay = command_retry_delay
+        self.connection_kwargs = connection_kwargs
+
+        self._condition = Condition()
+        self._idle: Deque[Tuple[SyncConnection, float]] = deque()
+        self._size = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reaped = 0
+        self._dead = 0
+        self._retries = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_recent: Deque[float] = deque(maxlen=self.wait_samples)
+
+        for _ in range(min_size):
+            self._idle.append((self._new_connection(), time.monotonic()))
+            self._size += 1
+
+    def _new_connection(self) -> SyncConnection:
+        return SyncConnection(host=self.host, port=self.port, instrumentation=self.instrumentation,
+                              **self.connection_kwargs)
+
+    def _reap_idle(self, now: float):
+        if self.idle_timeout is None:
+            return
+        while self._idle and self._size > self.min_size and \
+                now - self._idle[0][1] > self.idle_timeout:
+            connection, _ = self._idle.popleft()
+            connection.close()
+            self._size -= 1
+            self._reaped += 1
+
+    def _acquire(self) -> SyncConnection:
+        start = time.monotonic()
+        connection: Optional[SyncConnection] = None
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise ConnectionError('Connection pool is closed')
+                now = time.monotonic()
+                self._reap_idle(now)
+                if self._idle:
+                    connection = self._idle.pop()[0]
+                    if not connection.is_alive():
+                        # Replaced below by a new connection that takes over its slot
+                        connection.close()
+                        connection = None
+                        self._dead += 1
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                if self.checkout_timeout is not None:
+                    remaining = start + self.checkout_timeout - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f'No connection available after {self.checkout_timeout} seconds')
+                    self._condition.wait(remaining)
+                else:
+                    self._condition.wait()
+
+            wait_time = time.monotonic() - start
+            self._checkouts += 1
+            self._wait_total += wait_time
+            self._wait_max = max(self._wait_max, wait_time)
+            self._wait_recent.append(wait_time)
+
+        if self.instrumentation is not None:
+            self.instrumentation.observe_pool_wait(wait_time)
+        if connection is None:
+            try:
+                connection = self._new_connection()
+            except BaseException:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+        return connection
+
+    def _release(self, connection: SyncConnection, discard: bool = False):
+        with self._condition:
+            if discard or self._closed:
+                connection.close()
+                self._size -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def checkout(self) -> Iterator[SyncConnection]:
+        """Borrow a connection for exclusive use by the calling thread.
+
+        A connection that raised while checked out may have a partially
+        read response on it, so it is closed instead of being reused.
+        """
+        connection = self._acquire()
+        try:
+            yield connection
+        except BaseException:
+            self._release(connection, discard=True)
+            raise
+        self._release(connection)
+
+    def _retry(self, idempotent: bool, send: Callable[[], T]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return send()
+            except ReadTimeoutError:
+                raise
+            except ConnectionError:
+                if not idempotent or attempt >= self.command_retries:
+                    raise
+            if attempt > 0:
+                time.sleep(backoff_delay(attempt - 1, self.command_retry_delay, self.max_command_retry_delay))
+            attempt += 1
+            with self._condition:
+                self._retries += 1
+
+    def send_command(self, message_type: str, payload: Payload) -> Tuple[str, ResponsePayload]:
+        def send() -> Tuple[str, ResponsePayload]:
+            with self.checkout() as connection:
+                return connection.send_command(message_type=message_type, payload=payload)
+        return self._retry(message_type in IDEMPOTENT_COMMANDS, send)
+
+    def send_commands(self, commands: List[Tuple[str, Payload]]) -> List[Tuple[str, ResponsePayload]]:
+        def send() -> List[Tuple[str, ResponsePayload]]:
+            with self.checkout() as connection:
+                return connection.send_commands(commands)
+        return self._retry(all(message_type in IDEMPOTENT_COMMANDS for message_type, _ in commands), send)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                connection, _ = self._idle.popleft()
+                connection.close()
+                self._size -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of pool occupancy and checkout wait times in seconds."""
+        with self._condition:
+            recent: List[float] = sorted(self._wait_recent)
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'reaped': self._reaped,
+                'dead': self._dead,
+                'retries': self._retries,
+                'wait_total': self._wait_total,
+                'wait_max': self._wait_max,
+                'wait_mean': self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'wait_p50': _percentile(recent, 0.50),
+                'wait_p99': _percentile(recent, 0.99),
+            }
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
@@ -0,0 +1,124 @@
+import copy
+import json
+import re
+from typing import Any, Dict, List, Literal, Optional, Sequence, Union
+
+from .filters import DataType, Expression, FilterPlan, Logic, RowFilter, plan_filters
+
+
+_TYPE_CODES = {'int': 'IN', 'float': 'FL', 'date': 'DA', 'datetime': 'DT', 'string': 'ST', 'bool': 'BL'}
+_VALUE_FIELDS = {'int': 'value_int', 'float': 'value_flt', 'date': 'value_int', 'datetime': 'value_int',
+                 'string': 'value_str', 'bool': 'value_bol'}
+
+# A placeholder is encoded as a JSON string holding a NUL byte and its name
+_PLACEHOLDER = re.compile(r'"\\u0000(\w+)"')
+
+
+class Placeholder:
+    """A ``RowFilter`` whose value is supplied later with ``PreparedQuery.bind``."""
+
+    def __init__(self, name: str, column: str, logic: Logic, data_type: DataType):
+        assert name.isidentifier()
+        assert logic in ['gte', 'gt', 'lte', 'lt', 'eq', 'ne']
+        assert data_type in _TYPE_CODES
+        assert data_type != 'bool' or logic == 'eq'
+        self.name = name
+        self.column = column
+        self.logic = logic
+        self.data_type = data_type
+
+    def encode(self, value: Any) -> bytes:
+        """The JSON for ``value`` in this filter, checked and converted as ``RowFilter`` does."""
+        row_filter = RowFilter(column=self.column, logic=self.logic, value=value, data_type=self.data_type)
+        return json.dumps(row_filter.query_dict[_VALUE_FIELDS[self.data_type]]).encode()
+
+
+class PreparedQuery:
+    """A ``get_dataframe`` query encoded once, for running many times::
+
+        query = PreparedQuery(key='prices', columns=['close', 'open'], filters=[
+            Placeholder('since', column='date', logic='gte', data_type='date'),
+            RowFilter(column='close', logic='gt', value=0.0, data_type='float'),
+        ], result_cache_timeout=60)
+        df = cupid.get_prepared(query.bind(since=date(2024, 1, 1)))
+
+    The query is put in canonical form, with columns and filters sorted and
+    deduplicated, so that queries that differ only in order send the same
+    bytes and hit the same server result cache entry. The result still has
+    its columns in the order given, less repeats. ``bind``
+    returns a copy with placeholder values filled in, which only encodes
+    the new values.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        columns: Sequence[str] = (),
+        filters: Union[Sequence[Union[RowFilter, Placeholder]], Expression] = (),
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = ''
+    ):
+        self.key = key
+        filter_list: Any = filters if isinstance(filters, Expression) else list(filters)
+        query_columns, operation, row_filters, self.plan = plan_filters(list(columns), filter_operation,
+                                                                        filter_list)
+        order = list(dict.fromkeys(columns))
+        if order != sorted(order):
+            if self.plan is None:
+                self.plan = FilterPlan(None, query_columns)
+            self.plan.order = order
+        self.placeholders: Dict[str, Placeholder] = {}
+        entries = []
+        for row_filter in row_filters:
+            if isinstance(row_filter, Placeholder):
+                placeholder: Placeholder = row_filter
+                self.placeholders[placeholder.name] = placeholder
+                entries.append({'col': placeholder.column, 'filter_type': placeholder.logic,
+                                'data_type': _TYPE_CODES[placeholder.data_type],
+                                _VALUE_FIELDS[placeholder.data_type]: '\x00' + placeholder.name})
+            else:
+                entries.append(row_filter.query_dict)
+        # AND and OR do not depend on order or repetition
+        canonical = sorted({json.dumps(entry, sort_keys=True): entry for entry in entries}.items())
+        query_dict = {
+            'key': key,
+            'columns': sorted(set(query_columns)),
+            'filterlogic': operation,
+            'filter': [entry for _, entry in canonical],
+            'cachetime': int(result_cache_timeout * 1000),
+            'compression_type': compression_type,
+        }
+        parts = _PLACEHOLDER.split(json.dumps(query_dict, separators=(',', ':')))
+        # Literal text at even positions, placeholder names at odd ones
+        self._segments: List[bytes] = [part.encode() for part in parts[0::2]]
+        self._names: List[str] = parts[1::2]
+        self.values: Dict[str, bytes] = {}
+        self._payload: Optional[bytes] = self._segments[0] if not self._names else None
+
+    def bind(self, **values: Any) -> 'PreparedQuery':
+        unknown = set(values) - set(self.placeholders)
+        if unknown:
+            raise ValueError(f'Unknown placeholders: {", ".join(sorted(unknown))}')
+        bound = copy.copy(self)
+        bound.values = {**self.values,
+                        **{name: self.placeholders[name].encode(value) for name, value in values.items()}}
+        bound._payload = None
+        if all(name in bound.values for name in self._names):
+            pieces = [self._segments[0]]
+            for name, segment in zip(self._names, self._segments[1:]):
+                pieces.append(bound.values[name])
+                pieces.append(segment)
+            bound._payload = b''.join(pieces)
+        return bound
+
+    @property
+    def payload(self) -> bytes:
+        """The encoded GA payload; raises ``ValueError`` while a placeholder is unbound."""
+        if self._payload is None:
+            missing = sorted(set(self._names) - set(self.values))
+            raise ValueError(f'Unbound placeholders: {", ".join(missing)}')
+        return self._payload
+
+    def __repr__(self) -> str:
+        return f'PreparedQuery(key={self.key!r})'
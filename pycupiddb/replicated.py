@@ -0,0 +1,348 @@
+import math
+import time
+from collections import deque
+from threading import Event, Lock
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterator, List, Literal, Mapping, Optional, \
+    Sequence, TypeVar, Union
+
+from .client import CupidClient
+from .filters import Filters
+from .connection import DataFrameResult, ReturnType, new_executor
+from .exceptions import ConnectionError, PoolTimeoutError
+from .sharded import Node, _node_client, _node_name, _pool_stats
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+    import pandas as pd
+    import pyarrow as pa
+    from .prepared import PreparedQuery
+
+
+T = TypeVar('T')
+
+# Failures that another replica may not have; any other error would only repeat there
+FAILOVER_ERRORS = (ConnectionError, PoolTimeoutError)
+
+
+class LatencyTracker:
+    """Read latency of one replica as an exponentially weighted moving average.
+
+    The average fades towards zero while a node goes unused, ``decay``
+    seconds per factor of e, so a node that was slow once is tried again
+    later instead of being avoided for good. Recent samples are kept for
+    the hedging percentile.
+    """
+
+    samples = 256
+
+    def __init__(self, alpha: float = 0.3, decay: float = 10.0):
+        self.alpha = alpha
+        self.decay = decay
+        self.ewma = 0.0
+        self.updated = 0.0
+        self.pending = 0
+        self.recent: Deque[float] = deque(maxlen=self.samples)
+
+    def _decayed(self, now: float) -> float:
+        return self.ewma * math.exp((self.updated - now) / self.decay)
+
+    def observe(self, seconds: float):
+        now = time.monotonic()
+        # The fade while unused is kept, so one fast probe after a penalty is enough to bring traffic back
+        self.ewma = seconds if not self.recent else self.alpha * seconds + (1 - self.alpha) * self._decayed(now)
+        self.updated = now
+        self.recent.append(seconds)
+
+    def penalize(self, seconds: float):
+        """Count a failed read as a slow one, so that reads move to other replicas."""
+        now = time.monotonic()
+        self.ewma = max(self._decayed(now) * 2, seconds, 1.0)
+        self.updated = now
+
+    def score(self, now: float) -> float:
+        # Reads already in flight count too, so concurrent callers spread over the replicas
+        return self._decayed(now) * (self.pending + 1)
+
+    def percentile(self, fraction: float) -> float:
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ReplicatedCupidClient:
+    """Client for several CupidDB nodes that hold the same data::
+
+        cupid = ReplicatedCupidClient(['10.0.0.1:5995', '10.0.0.2:5995'], hedge_percentile=0.95)
+
+    Writes go to every node in parallel, or only to ``primary`` when the
+    nodes replicate from it themselves, and return the result of the first
+    node. Reads go to the node with the lowest ``LatencyTracker`` score and
+    move on to the next node if that one fails to connect or times out.
+
+    With ``hedge_percentile``, a ``get`` or ``get_dataframe`` still running
+    after that percentile of the node's recent latencies is sent to the
+    next best node as well, and whichever answers first is returned. Hedging
+    starts once a node has ``hedge_min_samples`` samples. Hedged reads and
+    the writes to all but one node run on a pool of ``max_workers``
+    threads, the ``ThreadPoolExecutor`` default when ``None``. The set of
+    replicas is fixed, and the remaining keyword arguments configure all of
+    their clients alike.
+    """
+
+    hedge_min_samples = 20
+
+    def __init__(self, nodes: Sequence[Node], primary: Optional[Node] = None,
+                 hedge_percentile: Optional[float] = None, ewma_alpha: float = 0.3, ewma_decay: float = 10.0,
+                 max_workers: Optional[int] = None, **kwargs):
+        clients = {_node_name(node): _node_client(node, **kwargs) for node in nodes}
+        self._setup(clients, primary, hedge_percentile, ewma_alpha, ewma_decay, max_workers)
+
+    @classmethod
+    def from_clients(cls, clients: Mapping[str, CupidClient], primary: Optional[str] = None,
+                     hedge_percentile: Optional[float] = None, ewma_alpha: float = 0.3,
+                     ewma_decay: float = 10.0, max_workers: Optional[int] = None) -> 'ReplicatedCupidClient':
+        """Use existing clients as the replicas, such as ones with a shorter ``read_timeout`` for a remote site.
+
+        ``primary``, if given, is one of the names in ``clients``.
+        """
+        replicated = cls.__new__(cls)
+        replicated._setup(dict(clients), primary, hedge_percentile, ewma_alpha, ewma_decay, max_workers)
+        return replicated
+
+    def _setup(self, clients: Dict[str, CupidClient], primary: Optional[Node],
+               hedge_percentile: Optional[float], ewma_alpha: float, ewma_decay: float,
+               max_workers: Optional[int]):
+        if not clients:
+            raise ValueError('At least one node is needed')
+        self.clients = clients
+        self.primary = _node_name(primary) if primary is not None else None
+        if self.primary is not None and self.primary not in clients:
+            raise ValueError(f'Primary {self.primary} is not one of the nodes')
+        assert hedge_percentile is None or 0 < hedge_percentile < 1
+        self.hedge_percentile = hedge_percentile
+        self.trackers = {node: LatencyTracker(alpha=ewma_alpha, decay=ewma_decay) for node in clients}
+        self.lock = Lock()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.max_workers = max_workers
+        self._executor: Optional['ThreadPoolExecutor'] = None
+
+    def _get_executor(self) -> 'ThreadPoolExecutor':
+        with self.lock:
+            if self._executor is None:
+                self._executor = new_executor(self.max_workers, thread_name_prefix='cupiddb-replica')
+            return self._executor
+
+    def _ranked(self) -> List[str]:
+        now = time.monotonic()
+        with self.lock:
+            return sorted(self.clients, key=lambda node: self.trackers[node].score(now))
+
+    def _timed(self, node: str, read: Callable[[CupidClient], T]) -> T:
+        tracker = self.trackers[node]
+        with self.lock:
+            tracker.pending += 1
+        start = time.perf_counter()
+        try:
+            result = read(self.clients[node])
+        except FAILOVER_ERRORS:
+            with self.lock:
+                tracker.penalize(time.perf_counter() - start)
+            raise
+        finally:
+            with self.lock:
+                tracker.pending -= 1
+        with self.lock:
+            tracker.observe(time.perf_counter() - start)
+        return result
+
+    def _read(self, read: Callable[[CupidClient], T], hedge: bool = False) -> T:
+        nodes = self._ranked()
+        if hedge and self.hedge_percentile is not None and len(nodes) > 1:
+            tracker = self.trackers[nodes[0]]
+            if len(tracker.recent) >= self.hedge_min_samples:
+                return self._hedged_read(nodes, read, tracker.percentile(self.hedge_percentile))
+        return self._failover(nodes, read)
+
+    def _failover(self, nodes: List[str], read: Callable[[CupidClient], T]) -> T:
+        """Try ``nodes`` in order until one neither fails to connect nor times out."""
+        for node in nodes[:-1]:
+            try:
+                return self._timed(node, read)
+            except FAILOVER_ERRORS:
+                pass
+        return self._timed(nodes[-1], read)
+
+    def _hedged_read(self, nodes: List[str], read: Callable[[CupidClient], T], delay: float) -> T:
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        executor = self._get_executor()
+        started = Event()
+
+        def primary() -> T:
+            started.set()
+            return self._timed(nodes[0], read)
+
+        first = executor.submit(primary)
+        # The delay counts from the start of the read, not from when it was queued
+        started.wait()
+        done, _ = wait([first], timeout=delay)
+        if done and not isinstance(first.exception(), FAILOVER_ERRORS):
+            return first.result()
+
+        with self.lock:
+            self.hedged += 1
+        futures: List['Future[T]'] = [first, executor.submit(self._timed, nodes[1], read)]
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is not first:
+                        with self.lock:
+                            self.hedge_wins += 1
+                    # The slower request finishes in the background and its result is dropped
+                    return future.result()
+                if not isinstance(error, FAILOVER_ERRORS):
+                    raise error
+            futures = [future for future in futures if future not in done]
+        # Both hedged nodes failed to connect or timed out, so the rest are tried like an unhedged read
+        return self._failover(nodes[2:], read) if len(nodes) > 2 else first.result()
+
+    def _write(self, write: Callable[[CupidClient], T]) -> T:
+        if self.primary is not None:
+            return write(self.clients[self.primary])
+        clients = list(self.clients.values())
+        if len(clients) == 1:
+            return write(clients[0])
+        executor = self._get_executor()
+        futures = [executor.submit(write, client) for client in clients[1:]]
+        try:
+            result = write(clients[0])
+        finally:
+            # Every write is waited for, so that a failure on any node is raised
+            for future in futures:
+                future.result()
+        return result
+
+    def set(self, key: str, value: Any, timeout: float = 0.0,
+            compression: Optional[Literal['lz4', 'zstd']] = None,
+            compression_level: Optional[int] = None):
+        self._write(lambda client: client.set(key=key, value=value, timeout=timeout, compression=compression,
+                                              compression_level=compression_level))
+
+    def add(self, key: str, value: Any, timeout: float = 0.0,
+            compression: Optional[Literal['lz4', 'zstd']] = None,
+            compression_level: Optional[int] = None) -> bool:
+        return self._write(lambda client: client.add(key=key, value=value, timeout=timeout,
+                                                     compression=compression,
+                                                     compression_level=compression_level))
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        return self._write(lambda client: client.incr(key=key, delta=delta))
+
+    def incr_float(self, key: str, delta: float = 1.0) -> float:
+        return self._write(lambda client: client.incr_float(key=key, delta=delta))
+
+    def get_dataframe(
+        self,
+        key: str,
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: ReturnType = 'pandas'
+    ) -> Optional[DataFrameResult]:
+        return self._read(lambda client: client.get_dataframe(
+            key=key, columns=columns, filter_operation=filter_operation, filters=filters,
+            result_cache_timeout=result_cache_timeout, compression_type=compression_type,
+            return_type=return_type), hedge=True)
+
+    def get_prepared(self, query: 'PreparedQuery', return_type: ReturnType = 'pandas') -> Optional[DataFrameResult]:
+        return self._read(lambda client: client.get_prepared(query, return_type=return_type), hedge=True)
+
+    def get_dataframes(
+        self,
+        keys: Sequence[str],
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: Literal['pandas', 'arrow'] = 'pandas',
+        concat: bool = False,
+        max_workers: Optional[int] = None
+    ) -> Union[Dict[str, Union['pd.DataFrame', 'pa.Table']], 'pd.DataFrame', 'pa.Table', None]:
+        return self._read(lambda client: client.get_dataframes(
+            keys, columns=columns, filter_operation=filter_operation, filters=filters,
+            result_cache_timeout=result_cache_timeout, compression_type=compression_type,
+            return_type=return_type, concat=concat, max_workers=max_workers))
+
+    def iter_dataframe(
+        self,
+        key: str,
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: Literal['pandas', 'arrow'] = 'pandas'
+    ) -> Iterator[Union['pd.DataFrame', 'pa.RecordBatch']]:
+        # A stream cannot be hedged or timed as a whole, so it goes to the best node as it stands
+        client = self.clients[self._ranked()[0]]
+        return client.iter_dataframe(key=key, columns=columns, filter_operation=filter_operation,
+                                     filters=filters, result_cache_timeout=result_cache_timeout,
+                                     compression_type=compression_type, return_type=return_type)
+
+    def get(self, key: str, default: Optional[Any] = None, return_type: ReturnType = 'pandas') -> Optional[Any]:
+        return self._read(lambda client: client.get(key=key, default=default, return_type=return_type),
+                          hedge=True)
+
+    def get_many(self, keys: List[str], chunk_size: int = 1000) -> Dict[str, Any]:
+        return self._read(lambda client: client.get_many(keys, chunk_size=chunk_size))
+
+    def set_many(self, mapping: Mapping[str, Any], timeout: float = 0.0, chunk_size: int = 1000,
+                 max_chunk_bytes: int = 64 * 1024 * 1024):
+        self._write(lambda client: client.set_many(mapping, timeout=timeout, chunk_size=chunk_size,
+                                                   max_chunk_bytes=max_chunk_bytes))
+
+    def delete(self, key: str) -> bool:
+        return self._write(lambda client: client.delete(key=key))
+
+    def delete_many(self, keys: List[str]) -> int:
+        return self._write(lambda client: client.delete_many(keys))
+
+    def touch(self, key: str, timeout: float) -> bool:
+        return self._write(lambda client: client.touch(key=key, timeout=timeout))
+
+    def ttl(self, key: str) -> Optional[float]:
+        return self._read(lambda client: client.ttl(key=key))
+
+    def has_key(self, key: str) -> bool:
+        return self._read(lambda client: client.has_key(key=key))
+
+    def keys(self, pattern: Optional[str] = None) -> list:
+        return self._read(lambda client: client.keys(pattern))
+
+    def flush(self):
+        self._write(lambda client: client.flush())
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Current read latency average, score and in-flight reads of every node."""
+        now = time.monotonic()
+        with self.lock:
+            return {node: {'ewma': tracker.ewma, 'score': tracker.score(now), 'pending': tracker.pending,
+                           'samples': len(tracker.recent)}
+                    for node, tracker in self.trackers.items()}
+
+    def pool_stats(self) -> Dict[str, Dict[str, float]]:
+        """Pool stats by replica; read latencies are in ``latency_stats``."""
+        return _pool_stats(self.clients)
+
+    def close(self):
+        with self.lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        for client in self.clients.values():
+            client.close()
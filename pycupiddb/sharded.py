@@ -0,0 +1,435 @@
+import hashlib
+from bisect import bisect
+from functools import partial
+from threading import Lock, local
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Literal, Mapping, Optional, \
+    Sequence, Tuple, TypeVar, Union
+
+from .client import CupidClient, concat_tables
+from .filters import Filters
+from .connection import DataFrameResult, ReturnType, new_executor
+from .pipeline import Pipeline
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    import pandas as pd
+    import pyarrow as pa
+    from .prepared import PreparedQuery
+
+
+T = TypeVar('T')
+
+Node = Union[str, Tuple[str, int]]
+
+
+def _hash(value: str) -> int:
+    # Python's hash() is salted per process, so clients would disagree on placement
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+def _node_name(node: Node) -> str:
+    if isinstance(node, str):
+        return node
+    host, port = node
+    return f'{host}:{port}'
+
+
+def _node_client(node: Node, **kwargs) -> CupidClient:
+    host, _, port = _node_name(node).rpartition(':')
+    return CupidClient(host=host, port=port, **kwargs)
+
+
+def _pool_stats(clients: Mapping[str, CupidClient]) -> Dict[str, Dict[str, float]]:
+    return {node: client.pool_stats() for node, client in clients.items()}
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to node names.
+
+    Each node is placed at ``virtual_nodes * weight`` points on the ring and
+    owns the keys that hash to just before its points, so adding or removing
+    a node only moves the keys between it and its neighbours, about
+    ``1 / len(nodes)`` of them.
+    """
+
+    def __init__(self, virtual_nodes: int = 160):
+        assert virtual_nodes >= 1
+        self.virtual_nodes = virtual_nodes
+        self.weights: Dict[str, float] = {}
+        self._ring: Tuple[List[int], List[str]] = ([], [])
+
+    def add(self, node: str, weight: float = 1.0):
+        assert weight > 0
+        self.weights[node] = weight
+        self._build()
+
+    def remove(self, node: str):
+        del self.weights[node]
+        self._build()
+
+    def _build(self):
+        points = []
+        for node, weight in self.weights.items():
+            for replica in range(max(1, round(self.virtual_nodes * weight))):
+                points.append((_hash(f'{node}#{replica}'), node))
+        points.sort()
+        # Swapped in as one tuple so that lookups never see half a rebuild
+        self._ring = ([point for point, _ in points], [node for _, node in points])
+
+    def node_for(self, key: str) -> str:
+        hashes, nodes = self._ring
+        if not nodes:
+            raise ValueError('The hash ring has no nodes')
+        return nodes[bisect(hashes, _hash(key)) % len(nodes)]
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+
+class ShardedCupidClient:
+    """Spreads keys over several CupidDB nodes with a ``HashRing``::
+
+        cupid = ShardedCupidClient(['10.0.0.1:5995', '10.0.0.2:5995'],
+                                   weights={'10.0.0.2:5995': 2.0})
+
+    It has the same methods as ``CupidClient``. Single-key commands go to
+    the key's node; ``get_many``, ``set_many``, ``delete_many``, ``keys``
+    and ``flush`` send one request per node in parallel and merge the
+    results. The remaining keyword arguments are kept as the ``CupidClient``
+    settings of every node, including the ones added later by ``add_node``.
+    """
+
+    def __init__(self, nodes: Sequence[Node], weights: Optional[Mapping[str, float]] = None,
+                 virtual_nodes: int = 160, **kwargs):
+        self.ring = HashRing(virtual_nodes=virtual_nodes)
+        self.clients: Dict[str, CupidClient] = {}
+        self.client_kwargs = kwargs
+        self.lock = Lock()
+        self._local = local()
+        self._executor: Optional['ThreadPoolExecutor'] = None
+        # Number of _map calls still using each executor, the current one or a replaced one
+        self._executor_users: Dict['ThreadPoolExecutor', int] = {}
+        for node in nodes:
+            name = _node_name(node)
+            self.add_node(name, weight=(weights or {}).get(name, 1.0))
+
+    @classmethod
+    def from_clients(cls, clients: Mapping[str, CupidClient], weights: Optional[Mapping[str, float]] = None,
+                     virtual_nodes: int = 160) -> 'ShardedCupidClient':
+        """Build the ring from named clients, such as embedded stores.
+
+        The names place the nodes on the ring, so every process sharing the
+        data must use the same ones.
+        """
+        sharded = cls([], virtual_nodes=virtual_nodes)
+        for name, client in clients.items():
+            sharded.add_node(name, weight=(weights or {}).get(name, 1.0), client=client)
+        return sharded
+
+    def add_node(self, node: Node, weight: float = 1.0, client: Optional[CupidClient] = None):
+        """Add a node; the keys it takes over are not copied from their previous node."""
+        name = _node_name(node)
+        if client is None:
+            client = _node_client(name, **self.client_kwargs)
+        with self.lock:
+            if name in self.clients:
+                raise ValueError(f'Node {name} is already in the ring')
+            self.clients[name] = client
+            self.ring.add(name, weight)
+            self._reset_executor()
+
+    def remove_node(self, node: Node):
+        """Take a node out of the ring and close its client."""
+        name = _node_name(node)
+        with self.lock:
+            client = self.clients.pop(name)
+            self.ring.remove(name)
+            self._reset_executor()
+        client.close()
+
+    def _reset_executor(self):
+        # The pool is sized to the node count, so it is recreated when that changes. Called with
+        # the lock held; an executor that _map calls still submit to is shut down by the last of them.
+        executor, self._executor = self._executor, None
+        if executor is not None and executor not in self._executor_users:
+            executor.shutdown(wait=False)
+
+    def node_for(self, key: str) -> str:
+        return self.ring.node_for(key)
+
+    def client_for(self, key: str) -> CupidClient:
+        return self.clients[self.ring.node_for(key)]
+
+    def _map(self, call: Callable[[CupidClient, T], Any], work: Mapping[str, T]) -> Dict[str, Any]:
+        """Run ``call(client, item)`` for every node in ``work`` at once and collect the results."""
+        if len(work) <= 1:
+            return {node: call(self.clients[node], item) for node, item in work.items()}
+        with self.lock:
+            if self._executor is None:
+                self._executor = new_executor(len(self.clients), thread_name_prefix='cupiddb-shard')
+            executor = self._executor
+            self._executor_users[executor] = self._executor_users.get(executor, 0) + 1
+        try:
+            futures = {node: executor.submit(call, self.clients[node], item) for node, item in work.items()}
+            return {node: future.result() for node, future in futures.items()}
+        finally:
+            with self.lock:
+                users = self._executor_users.pop(executor) - 1
+                if users:
+                    self._executor_users[executor] = users
+                retired = not users and executor is not self._executor
+            if retired:
+                executor.shutdown(wait=False)
+
+    def _group(self, keys: Sequence[str]) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for key in keys:
+            groups.setdefault(self.ring.node_for(key), []).append(key)
+        return groups
+
+    def _all_nodes(self) -> Dict[str, None]:
+        return {node: None for node in self.clients}
+
+    def set(self, key: str, value: Any, timeout: float = 0.0,
+            compression: Optional[Literal['lz4', 'zstd']] = None,
+            compression_level: Optional[int] = None):
+        client = self.client_for(key)
+        self._local.last_client = client
+        client.set(key=key, value=value, timeout=timeout, compression=compression,
+                   compression_level=compression_level)
+
+    def add(self, key: str, value: Any, timeout: float = 0.0,
+            compression: Optional[Literal['lz4', 'zstd']] = None,
+            compression_level: Optional[int] = None) -> bool:
+        client = self.client_for(key)
+        self._local.last_client = client
+        return client.add(key=key, value=value, timeout=timeout, compression=compression,
+                          compression_level=compression_level)
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        return self.client_for(key).incr(key=key, delta=delta)
+
+    def incr_float(self, key: str, delta: float = 1.0) -> float:
+        return self.client_for(key).incr_float(key=key, delta=delta)
+
+    def get_dataframe(
+        self,
+        key: str,
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: ReturnType = 'pandas'
+    ) -> Optional[DataFrameResult]:
+        return self.client_for(key).get_dataframe(key=key, columns=columns, filter_operation=filter_operation,
+                                                  filters=filters, result_cache_timeout=result_cache_timeout,
+                                                  compression_type=compression_type, return_type=return_type)
+
+    def get_prepared(self, query: 'PreparedQuery', return_type: ReturnType = 'pandas') -> Optional[DataFrameResult]:
+        return self.client_for(query.key).get_prepared(query, return_type=return_type)
+
+    def get_dataframes(
+        self,
+        keys: Sequence[str],
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: Literal['pandas', 'arrow'] = 'pandas',
+        concat: bool = False,
+        max_workers: Optional[int] = None
+    ) -> Union[Dict[str, Union['pd.DataFrame', 'pa.Table']], 'pd.DataFrame', 'pa.Table', None]:
+        """``CupidClient.get_dataframes`` on every node at once, with up to ``max_workers`` keys per node."""
+        keys = list(dict.fromkeys(keys))
+        results: Dict[str, Any] = {}
+        for node_results in self._map(lambda client, node_keys: client.get_dataframes(
+                node_keys, columns=columns, filter_operation=filter_operation, filters=filters,
+                result_cache_timeout=result_cache_timeout, compression_type=compression_type,
+                return_type='arrow' if concat else return_type, max_workers=max_workers),
+                self._group(keys)).values():
+            results.update(node_results)
+        if concat:
+            return concat_tables([results[key] for key in keys if key in results], return_type)
+        return {key: results[key] for key in keys if key in results}
+
+    def iter_dataframe(
+        self,
+        key: str,
+        columns: List[str] = [],
+        filter_operation: Literal['AND', 'OR'] = 'AND',
+        filters: Filters = [],
+        result_cache_timeout: float = 0.0,
+        compression_type: Literal['', 'lz4', 'zstd'] = '',
+        return_type: Literal['pandas', 'arrow'] = 'pandas'
+    ) -> Iterator[Union['pd.DataFrame', 'pa.RecordBatch']]:
+        return self.client_for(key).iter_dataframe(key=key, columns=columns, filter_operation=filter_operation,
+                                                   filters=filters, result_cache_timeout=result_cache_timeout,
+                                                   compression_type=compression_type, return_type=return_type)
+
+    def get(self, key: str, default: Optional[Any] = None, return_type: ReturnType = 'pandas') -> Optional[Any]:
+        return self.client_for(key).get(key=key, default=default, return_type=return_type)
+
+    def get_many(self, keys: List[str], chunk_size: int = 1000) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        for values in self._map(lambda client, node_keys: client.get_many(node_keys, chunk_size=chunk_size),
+                                self._group(keys)).values():
+            result.update(values)
+        return result
+
+    def set_many(self, mapping: Mapping[str, Any], timeout: float = 0.0, chunk_size: int = 1000,
+                 max_chunk_bytes: int = 64 * 1024 * 1024):
+        groups: Dict[str, Dict[str, Any]] = {}
+        for key, value in mapping.items():
+            groups.setdefault(self.ring.node_for(key), {})[key] = value
+        self._map(lambda client, node_mapping: client.set_many(node_mapping, timeout=timeout,
+                                                               chunk_size=chunk_size,
+                                                               max_chunk_bytes=max_chunk_bytes), groups)
+
+    def delete(self, key: str) -> bool:
+        return self.client_for(key).delete(key=key)
+
+    def delete_many(self, keys: List[str]) -> int:
+        return sum(self._map(lambda client, node_keys: client.delete_many(node_keys),
+                             self._group(keys)).values())
+
+    def touch(self, key: str, timeout: float) -> bool:
+        return self.client_for(key).touch(key=key, timeout=timeout)
+
+    def ttl(self, key: str) -> Optional[float]:
+        return self.client_for(key).ttl(key=key)
+
+    def has_key(self, key: str) -> bool:
+        return self.client_for(key).has_key(key=key)
+
+    def keys(self, pattern: Optional[str] = None) -> list:
+        result: list = []
+        for node_keys in self._map(lambda client, _: client.keys(pattern), self._all_nodes()).values():
+            result.extend(node_keys)
+        return result
+
+    def flush(self):
+        self._map(lambda client, _: client.flush(), self._all_nodes())
+
+    def pipeline(self) -> 'ShardedPipeline':
+        return ShardedPipeline(client=self)
+
+    def pool_stats(self) -> Dict[str, Dict[str, float]]:
+        """Pool stats by node, where an uneven ``in_use`` points to a hot shard."""
+        return _pool_stats(self.clients)
+
+    def last_upload_stats(self) -> Optional[Dict[str, Any]]:
+        client = getattr(self._local, 'last_client', None)
+        return client.last_upload_stats() if client is not None else None
+
+    def close(self):
+        with self.lock:
+            self._reset_executor()
+            clients = list(self.clients.values())
+        for client in clients:
+            client.close()
+
+
+class ShardedPipeline:
+    """``Pipeline`` over a ``ShardedCupidClient``.
+
+    Commands are queued on one pipeline per node, which are executed in
+    parallel, and the results are put back in the order the commands were
+    queued. Multi-key commands are split per node and their results merged.
+    """
+
+    def __init__(self, client: ShardedCupidClient):
+        self.client = client
+        self.pipelines: Dict[str, Pipeline] = {}
+        # Per command: the (node, position) of each of its parts and how to merge their results
+        self.slots: List[Tuple[List[Tuple[str, int]], Callable[[List[Any]], Any]]] = []
+
+    def __enter__(self) -> 'ShardedPipeline':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.slots:
+            self.execute()
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def _queue(self, parts: Mapping[str, Callable[[Pipeline], Any]],
+               merge: Callable[[List[Any]], Any] = lambda results: results[0]) -> 'ShardedPipeline':
+        positions = []
+        for node, queue in parts.items():
+            pipeline = self.pipelines.get(node)
+            if pipeline is None:
+                pipeline = self.pipelines[node] = self.client.clients[node].pipeline()
+            positions.append((node, len(pipeline)))
+            queue(pipeline)
+        self.slots.append((positions, merge))
+        return self
+
+    def _route(self, key: str, queue: Callable[[Pipeline], Any]) -> 'ShardedPipeline':
+        return self._queue({self.client.node_for(key): queue})
+
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        """Send the queued commands and return their results in order, as ``Pipeline.execute`` does."""
+        pipelines, slots = self.pipelines, self.slots
+        self.pipelines, self.slots = {}, []
+        node_results = self.client._map(lambda _, pipeline: pipeline.execute(raise_on_error=False), pipelines)
+
+        results: List[Any] = []
+        first_error: Optional[Exception] = None
+        for positions, merge in slots:
+            parts = [node_results[node][position] for node, position in positions]
+            error = next((part for part in parts if isinstance(part, Exception)), None)
+            results.append(error if error is not None else merge(parts))
+            if first_error is None:
+                first_error = error
+        if raise_on_error and first_error is not None:
+            raise first_error
+        return results
+
+    def set(self, key: str, value: Any, timeout: float = 0.0) -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.set(key=key, value=value, timeout=timeout))
+
+    def add(self, key: str, value: Any, timeout: float = 0.0) -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.add(key=key, value=value, timeout=timeout))
+
+    def incr(self, key: str, delta: int = 1) -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.incr(key=key, delta=delta))
+
+    def incr_float(self, key: str, delta: float = 1.0) -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.incr_float(key=key, delta=delta))
+
+    def get_dataframe(self, key: str, **kwargs) -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.get_dataframe(key=key, **kwargs))
+
+    def get_prepared(self, query: 'PreparedQuery', return_type: ReturnType = 'pandas') -> 'ShardedPipeline':
+        return self._route(query.key, lambda pipe: pipe.get_prepared(query, return_type=return_type))
+
+    def get(self, key: str, default: Optional[Any] = None, return_type: ReturnType = 'pandas') -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.get(key=key, default=default, return_type=return_type))
+
+    def delete(self, key: str) -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.delete(key=key))
+
+    def delete_many(self, keys: List[str]) -> 'ShardedPipeline':
+        return self._queue({node: partial(Pipeline.delete_many, keys=node_keys)
+                            for node, node_keys in self.client._group(keys).items()},
+                           merge=sum)
+
+    def touch(self, key: str, timeout: float) -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.touch(key=key, timeout=timeout))
+
+    def ttl(self, key: str) -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.ttl(key=key))
+
+    def has_key(self, key: str) -> 'ShardedPipeline':
+        return self._route(key, lambda pipe: pipe.has_key(key=key))
+
+    def keys(self, pattern: Optional[str] = None) -> 'ShardedPipeline':
+        return self._queue({node: lambda pipe: pipe.keys(pattern) for node in self.client.clients},
+                           merge=lambda results: [key for keys in results for key in keys])
+
+    def flush(self) -> 'ShardedPipeline':
+        return self._queue({node: lambda pipe: pipe.flush() for node in self.client.clients},
+                           merge=lambda results: results[0])
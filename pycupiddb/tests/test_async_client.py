@@ -0,0 +1,77 @@
+import os
+import asyncio
+
+from pycupiddb import AsyncCupidClient, RowFilter
+from pycupiddb.tests.utils import create_df
+
+
+class TestAsyncClient:
+
+    @classmethod
+    def setup_class(cls):
+        cls.cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cls.cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.test_df = create_df()
+
+    def run(self, test):
+        async def runner():
+            async with AsyncCupidClient(host=self.cupiddb_host, port=self.cupiddb_port,
+                                        max_connections=4) as client:
+                await test(client)
+        asyncio.run(runner())
+
+    def test_set_get_delete(self):
+        async def test(client):
+            df_key = 'test_async_df_key'
+            data_key = 'test_async_data_key'
+            await client.delete_many([df_key, data_key])
+            assert await client.get_dataframe(key=df_key) is None
+
+            await client.set(key=df_key, value=self.test_df)
+            df = await client.get_dataframe(key=df_key)
+            assert self.test_df.equals(df)
+
+            df = await client.get_dataframe(key=df_key, columns=['c0'], filters=[
+                RowFilter(column='c0', logic='gte', value=0.5, data_type='float'),
+            ])
+            python_filtered = self.test_df[self.test_df['c0'] >= 0.5][['c0']]
+            assert python_filtered.equals(df)
+
+            data = {'message': 'test'}
+            assert await client.add(key=data_key, value=data)
+            assert not await client.add(key=data_key, value=data)
+            assert await client.get(key=data_key) == data
+            assert await client.has_key(key=data_key)
+            assert set(await client.keys(pattern='test_async_*')) == {df_key, data_key}
+
+            assert await client.delete_many([df_key, data_key]) == 2
+            assert await client.get(key=data_key, default='default') == 'default'
+        self.run(test)
+
+    def test_incr_touch_ttl(self):
+        async def test(client):
+            key = 'test_async_number'
+            await client.delete(key=key)
+            assert await client.incr(key=key) == 1
+            assert await client.incr(key=key, delta=2) == 3
+            assert await client.ttl(key=key) == 0.0
+            assert await client.touch(key=key, timeout=10.0)
+            ttl_seconds = await client.ttl(key=key)
+            assert ttl_seconds <= 10.0 and ttl_seconds > 9.0
+            await client.delete(key=key)
+            assert await client.ttl(key=key) is None
+            assert await client.incr_float(key=key, delta=1.5) == 1.5
+            await client.delete(key=key)
+        self.run(test)
+
+    def test_concurrent_requests(self):
+        async def test(client):
+            key = 'test_async_concurrent'
+            await client.delete(key=key)
+            await asyncio.gather(*[client.incr(key=key) for _ in range(200)])
+            assert await client.get(key=key) == 200
+            stats = client.pool_stats()
+            assert 1 <= stats['size'] <= 4
+            assert stats['in_use'] == 0
+            await client.delete(key=key)
+        self.run(test)
@@ -1,5 +1,7 @@
 import os
 import time
+import pandas as pd
+import pyarrow as pa
 
 from pycupiddb import CupidClient
 from pycupiddb.tests.utils import create_df
@@ -55,6 +57,86 @@ class TestClient:
         get_data = self.client.get(key=data_key, default=dict())
         assert get_data == dict()
 
+    def test_return_type(self):
+        key = 'test_return_type_key'
+        self.client.set(key=key, value=self.test_df)
+
+        table = self.client.get_dataframe(key=key, return_type='arrow')
+        assert isinstance(table, pa.Table)
+        assert self.test_df.equals(table.to_pandas())
+
+        record_batches = self.client.get_dataframe(key=key, return_type='record_batches')
+        assert isinstance(record_batches, list)
+        assert all(isinstance(rb, pa.RecordBatch) for rb in record_batches)
+        assert pa.Table.from_batches(record_batches).equals(table)
+
+        table = self.client.get(key=key, return_type='arrow')
+        assert isinstance(table, pa.Table)
+        assert self.test_df.equals(table.to_pandas())
+
+        assert self.client.get_dataframe(key='test_return_type_missing', return_type='arrow') is None
+        self.client.delete(key=key)
+
+    def test_iter_dataframe(self):
+        key = 'test_iter_dataframe_key'
+        self.client.set(key=key, value=self.test_df)
+
+        dfs = list(self.client.iter_dataframe(key=key, compression_type='lz4'))
+        assert self.test_df.equals(pd.concat(dfs))
+
+        record_batches = list(self.client.iter_dataframe(key=key, columns=['c0'], return_type='arrow'))
+        assert all(isinstance(rb, pa.RecordBatch) for rb in record_batches)
+        assert 'c0' in record_batches[0].column_names
+
+        # Stopping early drains the response so the connection stays usable
+        iterator = self.client.iter_dataframe(key=key)
+        next(iterator)
+        iterator.close()
+        assert self.test_df.equals(self.client.get_dataframe(key=key))
+
+        assert list(self.client.iter_dataframe(key='test_iter_dataframe_missing')) == []
+        self.client.delete(key=key)
+
+    def test_streamed_upload(self):
+        key = 'test_streamed_upload_key'
+        client = CupidClient(host=self.client.host, port=self.client.port, upload_chunk_bytes=1024)
+        test_df = create_df(rows=500)
+        client.set(key=key, value=test_df)
+        record_batches = client.get_dataframe(key=key, return_type='record_batches')
+        assert len(record_batches) > 1
+        assert test_df.equals(client.get_dataframe(key=key))
+        assert not client.add(key=key, value=test_df)
+
+        range_df = test_df.reset_index(drop=True)
+        client.set(key=key, value=range_df)
+        assert range_df.equals(client.get_dataframe(key=key))
+        client.delete(key=key)
+        client.close()
+
+    def test_compressed_upload(self):
+        key = 'test_compressed_upload_key'
+        test_df = pd.DataFrame({'a': [1.0] * 10000, 'b': list(range(10000))})
+
+        self.client.set(key=key, value=test_df)
+        stats = self.client.last_upload_stats()
+        assert stats['compression'] is None
+        uncompressed_bytes = stats['payload_bytes']
+
+        self.client.set(key=key, value=test_df, compression='zstd', compression_level=3)
+        assert test_df.equals(self.client.get_dataframe(key=key))
+        stats = self.client.last_upload_stats()
+        assert stats['compression'] == 'zstd'
+        assert stats['payload_bytes'] < uncompressed_bytes
+        assert stats['raw_bytes'] >= test_df.memory_usage(index=False).sum()
+
+        client = CupidClient(host=self.client.host, port=self.client.port, upload_chunk_bytes=1024)
+        assert client.last_upload_stats() is None
+        assert client.add(key=key + '_lz4', value=test_df, compression='lz4')
+        assert test_df.equals(client.get_dataframe(key=key + '_lz4'))
+        assert client.last_upload_stats()['record_batches'] > 1
+        client.delete_many([key, key + '_lz4'])
+        client.close()
+
     def test_haskey_add_get(self):
         key = 'test_add_get_key'
         self.client.delete(key=key)
@@ -180,6 +262,29 @@ class TestClient:
             val = self.client.get(key=f'{key_prefix}_{i}')
             assert val is None
 
+    def test_get_many_set_many(self):
+        key_prefix = 'bulk_keys'
+        mapping = {
+            f'{key_prefix}_int': 1,
+            f'{key_prefix}_float': 1.5,
+            f'{key_prefix}_data': {'message': 'test'},
+            f'{key_prefix}_none': None,
+        }
+        mapping.update({f'{key_prefix}_{i}': i for i in range(25)})
+        self.client.delete_many(list(mapping))
+
+        self.client.set_many(mapping, timeout=60, chunk_size=10)
+        result = self.client.get_many(list(mapping) + [f'{key_prefix}_missing'], chunk_size=10)
+        assert result == mapping
+        assert isinstance(result[f'{key_prefix}_float'], float)
+
+        self.client.set_many({f'{key_prefix}_df': self.test_df}, max_chunk_bytes=1)
+        result = self.client.get_many([f'{key_prefix}_df'])
+        assert self.test_df.equals(result[f'{key_prefix}_df'])
+
+        assert self.client.get_many([]) == {}
+        self.client.delete_many(list(mapping) + [f'{key_prefix}_df'])
+
     def test_flush(self):
         for i in range(5):
             self.client.set(key=f'flush_{i}', value=i)
@@ -0,0 +1,96 @@
+import os
+import pickle
+
+import numpy as np
+
+from pycupiddb import CupidClient, Codec, CodecRegistry, PickleBufferCodec, JsonCodec, ArrowTensorCodec
+from pycupiddb.exceptions import DeserializationError
+
+
+class TestCodec:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.codecs = CodecRegistry()
+        cls.codecs.register(ArrowTensorCodec(), types=[np.ndarray])
+        cls.codecs.register(JsonCodec(), types=[dict])
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port, codecs=cls.codecs)
+        cls.plain_client = CupidClient(host=cupiddb_host, port=cupiddb_port)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+        cls.plain_client.close()
+
+    def test_registered_types(self):
+        key = 'test_codec_key'
+        array = np.arange(12, dtype='int32').reshape(3, 4)
+        self.client.set(key=key, value=array)
+        result = self.client.get(key=key)
+        assert result.dtype == array.dtype and (result == array).all()
+        # Readers decode tagged values without registering anything
+        assert (self.plain_client.get(key=key) == array).all()
+
+        # Object arrays are declined by the codec and pickled instead
+        self.client.set(key=key, value=np.array(['a', None], dtype=object))
+        assert list(self.plain_client.get(key=key)) == ['a', None]
+
+        # Arrow tensors have no bool type, so bool arrays are pickled too
+        self.client.set(key=key, value=np.array([True, False]))
+        result = self.client.get(key=key)
+        assert result.dtype == bool and result.tolist() == [True, False]
+
+        self.client.set(key=key, value={'a': [1, 2.5, 'x'], 'b': None})
+        assert self.plain_client.get(key=key) == {'a': [1, 2.5, 'x'], 'b': None}
+
+        # Unregistered types and values written by older clients are plain pickle
+        self.client.set(key=key, value=('tuple', 1))
+        assert self.client.get(key=key) == ('tuple', 1)
+        self.plain_client.set(key=key, value={'old': True})
+        assert self.client.get(key=key) == {'old': True}
+        self.client.delete(key=key)
+
+    def test_pickle_buffers(self):
+        key = 'test_codec_pickle5'
+        codecs = CodecRegistry().register(PickleBufferCodec(), types=[object])
+        client = CupidClient(host=self.client.host, port=self.client.port, codecs=codecs)
+        value = {'array': np.random.random(1000), 'label': 'x'}
+        client.set(key=key, value=value)
+        result = self.plain_client.get(key=key)
+        assert result['label'] == 'x'
+        assert (result['array'] == value['array']).all()
+
+        # The array data is sent from the array itself instead of a joined copy
+        parts = PickleBufferCodec().encode_buffers(value)
+        assert np.shares_memory(np.frombuffer(parts[-1], dtype=value['array'].dtype), value['array'])
+        client.pipeline().set(key=key, value=value).execute()
+        assert (self.plain_client.get(key=key)['array'] == value['array']).all()
+        client.delete(key=key)
+        client.close()
+
+    def test_unknown_codec(self):
+        key = 'test_codec_unknown'
+        self.plain_client.set(key=key, value=b'')
+        payload = b'\x00CPC\x07unknown' + pickle.dumps(1)
+        self.plain_client._set_data(data_type='B', key=key, byte_data=payload, timeout=0.0, add_only=False)
+        try:
+            self.plain_client.get(key=key)
+            assert False
+        except DeserializationError:
+            pass
+        self.plain_client.delete(key=key)
+
+    def test_incomplete_codec(self):
+        class EncodeOnlyCodec(Codec):
+            name = 'encode_only'
+
+            def encode(self, value):
+                return pickle.dumps(value)
+
+        try:
+            EncodeOnlyCodec()
+            assert False
+        except TypeError:
+            pass
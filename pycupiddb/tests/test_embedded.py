@@ -0,0 +1,84 @@
+import time
+from datetime import date
+
+import pandas as pd
+
+from pycupiddb import CupidClient, RowFilter
+from pycupiddb.embedded import EmbeddedStore
+from pycupiddb.tests.utils import create_df
+
+
+class TestEmbedded:
+
+    @classmethod
+    def setup_class(cls):
+        cls.store = EmbeddedStore()
+        cls.client = CupidClient.embedded(store=cls.store)
+        cls.test_df = create_df(rows=100)
+        cls.test_df.index.name = 'date'
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def test_values(self):
+        self.client.set(key='test_embedded_value', value={'message': 'test'})
+        assert self.client.get(key='test_embedded_value') == {'message': 'test'}
+        assert self.client.add(key='test_embedded_value', value=1) is False
+        assert self.client.incr(key='test_embedded_count', delta=5) == 5
+        assert self.client.incr_float(key='test_embedded_float', delta=0.5) == 0.5
+        assert self.client.get(key='test_embedded_missing', default='default') == 'default'
+        assert self.client.delete_many(['test_embedded_value', 'test_embedded_count',
+                                        'test_embedded_float']) == 3
+
+        # Clients built on the same store share data
+        other_client = CupidClient.embedded(store=self.store)
+        other_client.set(key='test_embedded_shared', value=1.5)
+        assert self.client.get(key='test_embedded_shared') == 1.5
+        self.client.delete(key='test_embedded_shared')
+
+    def test_dataframes(self):
+        key = 'test_embedded_df'
+        self.client.set(key=key, value=self.test_df)
+        assert self.test_df.equals(self.client.get(key=key))
+
+        filters = [
+            RowFilter(column='c0', logic='gte', value=0.5, data_type='float'),
+            RowFilter(column='date', logic='lt', value=date(2000, 2, 1), data_type='date'),
+        ]
+        df = self.client.get_dataframe(key=key, columns=['c0'], filters=filters)
+        expected = self.test_df[(self.test_df['c0'] >= 0.5) &
+                                (self.test_df.index < date(2000, 2, 1))][['c0']]
+        assert expected.equals(df)
+
+        # The stored table is handed back without being copied
+        table = self.client.get(key=key, return_type='arrow')
+        assert table is self.client.get_dataframe(key=key, return_type='arrow')
+
+        batches = list(self.client.iter_dataframe(key=key))
+        assert self.test_df.equals(pd.concat(batches))
+        self.client.delete(key=key)
+
+    def test_streamed_upload(self):
+        key = 'test_embedded_streamed'
+        client = CupidClient.embedded(upload_chunk_bytes=1024)
+        df = create_df(rows=1000)
+        client.set(key=key, value=df, compression='zstd')
+        assert client.last_upload_stats()['record_batches'] > 1
+        assert df.equals(client.get_dataframe(key=key))
+
+    def test_expiry_and_keys(self):
+        self.client.set(key='test_embedded_ttl', value=1, timeout=0.05)
+        assert 0 < self.client.ttl(key='test_embedded_ttl') <= 0.05
+        assert self.client.touch(key='test_embedded_ttl', timeout=0.1)
+        self.client.set(key='test_embedded_keep', value=1)
+        assert self.client.ttl(key='test_embedded_keep') == 0
+        assert sorted(self.client.keys('test_embedded_{ttl,keep}')) == ['test_embedded_keep',
+                                                                         'test_embedded_ttl']
+        time.sleep(0.15)
+        assert not self.client.has_key(key='test_embedded_ttl')
+        assert self.client.keys('test_embedded_*') == ['test_embedded_keep']
+
+        with self.client.pipeline() as pipe:
+            pipe.get(key='test_embedded_keep').delete(key='test_embedded_keep')
+        assert self.client.get(key='test_embedded_keep') is None
@@ -3,7 +3,9 @@ import random
 import string
 from datetime import date, datetime, timezone
 
-from pycupiddb import CupidClient, RowFilter
+from pycupiddb import CupidClient, RowFilter, col
+from pycupiddb.exceptions import InvalidQuery
+from pycupiddb.filters import Expression, FilterPlan
 from pycupiddb.tests.utils import create_df
 
 
@@ -142,3 +144,41 @@ class TestClient:
         assert filtered_df.equals(python_filtered)
 
         self.client.delete(key=key)
+
+    def test_expression(self):
+        random_string = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+        key = 'test filters' + random_string
+        self.client.set(key=key, value=self.test_df_1, timeout=60)
+        df = self.test_df_1
+
+        # Sent to the server as a whole
+        filtered_df = self.client.get_dataframe(key=key, filters=col('c0').between(0.25, 0.75))
+        assert filtered_df.equals(df[(df['c0'] >= 0.25) & (df['c0'] <= 0.75)])
+        filtered_df = self.client.get_dataframe(key=key, filters=col('c3').isin([1, 2]) | (col('c0') > 0.9))
+        assert filtered_df.equals(df[df['c3'].isin([1, 2]) | (df['c0'] > 0.9)])
+
+        # The OR group is evaluated by the client, which fetches c2 and c3 and drops them again
+        expression = (col('c0') > 0.5) & ((col('c3') == 1) | (col('c2') < 0.2))
+        plan = FilterPlan(expression, columns=['c4'])
+        assert len(plan.filters) == 1 and plan.extra_columns == ['c2', 'c3']
+        filtered_df = self.client.get_dataframe(key=key, filters=expression, columns=['c4'])
+        assert filtered_df.equals(df[(df['c0'] > 0.5) & ((df['c3'] == 1) | (df['c2'] < 0.2))][['c4']])
+
+        expression = ~col('c3').isin([1, 2]) & (col('date') < date(2000, 3, 1))
+        filtered_df = self.client.get_dataframe(key=key, filters=expression, return_type='arrow')
+        assert filtered_df.to_pandas().equals(df[~df['c3'].isin([1, 2]) & (df.index < date(2000, 3, 1))])
+        batches = list(self.client.iter_dataframe(key=key, filters=expression, columns=['c0']))
+        assert sum(len(batch) for batch in batches) == len(filtered_df)
+        assert list(batches[0].columns) == ['c0']
+
+        try:
+            self.client.get_dataframe(key=key, filters=~col('notexist').isin([1, 2]))
+            assert False
+        except InvalidQuery:
+            pass
+        try:
+            Expression()
+            assert False
+        except TypeError:
+            pass
+        self.client.delete(key=key)
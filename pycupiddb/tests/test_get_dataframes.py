@@ -0,0 +1,56 @@
+import os
+import random
+import string
+import pandas as pd
+import pyarrow as pa
+from pycupiddb import CupidClient, col
+from pycupiddb.exceptions import InvalidQuery
+
+
+class TestGetDataframes:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port, max_connections=4)
+        prefix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=16))
+        cls.frames = {
+            f'{prefix}_{i}': pd.DataFrame({'a': range(i * 10, i * 10 + 10), 'b': [float(i)] * 10})
+            for i in range(20)
+        }
+        cls.client.set_many(cls.frames, timeout=60)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def test_dict(self):
+        keys = list(self.frames)
+        results = self.client.get_dataframes(list(reversed(keys)) + ['missing_key'])
+        assert list(results) == list(reversed(keys))
+        assert all(self.frames[key].equals(df) for key, df in results.items())
+
+        results = self.client.get_dataframes(keys, columns=['a'], filters=col('a') >= 195, return_type='arrow',
+                                             max_workers=1)
+        assert all(isinstance(table, pa.Table) for table in results.values())
+        assert sum(table.num_rows for table in results.values()) == 5
+
+    def test_concat(self):
+        keys = list(self.frames)
+        expected = pd.concat(self.frames.values(), ignore_index=True)
+        result_df = self.client.get_dataframes(keys, concat=True)
+        assert expected.equals(result_df.reset_index(drop=True))
+
+        table = self.client.get_dataframes(keys, filters=col('b') == 3.0, concat=True, return_type='arrow')
+        assert table.column('a').to_pylist() == list(range(30, 40))
+        assert self.client.get_dataframes(['missing_key'], concat=True) is None
+
+    def test_error(self):
+        try:
+            self.client.get_dataframes(list(self.frames), filters=~col('notexist').isin([1, 2]))
+            assert False
+        except InvalidQuery:
+            pass
+        # The pool is still usable afterwards
+        assert len(self.client.get_dataframes(list(self.frames)[:3])) == 3
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+
+HEAVY_MODULES = ['pandas', 'pyarrow', 'numpy', 'asyncio']
+
+SCRIPT = '''
+import sys
+from pycupiddb import CupidClient
+
+client = CupidClient(host=sys.argv[1], port=int(sys.argv[2]))
+client.set(key='test_imports_key', value={'message': 'test'})
+assert client.get(key='test_imports_key') == {'message': 'test'}
+client.set(key='test_imports_key', value=1)
+assert client.incr(key='test_imports_key') == 2
+client.delete(key='test_imports_key')
+client.close()
+print(','.join(name for name in sys.argv[3:] if name in sys.modules))
+'''
+
+
+class TestImports:
+
+    @classmethod
+    def setup_class(cls):
+        cls.cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cls.cupiddb_port = os.getenv('CUPIDDB_TEST_PORT', '5995')
+
+    def test_import_is_lazy(self):
+        result = subprocess.run([sys.executable, '-c', 'import sys, pycupiddb; '
+                                 'print(",".join(name for name in sys.argv[1:] if name in sys.modules))',
+                                 *HEAVY_MODULES], capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == ''
+
+    def test_scalar_commands_stay_lazy(self):
+        result = subprocess.run([sys.executable, '-c', SCRIPT, self.cupiddb_host, self.cupiddb_port,
+                                 *HEAVY_MODULES], capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == ''
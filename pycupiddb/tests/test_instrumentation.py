@@ -0,0 +1,87 @@
+import os
+
+from pycupiddb import CupidClient, Instrumentation, OpenTelemetryHook
+from pycupiddb.tests.utils import create_df
+
+
+class FakeInstrument:
+
+    def __init__(self):
+        self.points = []
+
+    def record(self, value, attributes):
+        self.points.append((value, attributes))
+
+    def add(self, value, attributes):
+        self.points.append((value, attributes))
+
+
+class FakeMeter:
+
+    def __init__(self):
+        self.instruments = {}
+
+    def create_histogram(self, name, unit='', description=''):
+        return self.instruments.setdefault(name, FakeInstrument())
+
+    def create_counter(self, name, unit='', description=''):
+        return self.instruments.setdefault(name, FakeInstrument())
+
+
+class TestInstrumentation:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.instrumentation = Instrumentation()
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port, instrumentation=cls.instrumentation)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def test_metrics(self):
+        self.instrumentation.reset()
+        key = 'test_instrumentation_key'
+        self.client.set(key=key, value=create_df())
+        self.client.get_dataframe(key=key)
+        list(self.client.iter_dataframe(key=key))
+        self.client.get(key=key + '_missing')
+        with self.client.pipeline() as pipe:
+            pipe.ttl(key=key).delete(key=key)
+
+        commands = self.instrumentation.collect()['commands']
+        assert commands['SD']['count'] == 1
+        assert commands['SD']['request_bytes'] > 0
+        assert commands['GA']['count'] == 2
+        assert commands['GA']['response_bytes'] > 0
+        assert commands['GD']['error_codes'] == {2: 1}
+        assert commands['TL']['count'] == 1 and commands['DL']['count'] == 1
+        assert self.instrumentation.collect()['pool_wait']['count'] == 5
+
+        text = self.instrumentation.prometheus_text()
+        assert 'cupiddb_client_commands_total{command="GA"} 2' in text
+        assert 'cupiddb_client_errors_total{command="GD",code="2"} 1' in text
+        assert 'cupiddb_client_command_duration_seconds_bucket{command="SD",le="+Inf"} 1' in text
+        assert 'cupiddb_client_pool_wait_seconds_count 5' in text
+
+    def test_hooks(self):
+        before = []
+        after = []
+        instrumentation = Instrumentation()
+        instrumentation.add_hook(before=lambda message_type, size: before.append(message_type),
+                                 after=after.append, message_types=['II'])
+        meter = FakeMeter()
+        instrumentation.add_hook(after=OpenTelemetryHook(meter))
+        client = CupidClient(host=self.client.host, port=self.client.port, instrumentation=instrumentation)
+        client.incr(key='test_instrumentation_count')
+        client.has_key(key='test_instrumentation_count')
+        client.delete(key='test_instrumentation_count')
+        client.close()
+
+        assert before == ['II']
+        assert [event.message_type for event in after] == ['II']
+        assert after[0].response_type == 'IN' and after[0].duration > 0
+        durations = meter.instruments['cupiddb.client.command.duration'].points
+        assert [attributes['command'] for _, attributes in durations] == ['II', 'HK', 'DL']
@@ -0,0 +1,124 @@
+import os
+import time
+
+from pycupiddb import CupidClient, NearCache
+from pycupiddb.tests.utils import create_df
+
+
+class TestNearCache:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.near_cache = NearCache(max_bytes=1024 * 1024, ttl=60.0)
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port, near_cache=cls.near_cache)
+        cls.other_client = CupidClient(host=cupiddb_host, port=cupiddb_port)
+        cls.test_df = create_df()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+        cls.other_client.close()
+
+    def test_hits_and_invalidation(self):
+        key = 'test_near_cache_key'
+        self.client.set(key=key, value={'message': 'test'})
+        hits = self.near_cache.stats()['hits']
+
+        assert self.client.get(key=key) == {'message': 'test'}
+        assert self.client.get(key=key) == {'message': 'test'}
+        assert self.near_cache.stats()['hits'] == hits + 1
+
+        # Writes from another client are not seen until the entry expires
+        self.other_client.set(key=key, value='other')
+        assert self.client.get(key=key) == {'message': 'test'}
+
+        # Writes from this client invalidate the entry
+        self.client.set(key=key, value='mine')
+        assert self.client.get(key=key) == 'mine'
+        self.client.incr(key=key + '_count')
+        self.client.touch(key=key, timeout=60)
+        self.client.delete(key=key)
+        assert self.client.get(key=key) is None
+
+        with self.client.pipeline() as pipe:
+            pipe.set(key=key, value=1)
+        assert self.client.get(key=key) == 1
+        with self.client.pipeline() as pipe:
+            pipe.incr(key=key)
+        assert self.client.get(key=key) == 2
+        self.client.delete_many([key, key + '_count'])
+        assert self.client.get(key=key) is None
+
+    def test_dataframe_queries(self):
+        key = 'test_near_cache_df'
+        self.client.set(key=key, value=self.test_df)
+        df = self.client.get_dataframe(key=key, columns=['c0'])
+        hits = self.near_cache.stats()['hits']
+        assert df.equals(self.client.get_dataframe(key=key, columns=['c0']))
+        assert self.test_df.equals(self.client.get_dataframe(key=key))
+        assert self.near_cache.stats()['hits'] == hits + 1
+
+        self.client.set(key=key, value=self.test_df[['c1']])
+        assert self.test_df[['c1']].equals(self.client.get_dataframe(key=key))
+        self.client.flush()
+        assert self.near_cache.stats()['entries'] == 0
+
+    def test_write_during_read(self):
+        key = 'test_near_cache_race'
+        near_cache = NearCache(max_bytes=1024 * 1024, ttl=60.0)
+        client = CupidClient(host=self.client.host, port=self.client.port, near_cache=near_cache)
+        client.set(key=key, value='old')
+
+        # The write lands after the read was answered but before its response is cached
+        send_commands = client.connection.send_commands
+
+        def send_commands_then_write(commands):
+            responses = send_commands(commands)
+            client.connection.send_commands = send_commands
+            client.set(key=key, value='new')
+            return responses
+
+        client.connection.send_commands = send_commands_then_write
+        assert client.get(key=key) == 'old'
+        assert client.get(key=key) == 'new'
+        assert client.get(key=key) == 'new'
+        assert near_cache.stats()['hits'] == 1
+        client.delete(key=key)
+        client.close()
+
+    def test_server_ttl_cap(self):
+        key = 'test_near_cache_ttl'
+        self.client.set(key=key, value=1, timeout=0.3)
+        assert self.client.get(key=key) == 1
+        time.sleep(0.5)
+        assert self.client.get(key=key) is None
+
+    def test_lru_eviction(self):
+        near_cache = NearCache(max_bytes=3 * (NearCache.entry_overhead + 10), ttl=60.0)
+        for i in range(4):
+            near_cache.put(key=f'k{i}', cache_key=i, response_type='BY', payload=b'0123456789',
+                           server_ttl=0)
+            near_cache.get(0)
+        assert near_cache.get(0) is not None
+        assert near_cache.get(1) is None
+        assert near_cache.get(3) is not None
+        stats = near_cache.stats()
+        assert stats['entries'] == 3
+        assert stats['evictions'] == 1
+
+        near_cache.put(key='big', cache_key='big', response_type='BY', payload=b'0' * 1000,
+                       server_ttl=0)
+        assert near_cache.get('big') is None
+        near_cache.invalidate('k0')
+        assert near_cache.get(0) is None
+
+        generation = near_cache.generation()
+        near_cache.invalidate('k1')
+        near_cache.put(key='k1', cache_key=1, response_type='BY', payload=b'stale', server_ttl=0,
+                       generation=generation)
+        near_cache.put(key='k2', cache_key=2, response_type='BY', payload=b'fresh', server_ttl=0,
+                       generation=generation)
+        assert near_cache.get(1) is None
+        assert near_cache.get(2) == ('BY', b'fresh')
@@ -0,0 +1,83 @@
+import os
+import random
+import string
+from datetime import datetime
+import pandas as pd
+import numpy as np
+from pycupiddb import CupidClient, RowFilter, col
+from pycupiddb.exceptions import InvalidDataType
+from pycupiddb.partitioned import PartitionManifest
+
+
+class TestPartitioned:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port, max_connections=4)
+        cls.df = pd.DataFrame({
+            'a': np.arange(1000),
+            'b': np.arange(1000) * 0.5,
+            's': [str(i % 7) for i in range(1000)],
+        }, index=pd.date_range('2020-01-01', periods=1000, freq='D', name='date'))
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def _key(self):
+        return ''.join(random.choices(string.ascii_uppercase + string.digits, k=16))
+
+    def test_monthly(self):
+        key = self._key()
+        assert self.client.set_partitioned(key, self.df, partition_by='date', freq='M', timeout=60) == 33
+        manifest = PartitionManifest.from_value(key, self.client.get(key))
+
+        filters = [RowFilter(column='date', logic='gte', value=datetime(2021, 3, 1), data_type='datetime'),
+                   RowFilter(column='date', logic='lt', value=datetime(2021, 4, 1), data_type='datetime')]
+        assert len(manifest.matching('AND', filters)) == 1
+        result_df = self.client.get_partitioned(key, filters=filters)
+        assert self.df.loc['2021-03-01':'2021-03-31'].equals(result_df)
+
+        assert self.df.equals(self.client.get_partitioned(key))
+        result_df = self.client.get_partitioned(key, filters=(col('a') < 10) | (col('a') > 990))
+        assert self.df[(self.df['a'] < 10) | (self.df['a'] > 990)].equals(result_df)
+
+    def test_rows(self):
+        key = self._key()
+        shuffled = self.df.sample(frac=1, random_state=1)
+        assert self.client.set_partitioned(key, shuffled, partition_by='a', partition_rows=300, timeout=60) == 4
+        manifest = PartitionManifest.from_value(key, self.client.get(key))
+        filters = [RowFilter(column='a', logic='eq', value=650, data_type='int')]
+        assert len(manifest.matching('AND', filters)) == 1
+        table = self.client.get_partitioned(key, columns=['b'], filters=col('a').between(10, 12),
+                                            return_type='arrow')
+        assert table.column('b').to_pylist() == [5.0, 5.5, 6.0]
+
+        # Nothing can match, but the result still has the columns
+        result_df = self.client.get_partitioned(key, filters=col('a') > 5000)
+        assert len(result_df) == 0
+        assert list(result_df.columns) == ['a', 'b', 's']
+
+    def test_rewrite_and_delete(self):
+        key = self._key()
+        self.client.set_partitioned(key, self.df, partition_by='date', freq='Y', timeout=60)
+        old_keys = PartitionManifest.from_value(key, self.client.get(key)).keys
+        self.client.set_partitioned(key, self.df.iloc[:10], partition_by='date', freq='Y', timeout=60)
+        assert not any(self.client.has_key(old_key) for old_key in old_keys)
+        assert self.df.iloc[:10].equals(self.client.get_partitioned(key))
+
+        assert self.client.delete_partitioned(key)
+        assert self.client.keys(f'{key}*') == []
+        assert self.client.get_partitioned(key) is None
+        assert not self.client.delete_partitioned(key)
+
+    def test_not_partitioned(self):
+        key = self._key()
+        self.client.set(key, 1, timeout=60)
+        try:
+            self.client.get_partitioned(key)
+            assert False
+        except InvalidDataType:
+            pass
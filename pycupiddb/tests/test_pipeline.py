@@ -0,0 +1,70 @@
+import os
+
+from pycupiddb import CupidClient
+from pycupiddb.tests.utils import create_df
+from pycupiddb.exceptions import InvalidArrowData, InvalidDataType
+
+
+class TestPipeline:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port)
+        cls.test_df = create_df()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def test_pipeline(self):
+        keys = ['test_pipeline_int', 'test_pipeline_df', 'test_pipeline_data']
+        self.client.delete_many(keys)
+
+        with self.client.pipeline() as pipe:
+            pipe.set(key=keys[0], value=1)
+            pipe.set(key=keys[1], value=self.test_df, timeout=60)
+            pipe.add(key=keys[2], value={'message': 'test'})
+            pipe.incr(key=keys[0], delta=2)
+            assert len(pipe) == 4
+            results = pipe.execute()
+            assert len(pipe) == 0
+        assert results == [True, True, True, 3]
+
+        with self.client.pipeline() as pipe:
+            pipe.get(key=keys[0]).get(key=keys[2]).get(key='test_pipeline_missing', default='d')
+            pipe.get_dataframe(key=keys[1]).has_key(key=keys[1]).ttl(key=keys[0])
+            value, data, missing, df, has_key, ttl = pipe.execute()
+        assert value == 3
+        assert data == {'message': 'test'}
+        assert missing == 'd'
+        assert self.test_df.equals(df)
+        assert has_key
+        assert ttl == 0.0
+
+        with self.client.pipeline() as pipe:
+            pipe.delete_many(keys)
+        assert self.client.keys(pattern='test_pipeline_*') == []
+
+    def test_pipeline_errors(self):
+        key = 'test_pipeline_errors'
+        self.client.set(key=key, value={'message': 'test'})
+
+        pipe = self.client.pipeline()
+        pipe.get_dataframe(key=key).incr(key=key).get(key=key)
+        df_error, incr_error, data = pipe.execute(raise_on_error=False)
+        assert isinstance(df_error, InvalidArrowData)
+        assert isinstance(incr_error, InvalidDataType)
+        assert data == {'message': 'test'}
+
+        pipe.get_dataframe(key=key).get(key=key)
+        try:
+            pipe.execute()
+            assert False
+        except InvalidArrowData:
+            assert True
+
+        # The connection is still in sync after a failed pipeline
+        assert self.client.get(key=key) == {'message': 'test'}
+        self.client.delete(key=key)
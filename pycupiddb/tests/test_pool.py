@@ -0,0 +1,65 @@
+import os
+import threading
+
+from pycupiddb import CupidClient
+from pycupiddb.exceptions import PoolTimeoutError
+
+
+class TestPool:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port,
+                                 max_connections=4, checkout_timeout=5.0)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def test_concurrent_incr(self):
+        key = 'test_pool_incr'
+        self.client.delete(key=key)
+
+        def worker():
+            for _ in range(50):
+                self.client.incr(key=key)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert self.client.get(key=key) == 400
+        stats = self.client.pool_stats()
+        assert 1 <= stats['size'] <= 4
+        assert stats['in_use'] == 0
+        assert stats['checkouts'] >= 402
+        assert stats['wait_max'] >= stats['wait_p50'] >= 0.0
+        self.client.delete(key=key)
+
+    def test_checkout_timeout(self):
+        client = CupidClient(host=self.client.host, port=self.client.port,
+                             max_connections=1, checkout_timeout=0.1)
+        with client.connection.checkout():
+            try:
+                client.has_key(key='test_pool_timeout')
+                assert False
+            except PoolTimeoutError:
+                assert True
+        assert not client.has_key(key='test_pool_timeout')
+        assert client.pool_stats()['timeouts'] == 1
+        client.close()
+
+    def test_idle_reaping(self):
+        client = CupidClient(host=self.client.host, port=self.client.port,
+                             max_connections=2, idle_timeout=0.0)
+        with client.connection.checkout():
+            client.has_key(key='test_pool_reap')
+        assert client.pool_stats()['size'] == 2
+        client.has_key(key='test_pool_reap')
+        assert client.pool_stats()['size'] == 1
+        assert client.pool_stats()['reaped'] == 1
+        client.close()
@@ -0,0 +1,85 @@
+import os
+from datetime import date
+
+from pycupiddb import CupidClient, Placeholder, PreparedQuery, RowFilter, col
+from pycupiddb.tests.utils import create_df
+
+
+class TestPrepared:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port)
+        cls.test_df = create_df(rows=100)
+        cls.test_df.index.name = 'date'
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def test_canonical(self):
+        first = RowFilter(column='c0', logic='gte', value=0.25, data_type='float')
+        second = RowFilter(column='c3', logic='lte', value=5, data_type='int')
+        query = PreparedQuery(key='key', columns=['c2', 'c0'], filters=[first, second])
+        same = PreparedQuery(key='key', columns=['c0', 'c2', 'c0'], filters=[second, first, second])
+        assert query.payload == same.payload
+
+        query = PreparedQuery(key='key', filters=[Placeholder('since', column='date', logic='gte',
+                                                              data_type='date'), first])
+        try:
+            query.payload
+            assert False
+        except ValueError:
+            pass
+        try:
+            query.bind(until=date(2000, 1, 1))
+            assert False
+        except ValueError:
+            pass
+        bound = query.bind(since=date(2000, 1, 11))
+        expected = PreparedQuery(key='key', filters=[
+            first, RowFilter(column='date', logic='gte', value=date(2000, 1, 11), data_type='date')])
+        assert bound.payload == expected.payload
+        assert query.bind(since=date(2000, 1, 12)).payload != bound.payload
+
+    def test_get_prepared(self):
+        key = 'test_prepared_key'
+        self.client.set(key=key, value=self.test_df)
+        df = self.test_df
+        query = PreparedQuery(key=key, columns=['c0'], filters=[
+            Placeholder('since', column='date', logic='gte', data_type='date'),
+            RowFilter(column='c0', logic='gt', value=0.5, data_type='float'),
+        ])
+        result = self.client.get_prepared(query.bind(since=date(2000, 2, 1)))
+        assert result.equals(df[(df.index >= date(2000, 2, 1)) & (df['c0'] > 0.5)][['c0']])
+
+        # The canonical query sorts its columns, the result has them as given
+        query = PreparedQuery(key=key, columns=['c2', 'c0', 'c2'], filters=(col('c0') > 0.5) & ~col('c3').isin([1, 2]))
+        result = self.client.get_prepared(query)
+        assert result.equals(df[(df['c0'] > 0.5) & ~df['c3'].isin([1, 2])][['c2', 'c0']])
+        result = self.client.pipeline().get_prepared(PreparedQuery(key=key, columns=['c2', 'c0'])).execute()[0]
+        assert result.equals(df[['c2', 'c0']])
+
+        query = PreparedQuery(key=key, filters=(col('c0') > 0.5) & ~col('c3').isin([1, 2]))
+        with self.client.pipeline() as pipe:
+            pipe.get_prepared(query)
+        assert pipe.execute() == []
+        result = self.client.pipeline().get_prepared(query).execute()[0]
+        assert result.equals(df[(df['c0'] > 0.5) & ~df['c3'].isin([1, 2])])
+        self.client.delete(key=key)
+
+    def test_result_cache(self):
+        key = 'test_prepared_cache'
+        self.client.set(key=key, value=self.test_df)
+        filters = [RowFilter(column='c0', logic='gte', value=0.25, data_type='float'),
+                   RowFilter(column='c0', logic='lt', value=0.75, data_type='float')]
+        first = PreparedQuery(key=key, columns=['c0', 'c2'], filters=filters, result_cache_timeout=5)
+        cached = self.client.get_prepared(first)
+
+        # Overwriting the key leaves the cached result, which the reordered query still finds
+        self.client.set(key=key, value=create_df(rows=100))
+        second = PreparedQuery(key=key, columns=['c2', 'c0'], filters=filters[::-1], result_cache_timeout=5)
+        assert cached[['c2', 'c0']].equals(self.client.get_prepared(second))
+        self.client.delete(key=key)
@@ -0,0 +1,270 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+
+from pycupiddb import AsyncCupidClient, CupidClient
+from pycupiddb.async_connection import AsyncConnection
+from pycupiddb.connection import SyncConnection
+from pycupiddb.exceptions import ConnectionError, ReadTimeoutError
+
+
+class Proxy:
+    """Forwards connections to the server and can cut them, like a server restart."""
+
+    def __init__(self, host, port):
+        self.target = (host, port)
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        self.lock = threading.Lock()
+        self.sockets = []
+        self.drop_next_request = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            server = socket.create_connection(self.target)
+            with self.lock:
+                self.sockets.extend([client, server])
+            threading.Thread(target=self._pipe, args=(client, server, True), daemon=True).start()
+            threading.Thread(target=self._pipe, args=(server, client, False), daemon=True).start()
+
+    def _pipe(self, source, destination, is_request):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if is_request and self.drop_next_request:
+                    self.drop_next_request = False
+                    break
+                destination.sendall(data)
+        except OSError:
+            pass
+        source.close()
+        destination.close()
+
+    def drop_connections(self):
+        with self.lock:
+            for sock in self.sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+            self.sockets = []
+
+    def close(self):
+        self.listener.close()
+        self.drop_connections()
+
+
+def wrong_protocol_server():
+    """A listener that answers one request with a bad header and an integer payload."""
+    listener = socket.create_server(('127.0.0.1', 0))
+
+    def respond():
+        server, _ = listener.accept()
+        server.recv(65536)
+        server.sendall(b'X' + b'IN' + (8).to_bytes(8, 'big') + (1).to_bytes(8, 'big'))
+        time.sleep(0.5)
+        server.close()
+
+    threading.Thread(target=respond, daemon=True).start()
+    return listener
+
+
+class TestReconnect:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.proxy = Proxy(cupiddb_host, cupiddb_port)
+        cls.client = CupidClient(host='127.0.0.1', port=cls.proxy.port, read_timeout=5.0)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+        cls.proxy.close()
+
+    def test_dead_idle_connection(self):
+        self.client.set(key='test_reconnect_key', value=1)
+        self.proxy.drop_connections()
+        time.sleep(0.05)
+        assert self.client.get(key='test_reconnect_key') == 1
+        assert self.client.pool_stats()['dead'] == 1
+
+    def test_retry_idempotent(self):
+        self.client.set(key='test_reconnect_retry', value=2)
+        retries = self.client.pool_stats()['retries']
+        self.proxy.drop_next_request = True
+        assert self.client.get(key='test_reconnect_retry') == 2
+        assert self.client.pool_stats()['retries'] == retries + 1
+
+        # A write may have been applied, so it is not sent again
+        self.proxy.drop_next_request = True
+        try:
+            self.client.set(key='test_reconnect_retry', value=3)
+            assert False
+        except ConnectionError:
+            pass
+        assert self.client.pool_stats()['in_use'] == 0
+        self.client.delete(key='test_reconnect_retry')
+
+    def test_read_timeout(self):
+        listener = socket.create_server(('127.0.0.1', 0))
+        client = CupidClient(host='127.0.0.1', port=listener.getsockname()[1], read_timeout=0.2)
+        start = time.monotonic()
+        try:
+            client.get(key='test_reconnect_silent')
+            assert False
+        except ReadTimeoutError:
+            pass
+        assert time.monotonic() - start < 1.0
+        assert client.pool_stats()['size'] == 0
+        client.close()
+        listener.close()
+
+    def test_protocol_error(self):
+        listener = wrong_protocol_server()
+        connection = SyncConnection(host='127.0.0.1', port=listener.getsockname()[1], read_timeout=1.0)
+        try:
+            connection.send_command(message_type='GD', payload=b'test_reconnect_protocol')
+            assert False
+        except ValueError:
+            pass
+        # The unread payload would be taken for the next response
+        assert connection.broken and not connection.is_alive()
+        listener.close()
+
+    def test_connect_failure(self):
+        listener = socket.create_server(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        start = time.monotonic()
+        try:
+            CupidClient(host='127.0.0.1', port=port, max_retries=2, retry_delay=0.01, connect_timeout=0.5)
+            assert False
+        except ConnectionError:
+            pass
+        assert time.monotonic() - start < 1.0
+
+
+class TestAsyncReconnect:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.proxy = Proxy(cupiddb_host, cupiddb_port)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.proxy.close()
+
+    def run(self, test):
+        async def runner():
+            async with AsyncCupidClient(host='127.0.0.1', port=self.proxy.port, read_timeout=5.0) as client:
+                await test(client)
+        asyncio.run(runner())
+
+    def test_dead_idle_connection(self):
+        async def test(client):
+            await client.set(key='test_reconnect_async_key', value=1)
+            self.proxy.drop_connections()
+            await asyncio.sleep(0.05)
+            assert await client.get(key='test_reconnect_async_key') == 1
+            assert client.pool_stats()['dead'] == 1
+            await client.delete(key='test_reconnect_async_key')
+        self.run(test)
+
+    def test_retry_idempotent(self):
+        async def test(client):
+            await client.set(key='test_reconnect_async_retry', value=2)
+            self.proxy.drop_next_request = True
+            assert await client.get(key='test_reconnect_async_retry') == 2
+            assert client.pool_stats()['retries'] == 1
+
+            # A write may have been applied, so it is not sent again
+            self.proxy.drop_next_request = True
+            try:
+                await client.set(key='test_reconnect_async_retry', value=3)
+                assert False
+            except ConnectionError:
+                pass
+            stats = client.pool_stats()
+            assert stats['in_use'] == 0 and stats['retries'] == 1
+            await client.delete(key='test_reconnect_async_retry')
+        self.run(test)
+
+    def test_read_timeout(self):
+        listener = socket.create_server(('127.0.0.1', 0))
+
+        async def run():
+            async with AsyncCupidClient(host='127.0.0.1', port=listener.getsockname()[1],
+                                        read_timeout=0.2) as client:
+                start = time.monotonic()
+                try:
+                    await client.get(key='test_reconnect_async_silent')
+                    assert False
+                except ReadTimeoutError:
+                    pass
+                assert time.monotonic() - start < 1.0
+                assert client.pool_stats()['size'] == 0
+
+        asyncio.run(run())
+        listener.close()
+
+    def test_protocol_error(self):
+        listener = wrong_protocol_server()
+
+        async def run():
+            connection = AsyncConnection(host='127.0.0.1', port=listener.getsockname()[1], read_timeout=1.0)
+            await connection.connect()
+            try:
+                await connection.send_command(message_type='GD', payload=b'test_reconnect_async_protocol')
+                assert False
+            except ValueError:
+                pass
+            assert connection.broken and not connection.is_alive()
+            await connection.close()
+
+        asyncio.run(run())
+        listener.close()
+
+    def test_connect_options(self):
+        async def run():
+            async with AsyncCupidClient(host='127.0.0.1', port=self.proxy.port, connect_timeout=1.0) as client:
+                await client.set(key='test_reconnect_async_options', value=1)
+                assert await client.delete(key='test_reconnect_async_options')
+        asyncio.run(run())
+
+        try:
+            AsyncCupidClient(host='127.0.0.1', port=self.proxy.port, conect_timeout=1.0)
+            assert False
+        except TypeError:
+            pass
+
+    def test_connect_failure(self):
+        listener = socket.create_server(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        listener.close()
+
+        async def run():
+            client = AsyncCupidClient(host='127.0.0.1', port=port, max_retries=2, retry_delay=0.01,
+                                      connect_timeout=0.5)
+            await client.connect()
+
+        start = time.monotonic()
+        try:
+            asyncio.run(run())
+            assert False
+        except ConnectionError:
+            pass
+        assert time.monotonic() - start < 1.0
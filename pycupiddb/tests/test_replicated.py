@@ -0,0 +1,136 @@
+import time
+
+from pycupiddb import CupidClient, ReplicatedCupidClient
+from pycupiddb.exceptions import ConnectionError, CupidDBError, InvalidQuery
+from pycupiddb.embedded import EmbeddedStore
+from pycupiddb.replicated import LatencyTracker
+from pycupiddb.tests.utils import create_df
+
+
+class SlowStore(EmbeddedStore):
+
+    def __init__(self):
+        super().__init__()
+        self.delay = 0.0
+        self.reads = 0
+        self.fail = False
+
+    def handle(self, message_type, payload):
+        if message_type in ('GD', 'GA'):
+            self.reads += 1
+            time.sleep(self.delay)
+            if self.fail:
+                raise ConnectionError('Node is down')
+        return super().handle(message_type, payload)
+
+
+class TestLatencyTracker:
+
+    def test_recovery_after_penalty(self):
+        tracker = LatencyTracker(alpha=0.3, decay=10.0)
+        tracker.observe(0.0005)
+        tracker.penalize(5.0)
+        assert tracker.score(time.monotonic()) >= 1.0
+
+        # After a long idle spell a single fast probe brings the score back down
+        tracker.updated -= 80
+        tracker.observe(0.0005)
+        assert tracker.score(time.monotonic()) < 0.01
+
+
+class TestReplicated:
+
+    def setup_method(self):
+        self.stores = {'fast': SlowStore(), 'slow': SlowStore()}
+        self.nodes = {name: CupidClient.embedded(store=store) for name, store in self.stores.items()}
+
+    def test_writes_and_reads(self):
+        client = ReplicatedCupidClient.from_clients(self.nodes)
+        df = create_df()
+        client.set(key='test_replicated_df', value=df)
+        assert all(node.has_key(key='test_replicated_df') for node in self.nodes.values())
+        assert df.equals(client.get_dataframe(key='test_replicated_df'))
+        assert client.incr(key='test_replicated_count') == 1
+        assert self.nodes['slow'].get(key='test_replicated_count') == 1
+        assert client.delete(key='test_replicated_df')
+        assert not any(node.has_key(key='test_replicated_df') for node in self.nodes.values())
+        client.close()
+
+        # With a primary only it is written to
+        client = ReplicatedCupidClient.from_clients(self.nodes, primary='fast')
+        client.set(key='test_replicated_primary', value=1)
+        assert not self.nodes['slow'].has_key(key='test_replicated_primary')
+        client.close()
+
+    def test_latency_routing(self):
+        client = ReplicatedCupidClient.from_clients(self.nodes)
+        client.set(key='test_replicated_value', value=1)
+        self.stores['slow'].delay = 0.02
+        for _ in range(20):
+            assert client.get(key='test_replicated_value') == 1
+        stats = client.latency_stats()
+        assert stats['slow']['ewma'] > stats['fast']['ewma']
+        assert stats['fast']['samples'] > stats['slow']['samples']
+        assert stats['slow']['samples'] <= 2
+        client.close()
+
+    def test_hedging(self):
+        client = ReplicatedCupidClient.from_clients(self.nodes, hedge_percentile=0.9)
+        client.set(key='test_replicated_hedge', value=1)
+        self.stores['slow'].delay = 0.01
+        for _ in range(client.hedge_min_samples + 2):
+            client.get(key='test_replicated_hedge')
+        self.stores['slow'].delay = 0.0
+        self.stores['fast'].delay = 0.5
+
+        start = time.monotonic()
+        assert client.get(key='test_replicated_hedge') == 1
+        assert time.monotonic() - start < 0.3
+        assert client.hedged == 1 and client.hedge_wins == 1
+        client.close()
+
+    def test_hedge_failover(self):
+        stores = {name: SlowStore() for name in ['a', 'b', 'c']}
+        client = ReplicatedCupidClient.from_clients({name: CupidClient.embedded(store=store)
+                                                     for name, store in stores.items()}, hedge_percentile=0.9)
+        client.set(key='test_replicated_failover', value=1)
+        stores['a'].fail = stores['b'].fail = True
+
+        # Neither hedged node answers, so the read moves on to the last one
+        assert client._hedged_read(['a', 'b', 'c'], lambda node: node.get(key='test_replicated_failover'),
+                                   0.01) == 1
+        assert [store.reads for store in stores.values()] == [1, 1, 1]
+        client.close()
+
+    def test_invalid_query(self):
+        client = ReplicatedCupidClient.from_clients(self.nodes, hedge_percentile=0.9)
+        client.set(key='test_replicated_invalid', value=create_df())
+        for store in self.stores.values():
+            store.delay = 0.02
+        while min(stats['samples'] for stats in client.latency_stats().values()) < client.hedge_min_samples:
+            client.get(key='test_replicated_invalid')
+        for store in self.stores.values():
+            store.delay = 0.0
+        reads, hedged = sum(store.reads for store in self.stores.values()), client.hedged
+
+        # A query that fails on one replica fails on all of them, so it is neither retried nor hedged
+        for hedge in [False, True]:
+            try:
+                client._read(lambda node: node.get_dataframe(key='test_replicated_invalid', filter_operation='XOR'),
+                             hedge=hedge)
+                assert False
+            except InvalidQuery:
+                pass
+        assert sum(store.reads for store in self.stores.values()) == reads + 2
+        assert client.hedged == hedged
+
+        # Failed reads no longer count as in flight, so they do not push the node down the order
+        client.set(key='test_replicated_scalar', value=1)
+        for _ in range(3):
+            try:
+                client.get_dataframe(key='test_replicated_scalar')
+                assert False
+            except CupidDBError:
+                pass
+        assert all(stats['pending'] == 0 for stats in client.latency_stats().values())
+        client.close()
@@ -0,0 +1,87 @@
+import os
+import random
+import string
+import pandas as pd
+import pyarrow as pa
+from pycupiddb import CupidClient
+from pycupiddb.connection import IOV_MAX, send_buffers
+
+
+class PartialSocket:
+    """Records what is sent, taking at most ``limit`` bytes per call like a full socket buffer."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.data = bytearray()
+        self.calls = 0
+        self.most_buffers = 0
+
+    def sendmsg(self, buffers):
+        self.calls += 1
+        self.most_buffers = max(self.most_buffers, len(buffers))
+        data = b''.join(buffers)[:self.limit]
+        self.data += data
+        return len(data)
+
+
+class SendallSocket:
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def sendall(self, buffer):
+        self.data += buffer
+
+
+class TestSendBuffers:
+
+    def test_partial_sends(self):
+        buffers = [b'header', b'', bytearray(b'x' * 1000), memoryview(b'abc'), pa.py_buffer(b'arrow' * 10)]
+        expected = b''.join(buffers)
+        for limit in [1, 7, 100, 10000]:
+            sock = PartialSocket(limit)
+            send_buffers(sock, buffers)
+            assert bytes(sock.data) == expected
+        assert sock.calls == 1
+
+    def test_buffer_limit(self):
+        buffers = [bytes([i % 256]) for i in range(3 * IOV_MAX)]
+        sock = PartialSocket(10 ** 6)
+        send_buffers(sock, buffers)
+        assert bytes(sock.data) == b''.join(buffers)
+        assert sock.calls == 3
+        assert sock.most_buffers == IOV_MAX
+
+    def test_without_sendmsg(self):
+        sock = SendallSocket()
+        send_buffers(sock, [b'a', pa.py_buffer(b'bc'), b'def'])
+        assert bytes(sock.data) == b'abcdef'
+
+
+class TestVectoredSend:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def test_large_values(self):
+        key = ''.join(random.choices(string.ascii_uppercase + string.digits, k=16))
+        value = os.urandom(8 * 1024 * 1024)
+        self.client.set(key=key, value=value, timeout=60)
+        assert self.client.get(key=key) == value
+
+        test_df = pd.DataFrame({'a': range(500000), 'b': [float(i) for i in range(500000)]})
+        self.client.set(key=key, value=test_df, timeout=60)
+        assert test_df.equals(self.client.get_dataframe(key=key))
+
+    def test_many_frames(self):
+        prefix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=16))
+        mapping = {f'{prefix}{i}': i for i in range(2 * IOV_MAX)}
+        self.client.set_many(mapping, timeout=60, chunk_size=len(mapping))
+        assert self.client.get_many(list(mapping)) == mapping
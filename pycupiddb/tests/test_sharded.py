@@ -0,0 +1,124 @@
+import os
+
+from pycupiddb import CupidClient, HashRing, ShardedCupidClient
+from pycupiddb.tests.utils import create_df
+
+
+class TestHashRing:
+
+    def test_remapping(self):
+        keys = [f'key_{i}' for i in range(10000)]
+        ring = HashRing()
+        for node in ['a', 'b', 'c', 'd']:
+            ring.add(node)
+        before = {key: ring.node_for(key) for key in keys}
+        counts = {node: list(before.values()).count(node) for node in ['a', 'b', 'c', 'd']}
+        assert all(1500 < count < 3500 for count in counts.values())
+
+        # Only keys moving to the new node change place
+        ring.add('e')
+        after = {key: ring.node_for(key) for key in keys}
+        moved = [key for key in keys if before[key] != after[key]]
+        assert all(after[key] == 'e' for key in moved)
+        assert 1000 < len(moved) < 3000
+
+        ring.remove('e')
+        assert {key: ring.node_for(key) for key in keys} == before
+
+    def test_weights(self):
+        ring = HashRing()
+        ring.add('a')
+        ring.add('b', weight=3.0)
+        nodes = [ring.node_for(f'key_{i}') for i in range(10000)]
+        assert 2.0 < nodes.count('b') / nodes.count('a') < 4.5
+
+
+class TestSharded:
+
+    @classmethod
+    def setup_class(cls):
+        cls.nodes = {f'node{i}': CupidClient.embedded() for i in range(3)}
+        cls.client = ShardedCupidClient.from_clients(cls.nodes)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def test_routing(self):
+        df = create_df()
+        self.client.set(key='test_sharded_df', value=df)
+        assert df.equals(self.client.get_dataframe(key='test_sharded_df'))
+        node = self.client.node_for('test_sharded_df')
+        assert self.nodes[node].has_key(key='test_sharded_df')
+        assert not any(client.has_key(key='test_sharded_df')
+                       for name, client in self.nodes.items() if name != node)
+        assert self.client.incr(key='test_sharded_count', delta=2) == 2
+        assert self.client.delete(key='test_sharded_df')
+        assert self.client.delete(key='test_sharded_count')
+
+    def test_fan_out(self):
+        mapping = {f'test_sharded_{i}': i for i in range(30)}
+        self.client.set_many(mapping)
+        assert all(client.keys('test_sharded_*') for client in self.nodes.values())
+        assert self.client.get_many(list(mapping) + ['test_sharded_missing']) == mapping
+        assert sorted(self.client.keys('test_sharded_*')) == sorted(mapping)
+
+        with self.client.pipeline() as pipe:
+            pipe.get(key='test_sharded_1').delete_many(list(mapping)[:10]).get(key='test_sharded_1')
+        assert pipe.execute() == []
+        results = self.client.pipeline().has_key(key='test_sharded_1').keys('test_sharded_*').execute()
+        assert results[0] is False and len(results[1]) == 20
+
+        assert self.client.delete_many(list(mapping)) == 20
+        assert self.client.keys('test_sharded_*') == []
+
+    def test_get_dataframes(self):
+        frames = {f'test_sharded_frame_{i}': create_df(rows=5) for i in range(6)}
+        for key, df in frames.items():
+            self.client.set(key=key, value=df)
+        keys = list(frames) + ['test_sharded_frame_missing']
+        results = self.client.get_dataframes(keys)
+        assert list(results) == list(frames)
+        assert all(frames[key].equals(df) for key, df in results.items())
+        table = self.client.get_dataframes(keys, columns=['c0'], concat=True, return_type='arrow')
+        assert table.column('c0').to_pylist() == [v for df in frames.values() for v in df['c0']]
+        self.client.delete_many(list(frames))
+
+    def test_pipeline_order(self):
+        pipe = self.client.pipeline()
+        for i in range(10):
+            pipe.set(key=f'test_sharded_order_{i}', value=i)
+        for i in range(10):
+            pipe.get(key=f'test_sharded_order_{i}')
+        pipe.delete_many([f'test_sharded_order_{i}' for i in range(10)])
+        assert pipe.execute()[10:] == list(range(10)) + [10]
+
+    def test_resize_during_map(self):
+        client = ShardedCupidClient.from_clients({f'node{i}': CupidClient.embedded() for i in range(2)})
+
+        class ResizingWork(dict):
+            # Adds a node between two submits of _map, replacing the executor they go to
+            def items(self):
+                for index, item in enumerate(super().items()):
+                    if index == 1:
+                        client.add_node('node2', client=CupidClient.embedded())
+                    yield item
+
+        results = client._map(lambda node_client, value: value, ResizingWork(node0=0, node1=1))
+        assert results == {'node0': 0, 'node1': 1}
+        assert client._executor_users == {}
+        assert client.keys() == []
+        client.close()
+
+
+class TestShardedServer:
+
+    def test_nodes(self):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        client = ShardedCupidClient([(cupiddb_host, cupiddb_port)], max_connections=2)
+        client.set(key='test_sharded_server', value={'message': 'test'})
+        assert client.get(key='test_sharded_server') == {'message': 'test'}
+        assert client.delete_many(['test_sharded_server']) == 1
+        assert list(client.pool_stats()) == [f'{cupiddb_host}:{cupiddb_port}']
+        client.close()
@@ -0,0 +1,47 @@
+import os
+
+from pycupiddb import CupidClient, Trace
+from pycupiddb.tests.utils import create_df
+
+
+class TestTracing:
+
+    @classmethod
+    def setup_class(cls):
+        cupiddb_host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cupiddb_port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.client = CupidClient(host=cupiddb_host, port=cupiddb_port)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.client.close()
+
+    def test_phases(self):
+        key = 'test_tracing_key'
+        df = create_df(rows=1000)
+        logged = []
+        with Trace(log=logged.append) as trace:
+            self.client.set(key=key, value=df)
+            result = self.client.get_dataframe(key=key)
+            self.client.get(key=key + '_missing')
+        self.client.delete(key=key)
+        assert df.equals(result)
+
+        assert [call.name for call in trace.calls] == ['set', 'get_dataframe', 'get']
+        assert logged == trace.calls
+        set_call, get_call, missing_call = trace.calls
+        assert set_call.key == key
+        assert {'convert', 'encode', 'send', 'ttfb', 'receive'} <= set(set_call.phases)
+        assert set_call.request_bytes > 0 and set_call.rows == 1000
+        assert list(get_call.phases) == ['encode', 'send', 'ttfb', 'receive', 'decode', 'convert']
+        assert get_call.response_bytes > 0 and get_call.record_batches >= 1 and get_call.rows == 1000
+        assert 'decode' not in missing_call.phases
+        assert sum(get_call.phases.values()) <= get_call.total
+        assert 'get_dataframe' in trace.report() and 'ttfb' in trace.totals()
+
+    def test_untraced(self):
+        with Trace() as trace:
+            pass
+        self.client.set(key='test_tracing_untraced', value=1)
+        self.client.delete(key='test_tracing_untraced')
+        assert trace.calls == []
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import pandas as pd
+from pycupiddb import CupidClient, AsyncCupidClient, Transport, TCPTransport, UnixTransport, col
+from pycupiddb.exceptions import ConnectionError
+
+
+class UnixProxy:
+    """Forwards a Unix domain socket to the server, standing in for a server listening on one."""
+
+    def __init__(self, host, port):
+        self.target = (host, port)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cupiddb.sock')
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            server = socket.create_connection(self.target)
+            threading.Thread(target=self._pipe, args=(client, server), daemon=True).start()
+            threading.Thread(target=self._pipe, args=(server, client), daemon=True).start()
+
+    def _pipe(self, source, destination):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                destination.sendall(data)
+        except OSError:
+            pass
+        source.close()
+        destination.close()
+
+    def close(self):
+        self.listener.close()
+        self.directory.cleanup()
+
+
+class TestTransport:
+
+    @classmethod
+    def setup_class(cls):
+        cls.host = os.getenv('CUPIDDB_TEST_HOST', 'localhost')
+        cls.port = int(os.getenv('CUPIDDB_TEST_PORT', '5995'))
+        cls.proxy = UnixProxy(cls.host, cls.port)
+
+    @classmethod
+    def teardown_class(cls):
+        cls.proxy.close()
+
+    def test_unix_socket(self):
+        client = CupidClient(unix_socket_path=self.proxy.path, max_connections=2)
+        with client.connection.checkout() as connection:
+            assert isinstance(connection.transport, UnixTransport)
+            assert connection.sock.family == socket.AF_UNIX
+        client.set(key='test_transport_unix', value={'a': 1}, timeout=60)
+        assert client.get(key='test_transport_unix') == {'a': 1}
+
+        test_df = pd.DataFrame({'a': range(100), 'b': [float(i) for i in range(100)]})
+        client.set(key='test_transport_unix_df', value=test_df, timeout=60)
+        result_df = client.get_dataframe(key='test_transport_unix_df', filters=col('a') >= 90)
+        assert test_df[test_df['a'] >= 90].reset_index(drop=True).equals(result_df)
+
+        pipeline = client.pipeline().delete('test_transport_unix_incr').incr('test_transport_unix_incr')
+        assert pipeline.execute()[1] == 1
+        client.close()
+
+    def test_socket_options(self):
+        transport = TCPTransport(self.host, self.port, keepalive=True, keepalive_idle=30,
+                                 send_buffer_size=1 << 20, receive_buffer_size=1 << 20)
+        client = CupidClient(transport=transport)
+        with client.connection.checkout() as connection:
+            sock = connection.sock
+            assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE) == 1
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY) == 1
+            # Linux doubles the requested size for its own bookkeeping
+            assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= 1 << 20
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE) == 30
+        client.set(key='test_transport_tcp', value=1)
+        assert client.get(key='test_transport_tcp') == 1
+        client.close()
+
+    def test_invalid(self):
+        try:
+            CupidClient(unix_socket_path=self.proxy.path, transport=TCPTransport(self.host, self.port))
+            assert False
+        except ValueError:
+            pass
+
+        try:
+            CupidClient(unix_socket_path=os.path.join(self.proxy.directory.name, 'missing.sock'),
+                        max_retries=0)
+            assert False
+        except ConnectionError:
+            pass
+
+        class SyncOnlyTransport(Transport):
+            def _new_socket(self):
+                return socket.socket()
+
+            def _address(self):
+                return 'localhost', 5995
+
+        try:
+            SyncOnlyTransport()
+            assert False
+        except TypeError:
+            pass
+
+    def test_async_unix_socket(self):
+        async def run():
+            async with AsyncCupidClient(unix_socket_path=self.proxy.path) as client:
+                await client.set(key='test_transport_async', value=2.5)
+                return await client.get(key='test_transport_async')
+
+        assert asyncio.run(run()) == 2.5
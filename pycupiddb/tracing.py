@@ -0,0 +1,132 @@
+import functools
+import time
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+_current_trace: ContextVar[Optional['Trace']] = ContextVar('pycupiddb_trace', default=None)
+_current_call: ContextVar[Optional['CallTrace']] = ContextVar('pycupiddb_call', default=None)
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+def _format_bytes(size: int) -> str:
+    if size < 1024:
+        return f'{size}B'
+    value = size / 1024
+    for unit in ('KB', 'MB'):
+        if value < 1024:
+            return f'{value:.1f}{unit}'
+        value /= 1024
+    return f'{value:.1f}GB'
+
+
+class CallTrace:
+    """Timeline of one client call, in seconds per phase.
+
+    Phases appear in the order they ran: ``encode`` (query JSON, IPC
+    writing, pickling), ``send``, ``ttfb`` (from the end of the send to the
+    first response byte, so it includes the server's work), ``receive``,
+    ``decode`` (IPC parsing, unpickling) and ``convert`` (pandas to Arrow
+    on ``set``, Arrow to pandas on reads). A phase that does not apply to a
+    call, or that is served from the near cache, is left out.
+    """
+
+    def __init__(self, name: str, key: Optional[str]):
+        self.name = name
+        self.key = key
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.phases: Dict[str, float] = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.record_batches = 0
+        self.rows = 0
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_since(self, phase: str, start: float) -> float:
+        """Add the time since ``start`` to ``phase`` and return the current time."""
+        now = time.perf_counter()
+        self.add(phase, now - start)
+        return now
+
+    def __str__(self) -> str:
+        parts = [self.name]
+        if self.key is not None:
+            parts.append(f'key={self.key!r}')
+        parts.append(f'total={self.total * 1000:.2f}ms')
+        parts.extend(f'{phase}={seconds * 1000:.2f}ms' for phase, seconds in self.phases.items())
+        parts.append(f'request={_format_bytes(self.request_bytes)}')
+        parts.append(f'response={_format_bytes(self.response_bytes)}')
+        if self.record_batches:
+            parts.append(f'batches={self.record_batches} rows={self.rows}')
+        return ' '.join(parts)
+
+
+class Trace:
+    """Records a ``CallTrace`` for every traced client call made inside the block::
+
+        with Trace(log=lambda call: logger.info('%s', call)) as trace:
+            cupid.get_dataframe(key='key')
+        print(trace.report())
+
+    ``set``, ``add``, ``get`` and ``get_dataframe`` are traced. Tracing
+    follows the current context, so calls made from other threads are not
+    recorded; outside a ``Trace`` block nothing is timed.
+    """
+
+    def __init__(self, log: Optional[Callable[[CallTrace], None]] = None):
+        self.log = log
+        self.calls: List[CallTrace] = []
+        self.lock = Lock()
+        self._token: Any = None
+
+    def __enter__(self) -> 'Trace':
+        self._token = _current_trace.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_trace.reset(self._token)
+
+    def _record(self, call: CallTrace):
+        with self.lock:
+            self.calls.append(call)
+        if self.log is not None:
+            self.log(call)
+
+    def totals(self) -> Dict[str, float]:
+        """Seconds spent in each phase, summed over all calls."""
+        totals: Dict[str, float] = {}
+        for call in self.calls:
+            for phase, seconds in call.phases.items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return totals
+
+    def report(self) -> str:
+        return '\n'.join(str(call) for call in self.calls)
+
+
+def current_call() -> Optional[CallTrace]:
+    return _current_call.get()
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Trace calls to the decorated client method while a ``Trace`` is active."""
+    def decorator(method: F) -> F:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None or _current_call.get() is not None:
+                return method(self, *args, **kwargs)
+            call = CallTrace(name, kwargs.get('key', args[0] if args else None))
+            token = _current_call.set(call)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                _current_call.reset(token)
+                call.total = time.perf_counter() - call.start
+                trace._record(call)
+        return wrapper  # type: ignore[return-value]
+    return decorator
@@ -0,0 +1,142 @@
+import socket
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class Transport(ABC):
+    """How a connection reaches the server.
+
+    A transport only opens and configures sockets; everything above it,
+    framing, pooling, retries and timeouts included, is the same for every
+    transport. One transport is shared by all connections of a pool.
+    ``send_buffer_size`` and ``receive_buffer_size`` set ``SO_SNDBUF`` and
+    ``SO_RCVBUF``, leaving the system defaults when ``None``.
+    """
+
+    def __init__(self, send_buffer_size: Optional[int] = None, receive_buffer_size: Optional[int] = None):
+        self.send_buffer_size = send_buffer_size
+        self.receive_buffer_size = receive_buffer_size
+
+    @abstractmethod
+    def _new_socket(self) -> socket.socket:
+        ...
+
+    @abstractmethod
+    def _address(self) -> Union[Tuple[str, int], str]:
+        ...
+
+    def configure(self, sock: socket.socket):
+        """Apply the socket options; also used on sockets that asyncio opened."""
+        if self.send_buffer_size is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer_size)
+        if self.receive_buffer_size is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_size)
+
+    def connect(self, timeout: Optional[float] = None) -> socket.socket:
+        """Open a connected socket, raising ``OSError`` on failure."""
+        sock = self._new_socket()
+        try:
+            self.configure(sock)
+            sock.settimeout(timeout)
+            sock.connect(self._address())
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    @abstractmethod
+    async def connect_async(self) -> Tuple['asyncio.StreamReader', 'asyncio.StreamWriter']:
+        ...
+
+
+class TCPTransport(Transport):
+    """TCP to ``host:port``, with ``TCP_NODELAY`` unless ``no_delay`` is off.
+
+    With ``keepalive``, the system probes idle connections so that a peer
+    that vanished without closing them is noticed. ``keepalive_idle``,
+    ``keepalive_interval`` and ``keepalive_count`` tune the probes where
+    the platform supports it.
+    """
+
+    def __init__(self, host: str, port: int, no_delay: bool = True, keepalive: bool = False,
+                 keepalive_idle: Optional[int] = None, keepalive_interval: Optional[int] = None,
+                 keepalive_count: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = port
+        self.no_delay = no_delay
+        self.keepalive = keepalive
+        self.keepalive_idle = keepalive_idle
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_count = keepalive_count
+
+    def _new_socket(self) -> socket.socket:
+        return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    def _address(self) -> Union[Tuple[str, int], str]:
+        return (self.host, self.port)
+
+    def configure(self, sock: socket.socket):
+        super().configure(sock)
+        if self.no_delay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.keepalive:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            for option, value in [('TCP_KEEPIDLE', self.keepalive_idle), ('TCP_KEEPINTVL', self.keepalive_interval),
+                                  ('TCP_KEEPCNT', self.keepalive_count)]:
+                if value is not None and hasattr(socket, option):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+    async def connect_async(self) -> Tuple['asyncio.StreamReader', 'asyncio.StreamWriter']:
+        import asyncio
+
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            self.configure(sock)
+        return reader, writer
+
+    def __str__(self) -> str:
+        return f'{self.host}:{self.port}'
+
+
+class UnixTransport(Transport):
+    """Unix domain socket at ``path``, for a server on the same host.
+
+    This skips the TCP stack of the loopback interface, which is a
+    noticeable share of the latency of small commands.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def _new_socket(self) -> socket.socket:
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    def _address(self) -> Union[Tuple[str, int], str]:
+        return self.path
+
+    async def connect_async(self) -> Tuple['asyncio.StreamReader', 'asyncio.StreamWriter']:
+        import asyncio
+
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            self.configure(sock)
+        return reader, writer
+
+    def __str__(self) -> str:
+        return self.path
+
+
+def resolve_transport(unix_socket_path: Optional[str], transport: Optional[Transport]) -> Optional[Transport]:
+    """The transport for the ``unix_socket_path`` and ``transport`` arguments of a client."""
+    if unix_socket_path is None:
+        return transport
+    if transport is not None:
+        raise ValueError('Pass either unix_socket_path or transport, not both')
+    return UnixTransport(unix_socket_path)